@@ -0,0 +1,60 @@
+"""Time and memory of large bet books: construction, settlement and Bet views.
+
+Run from the repository root::
+
+    python -m benchmarks.bet_book
+"""
+import random
+import timeit
+import tracemalloc
+from wheel import Wheel
+from table import Table
+
+
+def chips(count, seed=0):
+    rng = random.Random(seed)
+    bets = []
+    for _ in range(count):
+        n = 3 * rng.randint(0, 10) + rng.randint(1, 2)
+        bets.append(rng.choice([
+            {'type': 'straightUp', 'wager': 1, 'location': rng.randint(0, 36)},
+            {'type': 'split', 'wager': 2, 'location': [n, n + 3]},
+            {'type': 'corner', 'wager': 4, 'location': [n, n + 4]},
+            {'type': 'dozen', 'wager': 5, 'location': [n]},
+            {'type': 'outside', 'wager': 5, 'location': rng.choice(['red', 'black', 'odd', 'even'])},
+        ]))
+    return bets
+
+
+def allocated(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def main(sizes=(1000, 10000, 50000)):
+    for size in sizes:
+        bets = chips(size)
+        table = Table(wheel=Wheel.EUROPEAN, bets=bets)
+        construct = min(timeit.repeat(lambda: Table(wheel=Wheel.EUROPEAN, bets=bets), number=1, repeat=3))
+        settle = min(timeit.repeat(lambda: table.book.settle(17), number=1, repeat=3))
+
+        def per_bet():
+            return sum(bet.outcome.odds * bet.wager for bet in table.book.get_bets()
+                       if bet.outcome.mask & (1 << 17))
+
+        per_bet_settle = min(timeit.repeat(lambda: (setattr(table.book, '_bets', None), per_bet()),
+                                           number=1, repeat=3))
+        book_bytes = allocated(lambda: Table(wheel=Wheel.EUROPEAN, bets=bets))
+        view_bytes = allocated(lambda: (setattr(table.book, '_bets', None), table.book.get_bets())[1])
+        print("{0:>6} chips: construct {1:7.1f}ms  settle {2:6.3f}ms  per-bet settle {3:7.1f}ms  "
+              "book {4:6.0f}KiB  Bet views {5:6.0f}KiB".format(
+                  size, construct * 1e3, settle * 1e3, per_bet_settle * 1e3, book_bytes / 1024, view_bytes / 1024))
+
+
+if __name__ == '__main__':
+    main()
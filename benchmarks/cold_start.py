@@ -0,0 +1,67 @@
+"""Measure cold start: a fresh interpreter importing lambda_function and serving its first request.
+
+Run from the repository root::
+
+    python -m benchmarks.cold_start [--runs N] [--no-snapshot] [--update-budget]
+
+The medians are checked against benchmarks/cold_start_budget.json and the exit status is
+non-zero when a budget is exceeded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cold_start_budget.json')
+
+PROBE = '''
+import json, time
+start = time.perf_counter()
+import lambda_function
+imported = time.perf_counter()
+with open('testRequest.json') as f:
+    request = json.load(f)
+lambda_function.lambda_handler(request, None)
+done = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1e3, 'first_request_ms': (done - imported) * 1e3,
+                  'total_ms': (done - start) * 1e3}))
+'''
+
+
+def measure(runs, snapshot=True):
+    env = dict(os.environ)
+    if not snapshot:
+        env['ROULETTE_SNAPSHOT'] = ''
+    samples = [json.loads(subprocess.run([sys.executable, '-c', PROBE], env=env, check=True,
+                                         capture_output=True, text=True).stdout) for _ in range(runs)]
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--no-snapshot', action='store_true', help="build layouts at startup instead")
+    parser.add_argument('--update-budget', action='store_true', help="record these medians as the budget")
+    args = parser.parse_args(argv)
+
+    if not args.no_snapshot:
+        import snapshot
+        snapshot.build()
+    result = measure(args.runs, snapshot=not args.no_snapshot)
+    print(json.dumps(result, indent=4))
+    if args.update_budget:
+        with open(BUDGET_PATH, 'w') as f:
+            json.dump({key: round(value * 1.5, 1) for key, value in result.items()}, f, indent=4)
+        return 0
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    over = {key: value for key, value in result.items() if key in budget and value > budget[key]}
+    for key, value in over.items():
+        print("{0}: {1:.1f}ms over budget of {2:.1f}ms".format(key, value, budget[key]), file=sys.stderr)
+    return 1 if over else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Time every stage of process_request across request sizes and both wheels.
+
+Run from the repository root::
+
+    python -m benchmarks.pipeline [--sizes 1 60 1000 10000] [--output results.json]
+    python -m benchmarks.pipeline --update-baseline
+
+Requests of each size cycle through the bets of testRequest.json (without the sector bets on the
+American wheel, which has no sectors). The stages are:
+
+    validate   schema validation, as handle_request runs it
+    layout     building a wheel's outcome layout (once per wheel and process, shared by tables)
+    table      Table construction without bets
+    bets       Table construction with the request's bets
+    neighbors  Bet.from_neighbors for neighbors1-9 (size-independent)
+    sectors    Bet.from_sector for every sector name the schema accepts (European only, size-independent)
+    spin       RouletteEngine.spin
+    to_json    RouletteEngine.to_json, including the Bet views
+    request    process_request end to end
+
+Results are written as JSON, keyed "<wheel>/<bets>/<stage>", and compared against
+benchmarks/pipeline_baseline.json: a stage whose median is more than the threshold slower than
+its baseline is a regression, and the exit status is non-zero.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from wheel import Wheel
+from table import Bet, Layout, Table
+from roulette import RouletteEngine, process_request, requestSchema, requestValidator
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_baseline.json')
+SIZES = (1, 60, 1000, 10000)
+STAGES = ('validate', 'layout', 'table', 'bets', 'neighbors', 'sectors', 'spin', 'to_json', 'request')
+SECTOR_WAGERS = {'tiers': 6, 'voisins': 9, 'plein': 8, 'cheval': 5, 'orphelins': 5, 'jeu zero': 4}
+HASH = 'c3f5d1e0a8b7c6d5e4f3a2b1c0d9e8f7a6b5c4d3e2f1a0b9c8d7e6f5a4b3c2d1'
+
+
+def sized_request(request, wheel, size):
+    bets = [bet for bet in request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+    return dict(request, hash=HASH, wheel=wheel.value, bets=[bets[i % len(bets)] for i in range(size)])
+
+
+def fresh_copy(value):
+    # Requests repeat the same bet objects, so they are copied without deepcopy's sharing: the
+    # engine consumes some bet locations while parsing them
+    return json.loads(json.dumps(value))
+
+
+def schema_sectors(schema):
+    """Every sector location the request schema accepts, so the benchmark covers each spelling."""
+    for rule in schema['$defs']['betObject']['allOf']:
+        if rule['if'].get('properties', {}).get('type', {}).get('const') == 'sector':
+            return tuple(rule['then']['properties']['location']['enum'])
+    raise ValueError("The request schema has no sector locations")
+
+
+SECTORS = schema_sectors(requestSchema)
+
+
+def sector_wager(location):
+    return next(wager for name, wager in SECTOR_WAGERS.items() if name in location)
+
+
+def measure(prepare, run, repeat, number):
+    """Median and minimum seconds per call of run(argument), preparing arguments outside the timing."""
+    samples = []
+    for _ in range(repeat):
+        arguments = [prepare() for _ in range(number)]
+        start = time.perf_counter()
+        for argument in arguments:
+            run(argument)
+        samples.append((time.perf_counter() - start) / number)
+    return {'median': statistics.median(samples), 'min': min(samples), 'number': number, 'repeat': repeat}
+
+
+def stage_calls(stage, wheel, request):
+    """(prepare, run) for a stage, or None where the stage does not apply."""
+    limits = request['table']
+    if stage == 'validate':
+        return (lambda: request), requestValidator.first_error
+    if stage == 'layout':
+        return (lambda: wheel), Layout
+    if stage == 'table':
+        return (lambda: None), lambda _: Table(wheel=wheel, limits=limits)
+    if stage == 'bets':
+        return (lambda: fresh_copy(request['bets'])), lambda bets: Table(wheel=wheel, limits=limits, bets=bets)
+    if stage == 'neighbors':
+        table = Table(wheel=wheel, limits=limits)
+        return (lambda: None), lambda _: [Bet.from_neighbors(table=table, type=f"neighbors{n}", location=[25],
+                                                             wager=2 * n + 1) for n in range(1, 10)]
+    if stage == 'sectors':
+        if wheel != Wheel.EUROPEAN:
+            return None
+        table = Table(wheel=wheel, limits=limits)
+        return (lambda: None), lambda _: [Bet.from_sector(table=table, type='sector', location=location,
+                                                          wager=sector_wager(location)) for location in SECTORS]
+    engine = RouletteEngine(**fresh_copy(request))
+    engine.spin()
+    if stage == 'spin':
+        return (lambda: engine), RouletteEngine.spin
+    if stage == 'to_json':
+        def fresh():
+            # Bet views are built once per request, so time them as a new request would
+            engine.table.book._bets = None
+            return engine
+        return fresh, RouletteEngine.to_json
+    if stage == 'request':
+        return (lambda: fresh_copy(request)), process_request
+    raise ValueError(f"Unknown stage: {stage}")
+
+
+def run(sizes=SIZES, wheels=tuple(Wheel), stages=STAGES, repeat=7, budget=0.02):
+    with open('testRequest.json') as f:
+        request = json.load(f)
+    results = {}
+    for wheel in wheels:
+        for size in sizes:
+            sized = sized_request(request, wheel, size)
+            for stage in stages:
+                if stage in ('layout', 'neighbors', 'sectors') and size != sizes[0]:
+                    continue
+                calls = stage_calls(stage, wheel, sized)
+                if calls is None:
+                    continue
+                prepare, call = calls
+                # Calibrate the calls per sample so each sample takes roughly the budget
+                once = measure(prepare, call, 3, 1)['min']
+                number = max(1, min(1000, int(budget / once) if once else 1000))
+                results[f"{wheel.value}/{size}/{stage}"] = measure(prepare, call, repeat, number)
+    return {
+        'machine': platform.machine(),
+        'python':  platform.python_version(),
+        'results': results,
+    }
+
+
+def compare(result, baseline, threshold):
+    """Stages whose median is more than threshold (a fraction) slower than the baseline."""
+    regressions = {}
+    for key, timing in result['results'].items():
+        base = baseline.get('results', {}).get(key)
+        if base and timing['median'] > base['median'] * (1 + threshold):
+            regressions[key] = {'baseline': base['median'], 'change': timing['median'] / base['median'] - 1,
+                                'median': timing['median']}
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--wheels', nargs='+', choices=[wheel.value for wheel in Wheel],
+                        default=[wheel.value for wheel in Wheel])
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--repeat', type=int, default=7)
+    parser.add_argument('--output', help="also write the results to this file")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="allowed slowdown against the baseline median, as a fraction (default 0.25)")
+    parser.add_argument('--update-baseline', action='store_true', help="record these results as the baseline")
+    args = parser.parse_args(argv)
+
+    result = run(args.sizes, [Wheel(wheel) for wheel in args.wheels], args.stages, args.repeat)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(result, f, indent=4, sort_keys=True)
+        print(json.dumps(result, indent=4, sort_keys=True))
+        return 0
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    result['threshold'] = args.threshold
+    result['regressions'] = compare(result, baseline, args.threshold)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=4, sort_keys=True)
+    print(json.dumps(result, indent=4, sort_keys=True))
+    for key, regression in result['regressions'].items():
+        print("{0}: {1:.1%} slower than the baseline".format(key, regression['change']), file=sys.stderr)
+    return 1 if result['regressions'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
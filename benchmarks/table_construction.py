@@ -0,0 +1,34 @@
+"""Compare Table construction against a shared layout with a per-request layout build.
+
+Run from the repository root::
+
+    python -m benchmarks.table_construction
+"""
+import json
+import timeit
+from wheel import Wheel
+from table import Layout, Table, get_layout
+
+
+def main(number=200):
+    with open('testRequest.json') as f:
+        request = json.load(f)
+    for wheel in Wheel:
+        bets = [bet for bet in request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+        get_layout(wheel)
+
+        def shared():
+            Table(wheel=wheel, limits=request['table'], bets=json.loads(json.dumps(bets)))
+
+        def rebuilt():
+            Layout(wheel)
+            shared()
+
+        shared_time = timeit.timeit(shared, number=number) / number
+        rebuilt_time = timeit.timeit(rebuilt, number=number) / number
+        print("{0:<9} shared layout: {1:8.1f}us  rebuilt layout: {2:8.1f}us  speedup: {3:.1f}x".format(
+            wheel.value, shared_time * 1e6, rebuilt_time * 1e6, rebuilt_time / shared_time))
+
+
+if __name__ == '__main__':
+    main()
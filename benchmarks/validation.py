@@ -0,0 +1,30 @@
+"""Compare request validation modes across request sizes.
+
+Run from the repository root::
+
+    python -m benchmarks.validation
+"""
+import json
+import timeit
+import jsonschema
+from validation import RequestValidator
+
+
+def main(sizes=(1, 60, 1000), number=50):
+    with open('RouletteRequestSchema.json') as f:
+        schema = json.load(f)
+    with open('testRequest.json') as f:
+        request = json.load(f)
+    validators = {mode: RequestValidator(schema, mode=mode) for mode in RequestValidator.modes}
+    for size in sizes:
+        sized = dict(request, bets=[request['bets'][i % len(request['bets'])] for i in range(size)])
+        timings = {'jsonschema.validate': timeit.timeit(
+            lambda: jsonschema.validate(instance=sized, schema=schema), number=number) / number}
+        for mode, validator in validators.items():
+            timings[mode] = timeit.timeit(lambda: validator.validate(sized), number=number) / number
+        print("{0:>5} bets: ".format(size) + "  ".join(
+            "{0}: {1:9.1f}us".format(mode, seconds * 1e6) for mode, seconds in timings.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Exact distribution of a bet set's net result over many spins.
+
+A single spin's net result takes one value per pocket. Those values sit on a lattice
+offset + step * i, so the result of K spins is the K-fold convolution of the single-spin
+probabilities on that lattice. It is computed in one pass through the frequency domain: the
+transform of the single-spin distribution raised to the K-th power and transformed back. NumPy's
+FFT is used when NumPy is installed, a plain Python FFT otherwise. Both are accurate to around
+1e-13 in absolute probability, with no sampling noise. NumPy is only imported when a distribution
+is first convolved, so importing this module stays cheap.
+"""
+import cmath
+import math
+from fractions import Fraction
+
+
+def load_numpy():
+    """NumPy, or None when it is not installed."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover
+        return None
+    return numpy
+
+
+def fft(values, invert=False):
+    """Iterative radix-2 FFT; len(values) must be a power of two."""
+    a = [complex(value) for value in values]
+    n = len(a)
+    j = 0
+    for i in range(1, n):
+        bit = n >> 1
+        while j & bit:
+            j ^= bit
+            bit >>= 1
+        j |= bit
+        if i < j:
+            a[i], a[j] = a[j], a[i]
+    length = 2
+    while length <= n:
+        half = length // 2
+        angle = (2 if invert else -2) * math.pi / length
+        twiddles = [cmath.exp(1j * angle * k) for k in range(half)]
+        for start in range(0, n, length):
+            for k in range(half):
+                u = a[start + k]
+                v = a[start + k + half] * twiddles[k]
+                a[start + k] = u + v
+                a[start + k + half] = u - v
+        length <<= 1
+    if invert:
+        a = [value / n for value in a]
+    return a
+
+
+def convolve_power(probabilities, spins, backend=None):
+    """The distribution of the sum of `spins` independent draws from `probabilities` (indexed 0..S)."""
+    size = (len(probabilities) - 1) * spins + 1
+    padded = 1 << (size - 1).bit_length()
+    numpy = load_numpy() if backend in (None, 'numpy') else None
+    backend = backend or ('numpy' if numpy is not None else 'python')
+    if backend == 'numpy':
+        spectrum = numpy.fft.rfft(numpy.asarray(probabilities, dtype=float), padded) ** spins
+        result = numpy.fft.irfft(spectrum, padded)[:size].tolist()
+    elif backend == 'python':
+        spectrum = fft(list(probabilities) + [0.0] * (padded - len(probabilities)))
+        result = [value.real for value in fft([value ** spins for value in spectrum], invert=True)[:size]]
+    else:
+        raise ValueError(f"Unknown convolution backend: {backend}")
+    return [max(probability, 0.0) for probability in result]
+
+
+def as_number(value):
+    return int(value) if value.denominator == 1 else float(value)
+
+
+class ResultDistribution(object):
+    """Probabilities of the net results offset + step * i, for i in range(len(probabilities))."""
+
+    def __init__(self, spins, offset, step, probabilities):
+        self.spins = spins
+        self.offset = offset
+        self.step = step
+        self.probabilities = probabilities
+
+    @classmethod
+    def from_net(cls, net, spins=1, backend=None):
+        """Distribution after `spins` spins of the net result per pocket, all pockets equally likely."""
+        values = [Fraction(value) for value in net]
+        offset = min(values)
+        denominator = math.lcm(*(value.denominator for value in values))
+        positions = [int((value - offset) * denominator) for value in values]
+        divisor = math.gcd(*positions) or 1
+        single = [0.0] * (max(positions) // divisor + 1)
+        for position in positions:
+            single[position // divisor] += 1 / len(values)
+        probabilities = single if spins == 1 else convolve_power(single, spins, backend)
+        return cls(spins, offset * spins, Fraction(divisor, denominator), probabilities)
+
+    def value(self, index):
+        return as_number(self.offset + self.step * index)
+
+    def items(self):
+        """(net result, probability) for every result with non-zero probability."""
+        return [(self.value(index), probability) for index, probability in enumerate(self.probabilities)
+                if probability > 0]
+
+    @property
+    def mean(self):
+        offset, step = float(self.offset), float(self.step)
+        return sum((offset + step * index) * probability for index, probability in enumerate(self.probabilities))
+
+    def quantile(self, q):
+        """The smallest net result whose cumulative probability reaches q."""
+        total = 0.0
+        for index, probability in enumerate(self.probabilities):
+            total += probability
+            if total >= q - 1e-12:
+                return self.value(index)
+        return self.value(len(self.probabilities) - 1)
+
+    def probability_below(self, threshold):
+        """Probability that the net result is strictly below threshold."""
+        below = math.ceil((Fraction(threshold) - self.offset) / self.step)
+        return sum(self.probabilities[:max(below, 0)])
+
+    def probability_of_loss(self, threshold=0):
+        """Probability of losing more than threshold over all the spins."""
+        return self.probability_below(-threshold)
+
+    def get_json_dict(self, distribution=False):
+        result = {
+            'mean':              self.mean,
+            'probabilityOfLoss': self.probability_of_loss(),
+            'quantiles':         {str(q): self.quantile(q) for q in (0.001, 0.01, 0.05, 0.25, 0.5, 0.75,
+                                                                     0.95, 0.99, 0.999)},
+            'spins':             self.spins,
+        }
+        if distribution:
+            result['distribution'] = [[value, probability] for value, probability in self.items()]
+        return result
@@ -0,0 +1,103 @@
+from fractions import Fraction
+
+
+def pocket_location(number):
+    return '00' if number == 37 else number
+
+
+class Exposure(object):
+    """What a set of bets pays on every pocket of the wheel, and the risk that implies for the house.
+
+    net[n] is the player's result when pocket n wins: the payout less the wagers lost. Every pocket
+    is taken as equally likely.
+    """
+
+    def __init__(self, wheel, placed, payouts, on_table):
+        self.wheel = wheel
+        self.placed = placed
+        self.payouts = tuple(payouts)
+        self.on_table = tuple(on_table)
+        self.net = tuple(payout - (placed - kept) for payout, kept in zip(self.payouts, self.on_table))
+
+    @classmethod
+    def combine(cls, exposures):
+        """Exposure of several bet sets settled on the same spin."""
+        exposures = list(exposures)
+        wheels = {exposure.wheel for exposure in exposures}
+        if len(wheels) != 1:
+            raise ValueError("Exposures can only be combined for one wheel")
+        return cls(wheels.pop(), sum(exposure.placed for exposure in exposures),
+                   map(sum, zip(*(exposure.payouts for exposure in exposures))),
+                   map(sum, zip(*(exposure.on_table for exposure in exposures))))
+
+    def _mean(self):
+        return sum(map(Fraction, self.net)) / len(self.net)
+
+    @property
+    def expected_value(self):
+        return float(self._mean())
+
+    @property
+    def house_edge(self):
+        return float(-self._mean() / Fraction(self.placed)) if self.placed else 0.0
+
+    @property
+    def variance(self):
+        mean = self._mean()
+        return float(sum((Fraction(net) - mean) ** 2 for net in self.net) / len(self.net))
+
+    @property
+    def worst_case(self):
+        """The most the house can lose on one spin (negative when every pocket wins for the house)."""
+        return max(self.net)
+
+    @property
+    def worst_pockets(self):
+        worst = self.worst_case
+        return [pocket_location(number) for number, net in enumerate(self.net) if net == worst]
+
+    def get_distribution(self, spins, backend=None):
+        """Exact distribution of the player's net result over a number of spins of these bets."""
+        # Imported here so that the request path never loads the distribution code or NumPy
+        from distribution import ResultDistribution
+        return ResultDistribution.from_net(self.net, spins, backend)
+
+    def get_json_dict(self):
+        return {
+            'expectedValue': self.expected_value,
+            'houseEdge':     self.house_edge,
+            'net':           {str(pocket_location(number)): net for number, net in enumerate(self.net)},
+            'payouts':       {str(pocket_location(number)): payout for number, payout in enumerate(self.payouts)},
+            'placed':        self.placed,
+            'variance':      self.variance,
+            'wheel':         self.wheel.value,
+            'worstCase':     self.worst_case,
+            'worstPockets':  self.worst_pockets,
+        }
+
+
+def house_exposure(exposures, shared_spin=False):
+    """House-wide view of several tables' exposures.
+
+    Tables that spin independently report worstCaseBound, the sum of their worst cases, which the
+    house only loses when every table's worst pocket wins at once. Tables settled on one shared
+    spin are combined pocket by pocket, and report the worst pocket of the combined net instead.
+    """
+    exposures = list(exposures)
+    placed = sum(exposure.placed for exposure in exposures)
+    expected_value = sum(exposure.expected_value for exposure in exposures)
+    result = {
+        'expectedValue': expected_value,
+        'houseEdge':     -expected_value / placed if placed else 0.0,
+        'placed':        placed,
+        'sharedSpin':    shared_spin,
+        'tables':        len(exposures),
+    }
+    if shared_spin:
+        combined = Exposure.combine(exposures)
+        result.update(variance=combined.variance, worstCase=combined.worst_case,
+                      worstPockets=combined.worst_pockets)
+    else:
+        result.update(variance=sum(exposure.variance for exposure in exposures),
+                      worstCaseBound=sum(exposure.worst_case for exposure in exposures))
+    return result
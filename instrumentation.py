@@ -0,0 +1,234 @@
+"""Opt-in timing of the phases of a request, with pluggable sinks and sampled profiling.
+
+Instrumentation is off unless configured. While it is off, start() returns None and the engine
+skips every timing call with a single `if trace` test, so a request pays nothing else for it.
+
+    import instrumentation
+    histogram = instrumentation.Histogram()
+    instrumentation.configure(sinks=[histogram, instrumentation.LogSink()], sample_rate=0.1,
+                              respond=True, profile_rate=0.01)
+
+A trace records the time since its previous mark under each phase name, so phases are
+contiguous and add up to the request's total. Counters record how much work a phase did. The
+same configuration can be taken from the environment with configure_from_environment():
+
+    ROULETTE_TIMING          comma separated sinks: log, histogram, response
+    ROULETTE_TIMING_SAMPLE   fraction of requests to time (default 1)
+    ROULETTE_PROFILE_SAMPLE  fraction of timed requests to run under cProfile (default 0)
+    ROULETTE_MEMORY_SAMPLE   fraction of timed requests to trace allocations of (default 0)
+
+The modules behind logging, sampling, profiling and allocation tracing are imported when they are
+first needed, so importing this module with instrumentation off costs next to nothing.
+"""
+import math
+import os
+import time
+
+LOGGER = 'roulette.timing'
+
+
+class Trace(object):
+    __slots__ = ('phases', 'counters', 'started', 'last', 'profile', 'memory')
+
+    def __init__(self):
+        self.phases = {}
+        self.counters = {}
+        self.profile = None
+        self.memory = False
+        self.started = self.last = time.perf_counter_ns()
+
+    def mark(self, phase):
+        """Record the time since the previous mark as spent in phase."""
+        now = time.perf_counter_ns()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def count(self, counter, amount=1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def get_json_dict(self):
+        return {
+            'counters': dict(self.counters),
+            'phases':   {phase: elapsed / 1e6 for phase, elapsed in self.phases.items()},
+            'totalMs':  self.total / 1e6,
+        }
+
+
+class LogSink(object):
+    """Log one line per timed request."""
+
+    def __init__(self, log=None, level=None):
+        import logging
+        self.log = log or logging.getLogger(LOGGER)
+        self.level = logging.INFO if level is None else level
+
+    def record(self, trace):
+        self.log.log(self.level, "phases %s counters %s total %.3fms",
+                     ' '.join('{0}={1:.3f}ms'.format(phase, elapsed / 1e6) for phase, elapsed in trace.phases.items()),
+                     trace.counters, trace.total / 1e6)
+
+
+class Histogram(object):
+    """In-memory log-scale histograms of the time per phase, and totals of the counters.
+
+    Buckets grow by a factor of 2 ** (1 / resolution) from 1us, so percentiles are accurate to
+    within that factor.
+    """
+
+    def __init__(self, resolution=4):
+        self.resolution = resolution
+        self.buckets = {}
+        self.counters = {}
+        self.requests = 0
+
+    def bucket(self, elapsed):
+        return max(0, math.ceil(math.log2(max(elapsed, 1) / 1000) * self.resolution))
+
+    def add(self, phase, elapsed):
+        buckets = self.buckets.setdefault(phase, {})
+        bucket = self.bucket(elapsed)
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+
+    def record(self, trace):
+        self.requests += 1
+        for phase, elapsed in trace.phases.items():
+            self.add(phase, elapsed)
+        self.add('total', trace.total)
+        for counter, amount in trace.counters.items():
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def percentile(self, phase, point):
+        """Upper bound in milliseconds of the bucket holding the given percentile of a phase."""
+        buckets = self.buckets.get(phase)
+        if not buckets:
+            return None
+        total = sum(buckets.values())
+        seen = 0
+        for bucket in sorted(buckets):
+            seen += buckets[bucket]
+            if seen * 100 >= total * point:
+                return 2 ** (bucket / self.resolution) / 1000
+        return None
+
+    def get_json_dict(self, points=(50, 90, 99, 99.9)):
+        return {
+            'counters': dict(self.counters),
+            'phases':   {phase: {'count': sum(buckets.values()),
+                                 'percentilesMs': {str(point): self.percentile(phase, point) for point in points}}
+                         for phase, buckets in self.buckets.items()},
+            'requests': self.requests,
+        }
+
+    def reset(self):
+        self.buckets.clear()
+        self.counters.clear()
+        self.requests = 0
+
+
+def log_profile(profile, limit=25):
+    import io
+    import logging
+    import pstats
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats('cumulative').print_stats(limit)
+    logging.getLogger(LOGGER).info("profile\n%s", stream.getvalue())
+
+
+class Instrumentation(object):
+    def __init__(self, sinks=(), sample_rate=1.0, respond=False, profile_rate=0.0, memory_rate=0.0,
+                 profile_sink=log_profile, rng=None):
+        self.sinks = list(sinks)
+        self.sample_rate = sample_rate
+        self.respond = respond
+        self.profile_rate = profile_rate
+        self.memory_rate = memory_rate
+        self.profile_sink = profile_sink
+        if rng is None and (sample_rate < 1 or profile_rate or memory_rate):
+            import random
+            rng = random.random
+        self.rng = rng
+
+    @property
+    def enabled(self):
+        return bool(self.sinks or self.respond) and self.sample_rate > 0
+
+    def start(self):
+        """A new trace for a sampled request, or None."""
+        if not self.enabled or (self.sample_rate < 1 and self.rng() >= self.sample_rate):
+            return None
+        trace = Trace()
+        if self.memory_rate and self.rng() < self.memory_rate:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                trace.memory = True
+        if self.profile_rate and self.rng() < self.profile_rate:
+            import cProfile
+            trace.profile = cProfile.Profile()
+            trace.profile.enable()
+        # Setting up profiling is not part of the request
+        trace.started = trace.last = time.perf_counter_ns()
+        return trace
+
+    def annotate(self, trace, result):
+        """Add the trace to a response when configured to."""
+        if self.respond and isinstance(result, dict):
+            result['timing'] = trace.get_json_dict()
+
+    def finish(self, trace):
+        if trace.profile is not None:
+            trace.profile.disable()
+            self.profile_sink(trace.profile)
+            trace.profile = None
+        if trace.memory:
+            import tracemalloc
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            trace.count('peakBytes', peak)
+            trace.memory = False
+        for sink in self.sinks:
+            sink.record(trace)
+
+
+current = Instrumentation()
+
+
+def configure(**kwargs):
+    """Replace the engine's instrumentation; configure() with no arguments switches it off."""
+    global current
+    current = Instrumentation(**kwargs)
+    return current
+
+
+def start():
+    return current.start()
+
+
+def annotate(trace, result):
+    current.annotate(trace, result)
+
+
+def finish(trace):
+    current.finish(trace)
+
+
+def get_histogram():
+    """The first Histogram sink currently configured, if any."""
+    return next((sink for sink in current.sinks if isinstance(sink, Histogram)), None)
+
+
+def configure_from_environment(environ=os.environ):
+    names = [name.strip() for name in environ.get('ROULETTE_TIMING', '').split(',') if name.strip()]
+    sinks = []
+    if 'log' in names:
+        sinks.append(LogSink())
+    if 'histogram' in names:
+        sinks.append(Histogram())
+    return configure(sinks=sinks, respond='response' in names,
+                     sample_rate=float(environ.get('ROULETTE_TIMING_SAMPLE', 1)),
+                     profile_rate=float(environ.get('ROULETTE_PROFILE_SAMPLE', 0)),
+                     memory_rate=float(environ.get('ROULETTE_MEMORY_SAMPLE', 0)))
@@ -0,0 +1,424 @@
+"""Append-only binary journal of settled rounds, read back through mmap without parsing JSON.
+
+A journal is three files:
+
+    <path>        a 16 byte header, then one fixed-width record per round (ROUND)
+    <path>.bets   the bets of every round packed back to back, and each distinct set of limits
+    <path>.idx    a 16 byte header with the number of rounds indexed, then (hash, round number)
+                  entries sorted by hash
+
+A round record holds the raw 32 byte hash, the wheel, the winning pocket, the wager summary
+(placed, payout, onTable, lost and delta, with a flag for each that was a float) and the offsets
+of the round's limits and bets in the bets file. A bet is its type code, a float flag, its
+outcome id in the wheel's Layout and its wager, followed by its location (LOCATION_* codes).
+Wins and payouts are not stored: they follow from the outcome and the winning pocket.
+
+    with JournalWriter('rounds.rj') as journal:
+        journal.append(engine)
+    reader = JournalReader('rounds.rj')
+    reader.get_json_dict(reader.find(hash)[-1])
+
+The writer buffers records and appends them in bulk, bets before the rounds that point at them.
+The index is brought up to date when the writer is closed. Rounds appended since, for instance by
+a writer that did not close, are found by scanning them, and indexed by the next writer to close.
+A reader sees the rounds that were in the journal when it was opened. Rounds are exported in the
+shape RouletteEngine.get_json_dict gives without netting; netted rounds are journaled with their
+expanded bets.
+
+    python -m journal summary rounds.rj
+    python -m journal export rounds.rj <hash>
+"""
+import argparse
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import namedtuple
+from exposure import pocket_location
+from roulette import bets_json, wager_json, winner_json
+from table import Bet, BetBook, Table, get_layout
+from wheel import Wheel
+
+VERSION = 1
+HEADER = struct.Struct('<4sHH8x')
+INDEX_HEADER = struct.Struct('<4sHHQ')
+ROUND = struct.Struct('<32sBBBxQdddddQI')
+BET = struct.Struct('<BBhd')
+INDEX = struct.Struct('<32sQ')
+LENGTH = struct.Struct('<I')
+ROUNDS_MAGIC, BETS_MAGIC, INDEX_MAGIC = b'RJRN', b'RJBT', b'RJIX'
+WHEELS = (Wheel.EUROPEAN, Wheel.AMERICAN)
+WAGER_KEYS = ('placed', 'payout', 'onTable', 'lost', 'delta')
+BUFFER_SIZE = 1 << 20
+
+# How a bet's location is packed after its BET fields
+LOCATION_NONE = 0     # nothing follows
+LOCATION_INT = 1      # one byte
+LOCATION_STR = 2      # a length byte, then UTF-8
+LOCATION_INTS = 3     # a count byte, then a byte per pocket
+LOCATION_JSON = 4     # a LENGTH, then the location as JSON
+
+Round = namedtuple('Round', ('hash', 'wheel', 'winner', 'floats', 'limits', 'placed', 'payout', 'on_table',
+                             'lost', 'delta', 'bets', 'bet_count'))
+
+
+class JournalError(Exception):
+    pass
+
+
+def is_byte(value):
+    return type(value) is int and 0 <= value < 256
+
+
+def pack_location(location, out):
+    if location is None:
+        out.append(LOCATION_NONE)
+    elif is_byte(location):
+        out += bytes((LOCATION_INT, location))
+    elif isinstance(location, str) and len(location.encode()) < 256:
+        encoded = location.encode()
+        out += bytes((LOCATION_STR, len(encoded))) + encoded
+    elif isinstance(location, list) and len(location) < 256 and all(is_byte(pocket) for pocket in location):
+        out += bytes((LOCATION_INTS, len(location))) + bytes(location)
+    else:
+        encoded = json.dumps(location).encode()
+        out.append(LOCATION_JSON)
+        out += LENGTH.pack(len(encoded)) + encoded
+
+
+def unpack_location(buffer, offset):
+    """(location, offset after it) of a location packed at offset."""
+    code = buffer[offset]
+    offset += 1
+    if code == LOCATION_NONE:
+        return None, offset
+    if code == LOCATION_INT:
+        return buffer[offset], offset + 1
+    if code == LOCATION_STR:
+        end = offset + 1 + buffer[offset]
+        return bytes(buffer[offset + 1:end]).decode(), end
+    if code == LOCATION_INTS:
+        end = offset + 1 + buffer[offset]
+        return list(buffer[offset + 1:end]), end
+    if code == LOCATION_JSON:
+        (length,) = LENGTH.unpack_from(buffer, offset)
+        end = offset + LENGTH.size + length
+        return json.loads(bytes(buffer[offset + LENGTH.size:end])), end
+    raise JournalError("Unknown location code {0} at offset {1}".format(code, offset - 1))
+
+
+def open_append(path, magic, record_size):
+    """Open a journal file for appending, writing its header when new; returns (file, size)."""
+    exists = os.path.exists(path) and os.path.getsize(path) >= HEADER.size
+    f = open(path, 'r+b' if exists else 'w+b')
+    if exists:
+        found, version, size = HEADER.unpack(f.read(HEADER.size))
+        if found != magic or version != VERSION or size != record_size:
+            f.close()
+            raise JournalError("{0} is not a version {1} journal file".format(path, VERSION))
+    else:
+        f.write(HEADER.pack(magic, VERSION, record_size))
+    f.seek(0, os.SEEK_END)
+    return f, f.tell()
+
+
+def map_file(path, magic, record_size):
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    found, version, size = HEADER.unpack_from(mapped)
+    if found != magic or version != VERSION or size != record_size:
+        mapped.close()
+        raise JournalError("{0} is not a version {1} journal file".format(path, VERSION))
+    return mapped
+
+
+class JournalWriter(object):
+    def __init__(self, path, buffer_size=BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.rounds_file, size = open_append(path, ROUNDS_MAGIC, ROUND.size)
+        # A round only partly written before a crash is dropped; its bets are left unreferenced
+        self.count = (size - HEADER.size) // ROUND.size
+        self.rounds_file.truncate(HEADER.size + self.count * ROUND.size)
+        self.rounds_file.seek(0, os.SEEK_END)
+        self.bets_file, self.bets_size = open_append(path + '.bets', BETS_MAGIC, 0)
+        self.rounds = bytearray()
+        self.bets = bytearray()
+        self.limits = {}
+        self.indexed = []
+        self.index_path = path + '.idx'
+        self.index_covers = index_coverage(self.index_path)
+        if self.index_covers > self.count:
+            # The rounds file was cut back past what was indexed, so start the index again
+            os.remove(self.index_path)
+            self.index_covers = 0
+        self.rounds_file.seek(HEADER.size + self.index_covers * ROUND.size)
+        for number in range(self.index_covers, self.count):
+            self.indexed.append((self.rounds_file.read(ROUND.size)[:32], number))
+        self.rounds_file.seek(0, os.SEEK_END)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def limits_offset(self, limits):
+        encoded = json.dumps({name: limits[name].get_json_dict() for name in sorted(limits)}).encode()
+        offset = self.limits.get(encoded)
+        if offset is None:
+            offset = self.limits[encoded] = self.bets_size + len(self.bets)
+            self.bets += LENGTH.pack(len(encoded)) + encoded
+        return offset
+
+    def append(self, engine):
+        """Journal a settled RouletteEngine; returns its round number."""
+        if not engine.success:
+            raise JournalError("Only settled rounds can be journaled")
+        table = engine.table
+        book = table.book
+        limits = self.limits_offset(table.limits)
+        bets = self.bets_size + len(self.bets)
+        out = self.bets
+        for outcome_id, wager, float_wager, type_code, location in zip(
+                book.outcome_ids, book.wagers, book.float_wagers, book.type_codes, book.locations):
+            out += BET.pack(type_code, float_wager, outcome_id, wager)
+            pack_location(location, out)
+        wager = engine.wager
+        floats = sum(1 << bit for bit, key in enumerate(WAGER_KEYS) if isinstance(wager[key], float))
+        hash = bytes.fromhex(engine.hash)
+        self.rounds += ROUND.pack(hash, WHEELS.index(table.wheel), table.winning_number, floats, limits,
+                                  *(wager[key] for key in WAGER_KEYS), bets, len(book))
+        self.indexed.append((hash, self.count))
+        self.count += 1
+        if len(self.rounds) + len(self.bets) >= self.buffer_size:
+            self.flush()
+        return self.count - 1
+
+    def extend(self, engines):
+        for engine in engines:
+            self.append(engine)
+
+    def flush(self):
+        # Bets go first, so a round on disk never points past the end of the bets file
+        self.bets_file.write(self.bets)
+        self.bets_file.flush()
+        self.bets_size += len(self.bets)
+        self.rounds_file.write(self.rounds)
+        self.rounds_file.flush()
+        self.bets.clear()
+        self.rounds.clear()
+
+    def close(self):
+        if self.rounds_file.closed:
+            return
+        self.flush()
+        self.rounds_file.close()
+        self.bets_file.close()
+        self.update_index()
+
+    def update_index(self):
+        """Merge the rounds written since the index was last updated into it."""
+        existing = read_index(self.index_path) if os.path.exists(self.index_path) else ()
+        with open(self.index_path + '.tmp', 'wb') as f:
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, VERSION, INDEX.size, self.count))
+            chunk = bytearray()
+            for entry in heapq.merge(existing, sorted(self.indexed)):
+                chunk += INDEX.pack(*entry)
+                if len(chunk) >= self.buffer_size:
+                    f.write(chunk)
+                    chunk.clear()
+            f.write(chunk)
+        os.replace(self.index_path + '.tmp', self.index_path)
+        self.index_covers = self.count
+        self.indexed = []
+
+
+def index_coverage(path):
+    """The number of rounds an index covers, 0 when there is none."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'rb') as f:
+        magic, version, size, covers = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+    if magic != INDEX_MAGIC or version != VERSION or size != INDEX.size:
+        raise JournalError("{0} is not a version {1} journal index".format(path, VERSION))
+    return covers
+
+
+def read_index(path, chunk=4096):
+    """The (hash, round number) entries of an index, read a chunk at a time."""
+    with open(path, 'rb') as f:
+        f.seek(INDEX_HEADER.size)
+        while True:
+            data = f.read(INDEX.size * chunk)
+            if not data:
+                return
+            yield from INDEX.iter_unpack(data)
+
+
+class JournalReader(object):
+    def __init__(self, path):
+        self.path = path
+        self.rounds = map_file(path, ROUNDS_MAGIC, ROUND.size)
+        self.bets = map_file(path + '.bets', BETS_MAGIC, 0)
+        self.count = (len(self.rounds) - HEADER.size) // ROUND.size
+        self.index = None
+        self.indexed = 0
+        self.index_covers = min(index_coverage(path + '.idx'), self.count)
+        if self.index_covers:
+            self.index = map_file(path + '.idx', INDEX_MAGIC, INDEX.size)
+            self.indexed = (len(self.index) - HEADER.size) // INDEX.size
+        self.limits = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        for mapped in (self.rounds, self.bets, self.index):
+            if mapped is not None:
+                mapped.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError(number)
+        return Round._make(ROUND.unpack_from(self.rounds, HEADER.size + number * ROUND.size))
+
+    def records(self):
+        """Raw ROUND tuples of every round, unpacked straight from the mapped file."""
+        return ROUND.iter_unpack(memoryview(self.rounds)[HEADER.size:HEADER.size + self.count * ROUND.size])
+
+    def __iter__(self):
+        return map(Round._make, self.records())
+
+    def summary(self):
+        """Totals over every round and how often each pocket won, in a single pass."""
+        placed = payout = delta = 0
+        winners = {}
+        for _, wheel, winner, _, _, round_placed, round_payout, _, _, round_delta, _, _ in self.records():
+            placed += round_placed
+            payout += round_payout
+            delta += round_delta
+            winners[wheel, winner] = winners.get((wheel, winner), 0) + 1
+        counts = {}
+        for (wheel, number), count in sorted(winners.items()):
+            counts.setdefault(WHEELS[wheel].value, {})[str(pocket_location(number))] = count
+        return {
+            'delta':   delta,
+            'payout':  payout,
+            'placed':  placed,
+            'rounds':  self.count,
+            'winners': counts,
+        }
+
+    def find(self, hash):
+        """Numbers of the rounds journaled with a hash, in the order they were written."""
+        key = bytes.fromhex(hash)
+        found = []
+        if self.index is not None:
+            low, high = 0, self.indexed
+            while low < high:
+                middle = (low + high) // 2
+                offset = HEADER.size + middle * INDEX.size
+                if self.index[offset:offset + 32] < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            while low < self.indexed:
+                entry, number = INDEX.unpack_from(self.index, HEADER.size + low * INDEX.size)
+                if entry != key:
+                    break
+                if number < self.count:
+                    found.append(number)
+                low += 1
+        # Rounds written after the index was last updated are scanned
+        for number in range(self.index_covers, self.count):
+            offset = HEADER.size + number * ROUND.size
+            if self.rounds[offset:offset + 32] == key:
+                found.append(number)
+        return found
+
+    def get_limits(self, offset):
+        if offset not in self.limits:
+            (length,) = LENGTH.unpack_from(self.bets, offset)
+            self.limits[offset] = json.loads(self.bets[offset + LENGTH.size:offset + LENGTH.size + length])
+        return self.limits[offset]
+
+    def get_bets(self, record):
+        """Bet views of a round's bets, settled on its winning pocket."""
+        layout = get_layout(WHEELS[record.wheel])
+        outcomes = layout.outcome_list
+        winning_bit = 1 << record.winner
+        bets = []
+        offset = record.bets
+        for _ in range(record.bet_count):
+            type_code, float_wager, outcome_id, wager = BET.unpack_from(self.bets, offset)
+            location, offset = unpack_location(self.bets, offset + BET.size)
+            wager = wager if float_wager else int(wager)
+            outcome = None if outcome_id < 0 else outcomes[outcome_id]
+            type = BetBook.types[type_code]
+            if outcome is not None and outcome.mask & winning_bit:
+                bets.append(Bet.view(type, location, wager, outcome, True, outcome.odds * wager))
+            else:
+                bets.append(Bet.view(type, location, wager, outcome, False, 0))
+        return bets
+
+    def get_wager(self, record):
+        values = (record.placed, record.payout, record.on_table, record.lost, record.delta)
+        return {key: value if record.floats >> bit & 1 else int(value)
+                for bit, (key, value) in enumerate(zip(WAGER_KEYS, values))}
+
+    def get_json_dict(self, number):
+        """A journaled round in the shape RouletteEngine.get_json_dict gives it."""
+        record = self[number]
+        bets, winning_bets = bets_json(self.get_bets(record))
+        return {
+            'bets':        bets,
+            'hash':        record.hash.hex(),
+            'success':     True,
+            'table':       self.get_limits(record.limits),
+            'wager':       wager_json(self.get_wager(record)),
+            'wheel':       WHEELS[record.wheel].value,
+            'winner':      winner_json(Table.describe_pocket(record.winner)),
+            'winningBets': winning_bets,
+        }
+
+    def to_json(self, number):
+        return json.dumps(self.get_json_dict(number))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read a journal of settled rounds.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    summary = commands.add_parser('summary', help="totals over every round")
+    summary.add_argument('path')
+    export = commands.add_parser('export', help="a round as JSON, by hash or round number")
+    export.add_argument('path')
+    export.add_argument('round', help="the round's hash, or its number in the journal")
+    args = parser.parse_args(argv)
+    with JournalReader(args.path) as reader:
+        if args.command == 'summary':
+            result = reader.summary()
+        else:
+            numbers = [int(args.round)] if args.round.isdigit() and len(args.round) < 64 else reader.find(args.round)
+            if not numbers:
+                print("No round with hash {0}".format(args.round), file=sys.stderr)
+                return 1
+            result = reader.get_json_dict(numbers[-1])
+    json.dump(result, sys.stdout, indent=4)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,14 @@
-import json
-from roulette import process_request
+import instrumentation
+import result_cache
+from roulette import handle_batch, handle_request, handle_round, is_batch, is_round
+
+instrumentation.configure_from_environment()
+result_cache.configure_from_environment()
 
 
 def lambda_handler(event, context):
-    result = process_request(event)
-    return json.loads(result)
+    if is_batch(event):
+        return handle_batch(event)
+    if is_round(event):
+        return handle_round(event)
+    return handle_request(event)
@@ -0,0 +1,101 @@
+"""Load client for the HTTP server: keep-alive connections sending pipelined requests.
+
+    python -m load_client --url http://127.0.0.1:8080/ --request testRequest.json \\
+        --requests 20000 --connections 16 --pipeline 4
+
+Every connection keeps up to --pipeline requests in flight. The report gives throughput, the
+latency percentiles of the requests and the count of every status code, as JSON.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(ordered, point):
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))]
+
+
+def encode_request(host, path, body):
+    return ("POST {0} HTTP/1.1\r\nHost: {1}\r\nContent-Type: application/json\r\n"
+            "Content-Length: {2}\r\n\r\n").format(path, host, len(body)).encode('latin-1') + body
+
+
+async def read_response(reader):
+    """(status, body) of the next response on a connection."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split(' ', 2)[1])
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def connection(host, port, path, bodies, pipeline, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = []
+    try:
+        for body in bodies:
+            if len(sent) >= pipeline:
+                status, _ = await read_response(reader)
+                latencies.append(time.perf_counter() - sent.pop(0))
+                statuses[status] = statuses.get(status, 0) + 1
+            writer.write(encode_request(host, path, body))
+            sent.append(time.perf_counter())
+        await writer.drain()
+        while sent:
+            status, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - sent.pop(0))
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(url, bodies, connections=8, pipeline=1):
+    """Send every body in bodies to url, spread over the connections; returns the report."""
+    parts = urlsplit(url)
+    host, port, path = parts.hostname, parts.port or 80, parts.path or '/'
+    latencies = []
+    statuses = {}
+    shares = [bodies[index::connections] for index in range(connections)]
+    started = time.perf_counter()
+    await asyncio.gather(*(connection(host, port, path, share, pipeline, latencies, statuses)
+                           for share in shares if share))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        'connections':       connections,
+        'elapsedSeconds':    elapsed,
+        'latencyMs':         {str(point): percentile(ordered, point) * 1e3 if ordered else None
+                             for point in (50, 90, 99, 99.9)},
+        'pipeline':          pipeline,
+        'requests':          len(latencies),
+        'requestsPerSecond': len(latencies) / elapsed if elapsed else None,
+        'statuses':          {str(status): count for status, count in sorted(statuses.items())},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send load to the roulette HTTP server.")
+    parser.add_argument('--url', default='http://127.0.0.1:8080/')
+    parser.add_argument('--request', default='testRequest.json', help="JSON body to send")
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--pipeline', type=int, default=1, help="requests in flight per connection")
+    args = parser.parse_args(argv)
+    with open(args.request, 'rb') as f:
+        body = json.dumps(json.load(f)).encode()
+    report = asyncio.run(run(args.url, [body] * args.requests, args.connections, args.pipeline))
+    json.dump(report, sys.stdout, indent=4)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""Replay request files through the engine in process, at a target rate or concurrency.
+
+    python -m load_replay synthesize --count 20000 --bets 1 200 --american 0.3 --invalid 0.05 \\
+        --output mix.ndjson
+    python -m load_replay run mix.ndjson --target lambda --rate 500 --concurrency 4
+
+Request files are NDJSON: one request per line, in the testRequest.json format (or anything else
+the target takes, such as batches). synthesize writes a mix of requests built from the bets of
+testRequest.json, with a uniform spread of bet counts, a share of American wheels and a share of
+requests the schema rejects, which take the jsonschema error path. Every request gets its own
+random hash, so none is answered from the result cache.
+
+run sends the requests through roulette.process_request, or lambda_function.lambda_handler as
+the Lambda runtime would call it, from --concurrency threads. Without --rate each thread sends
+its next request as soon as the last one is answered. With --rate, request n is due at
+n / rate seconds, and its latency is counted from when it was due, so time spent queueing behind
+slow requests is counted as well. The report gives p50/p95/p99/p999 latency, throughput, the
+results by exception type and the process's peak RSS. It also gives the memory allocated per
+request, from a sample of requests replayed afterwards under tracemalloc. With --baseline, a
+latency percentile more than --threshold slower than in a stored report is a regression, and
+the exit status is non-zero.
+"""
+import argparse
+import copy
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from load_client import percentile
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+TARGETS = ('process_request', 'lambda')
+POINTS = (50, 95, 99, 99.9)
+
+
+def invalid_request(request, rng):
+    """A copy of a request the schema rejects, so validation falls back to jsonschema for its error."""
+    request = copy.deepcopy(request)
+    kind = rng.randrange(4)
+    if kind == 0 or not request['bets']:
+        request['wheel'] = 'Martian'
+    elif kind == 1:
+        request['hash'] = request['hash'][:-1]
+    elif kind == 2:
+        request['bets'][rng.randrange(len(request['bets']))]['wager'] = 0
+    else:
+        request['bets'][rng.randrange(len(request['bets']))]['location'] = 'purple'
+    return request
+
+
+def synthesize(template, count, bets=(1, 60), american=0.25, invalid=0.0, seed=0):
+    """Requests built from a template request's table and bets, as a configurable mix."""
+    rng = random.Random(seed)
+    european = template['bets']
+    no_sectors = [bet for bet in european if bet['type'] != 'sector']
+    for _ in range(count):
+        is_american = rng.random() < american
+        pool = no_sectors if is_american else european
+        request = dict(template, hash=rng.randbytes(32).hex(), wheel='American' if is_american else 'European',
+                       bets=[rng.choice(pool) for _ in range(rng.randint(*bets))])
+        yield invalid_request(request, rng) if rng.random() < invalid else request
+
+
+def read_requests(path):
+    """The lines of an NDJSON request file, as text, skipping blank lines."""
+    with open(path) as f:
+        return [line for line in f if line.strip()]
+
+
+def load_target(target):
+    """A function answering a request through the target; it returns the result's exception type, if any."""
+    if target == 'process_request':
+        from roulette import process_request
+
+        def call(request):
+            text = process_request(request)
+            # Results are only decoded to read their exception type
+            if '"exception"' not in text:
+                return None
+            result = json.loads(text)
+            return result['exception']['type'] if isinstance(result, dict) and 'exception' in result else None
+        return call
+    if target == 'lambda':
+        from lambda_function import lambda_handler
+
+        def call(request):
+            result = lambda_handler(request, None)
+            return result['exception']['type'] if isinstance(result, dict) and 'exception' in result else None
+        return call
+    raise ValueError(f"Unknown target: {target}")
+
+
+def peak_rss_kib():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / 1024 if sys.platform == 'darwin' else peak
+
+
+def replay(call, lines, count=None, concurrency=1, rate=None):
+    """Send count requests (default: every line once, cycling through lines) from concurrency threads.
+
+    Returns the latencies in seconds, the count of results by exception type ('ok' for none) and
+    the elapsed time.
+    """
+    count = len(lines) if count is None else count
+    claims = itertools.count()
+    claim_lock = threading.Lock()
+    latencies = []
+    results = {}
+    started = time.perf_counter()
+
+    def worker():
+        latency = []
+        outcomes = {}
+        while True:
+            with claim_lock:
+                index = next(claims)
+            if index >= count:
+                break
+            request = json.loads(lines[index % len(lines)])
+            if rate:
+                begun = started + index / rate
+                delay = begun - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                begun = time.perf_counter()
+            try:
+                outcome = call(request)
+            except Exception as e:
+                outcome = str(type(e))
+            latency.append(time.perf_counter() - begun)
+            outcome = outcome or 'ok'
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        with claim_lock:
+            latencies.extend(latency)
+            for outcome, seen in outcomes.items():
+                results[outcome] = results.get(outcome, 0) + seen
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, results, time.perf_counter() - started
+
+
+def allocations(call, lines, sample):
+    """Peak bytes allocated while answering each of a sample of the requests, and the blocks kept after."""
+    peaks = []
+    kept = []
+    tracemalloc.start()
+    try:
+        for line in lines[:sample]:
+            request = json.loads(line)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            blocks = sys.getallocatedblocks()
+            call(request)
+            peaks.append(tracemalloc.get_traced_memory()[1] - before)
+            kept.append(sys.getallocatedblocks() - blocks)
+    finally:
+        tracemalloc.stop()
+    ordered = sorted(peaks)
+    return {
+        'keptBlocksMean': sum(kept) / len(kept) if kept else None,
+        'peakKiB':        {str(point): percentile(ordered, point) / 1024 if ordered else None for point in POINTS},
+        'peakKiBMean':    sum(peaks) / len(peaks) / 1024 if peaks else None,
+        'sampled':        len(peaks),
+    }
+
+
+def run(lines, target='process_request', count=None, concurrency=1, rate=None, warmup=0, alloc_sample=100):
+    """Replay the request lines through a target and report on it."""
+    call = load_target(target)
+    if warmup:
+        replay(call, lines, warmup)
+    latencies, results, elapsed = replay(call, lines, count, concurrency, rate)
+    # Taken before the allocation sample, whose tracing costs memory of its own
+    peak_rss = peak_rss_kib()
+    ordered = sorted(latencies)
+    return {
+        'allocations':       allocations(call, lines, alloc_sample) if alloc_sample else None,
+        'concurrency':       concurrency,
+        'elapsedSeconds':    elapsed,
+        'latencyMs':         {str(point): percentile(ordered, point) * 1e3 if ordered else None for point in POINTS},
+        'latencyMsMax':      ordered[-1] * 1e3 if ordered else None,
+        'latencyMsMean':     sum(ordered) / len(ordered) * 1e3 if ordered else None,
+        'peakRssKiB':        peak_rss,
+        'rate':              rate,
+        'requests':          len(latencies),
+        'requestsPerSecond': len(latencies) / elapsed if elapsed else None,
+        'results':           dict(sorted(results.items())),
+        'target':            target,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Latency percentiles more than threshold (a fraction) slower than the baseline report's."""
+    regressions = {}
+    for point, latency in report['latencyMs'].items():
+        base = baseline.get('latencyMs', {}).get(point)
+        if base and latency is not None and latency > base * (1 + threshold):
+            regressions[point] = {'baseline': base, 'change': latency / base - 1, 'latencyMs': latency}
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    synthesize_parser = commands.add_parser('synthesize', help="write a request mix as NDJSON")
+    synthesize_parser.add_argument('--template', default='testRequest.json',
+                                   help="request to take the table and bets from")
+    synthesize_parser.add_argument('--count', type=int, default=10000)
+    synthesize_parser.add_argument('--bets', type=int, nargs=2, default=(1, 60), metavar=('MIN', 'MAX'),
+                                   help="bets per request, spread uniformly")
+    synthesize_parser.add_argument('--american', type=float, default=0.25, help="share of American wheel requests")
+    synthesize_parser.add_argument('--invalid', type=float, default=0.0, help="share of requests the schema rejects")
+    synthesize_parser.add_argument('--seed', type=int, default=0)
+    synthesize_parser.add_argument('--output', help="NDJSON file to write (default: stdout)")
+    run_parser = commands.add_parser('run', help="replay an NDJSON request file and report on it")
+    run_parser.add_argument('requests', help="NDJSON request file")
+    run_parser.add_argument('--target', choices=TARGETS, default='process_request')
+    run_parser.add_argument('--count', type=int, default=None, help="requests to send (default: each line once)")
+    run_parser.add_argument('--concurrency', type=int, default=1, help="threads sending requests")
+    run_parser.add_argument('--rate', type=float, default=None,
+                            help="requests per second (default: as fast as they are answered)")
+    run_parser.add_argument('--warmup', type=int, default=100, help="requests sent first, and not counted")
+    run_parser.add_argument('--alloc-sample', type=int, default=100,
+                            help="requests replayed under tracemalloc for the allocations (0 to skip)")
+    run_parser.add_argument('--output', help="also write the report to this file")
+    run_parser.add_argument('--baseline', help="report to compare the latency percentiles with")
+    run_parser.add_argument('--threshold', type=float, default=0.25,
+                            help="allowed slowdown against the baseline, as a fraction (default 0.25)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'synthesize':
+        with open(args.template) as f:
+            template = json.load(f)
+        out = open(args.output, 'w') if args.output else sys.stdout
+        try:
+            for request in synthesize(template, args.count, args.bets, args.american, args.invalid, args.seed):
+                out.write(json.dumps(request) + '\n')
+        finally:
+            if args.output:
+                out.close()
+        return 0
+
+    lines = read_requests(args.requests)
+    if not lines:
+        print(f"No requests in {args.requests}", file=sys.stderr)
+        return 1
+    report = run(lines, args.target, args.count, args.concurrency, args.rate, args.warmup, args.alloc_sample)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['threshold'] = args.threshold
+        report['regressions'] = compare(report, baseline, args.threshold)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=4, sort_keys=True)
+    print(json.dumps(report, indent=4, sort_keys=True))
+    for point, regression in report.get('regressions', {}).items():
+        print("p{0}: {1:.1%} slower than the baseline".format(point, regression['change']), file=sys.stderr)
+    return 1 if report.get('regressions') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
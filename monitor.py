@@ -0,0 +1,333 @@
+"""Streaming fairness monitor for a wheel's winners, to flag a misbehaving source of hashes early.
+
+The monitor takes winners one at a time, as the winner dicts Table.choose produces or as pocket
+numbers, or in batches of pocket numbers (a list or a NumPy array) to replay history. It keeps:
+
+    counts     how often every pocket won, from which the color, parity, dozen and column
+               frequencies follow
+    windows    for each sliding window size, the last winners in a ring buffer with their counts,
+               and the chi-square statistic of those counts against a fair wheel
+    streaks    the current and longest run of the same pocket, color, parity, dozen and column
+
+Every winner costs the same to add however long the monitor has been running, and memory is
+bounded by the window sizes. alerts() flags a window whose chi-square is less likely than alpha
+on a fair wheel, and a streak expected fewer than alpha times over the winners seen so far.
+
+    python -m monitor hashes.txt --wheel American --window 370 --window 3700
+"""
+import argparse
+import json
+import math
+import sys
+from array import array
+from exposure import pocket_location
+from verifier import digest_numbers, pocket_count, read_binary, read_text, winning_number
+from wheel import Wheel
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+WINDOWS = (370, 3700)
+ALPHA = 1e-4
+ATTRIBUTES = ('pocket', 'color', 'parity', 'dozen', 'column')
+
+
+def chi_square_survival(statistic, degrees):
+    """The chance that a chi-square variable with the given degrees of freedom is at least statistic."""
+    if statistic <= 0:
+        return 1.0
+    a, x = degrees / 2, statistic / 2
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        # Series for the lower regularized gamma function
+        term = total = 1 / a
+        n = a
+        while abs(term) > abs(total) * 1e-15:
+            n += 1
+            term *= x / n
+            total += term
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    # Continued fraction for the upper regularized gamma function (modified Lentz)
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 1000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def categories(wheel):
+    """For each attribute, the category of every pocket number and the names of the categories."""
+    pockets = pocket_count(wheel)
+    red = set(Wheel.get_red())
+    green = set(wheel.get_green())
+    names = {
+        'pocket': [str(pocket_location(number)) for number in range(pockets)],
+        'color':  ['Green', 'Red', 'Black'],
+        'parity': ['Zero', 'Odd', 'Even'],
+        'dozen':  ['Zero', '1st', '2nd', '3rd'],
+        'column': ['Zero', '1st', '2nd', '3rd'],
+    }
+    of = {
+        'pocket': list(range(pockets)),
+        'color':  [0 if number in green else 1 if number in red else 2 for number in range(pockets)],
+        'parity': [0 if number in green else 1 if number % 2 else 2 for number in range(pockets)],
+        'dozen':  [0 if number in green else (number - 1) // 12 + 1 for number in range(pockets)],
+        'column': [0 if number in green else (number - 1) % 3 + 1 for number in range(pockets)],
+    }
+    return of, names
+
+
+def chi_square(counts, probabilities, total):
+    """Pearson's chi-square statistic of counts against the probability of each cell."""
+    return sum(count * count / probability for count, probability in zip(counts, probabilities)) / total - total
+
+
+class Window(object):
+    """The last size winners, with their counts and running sum of squared counts."""
+
+    def __init__(self, size, pockets):
+        self.size = size
+        self.pockets = pockets
+        self.ring = array('B', bytes(size))
+        self.position = 0
+        self.filled = 0
+        self.counts = [0] * pockets
+        self.squares = 0
+
+    def add(self, number):
+        counts = self.counts
+        if self.filled == self.size:
+            oldest = self.ring[self.position]
+            counts[oldest] -= 1
+            self.squares -= 2 * counts[oldest] + 1
+        else:
+            self.filled += 1
+        self.squares += 2 * counts[number] + 1
+        counts[number] += 1
+        self.ring[self.position] = number
+        self.position = (self.position + 1) % self.size
+
+    def reset(self, numbers):
+        """Fill the window with the last size winners of numbers."""
+        last = list(numbers[-self.size:])
+        self.ring = array('B', last + [0] * (self.size - len(last)))
+        self.filled = len(last)
+        self.position = self.filled % self.size
+        self.counts = [0] * self.pockets
+        for number in last:
+            self.counts[number] += 1
+        self.squares = sum(count * count for count in self.counts)
+
+    @property
+    def chi_square(self):
+        # sum((c - n/k)^2 / (n/k)) = k * sum(c^2) / n - n
+        return self.pockets * self.squares / self.filled - self.filled if self.filled else 0.0
+
+
+class FairnessMonitor(object):
+    def __init__(self, wheel: Wheel = Wheel.EUROPEAN, windows=WINDOWS, alpha=ALPHA):
+        self.wheel = Wheel(wheel)
+        self.pockets = pocket_count(self.wheel)
+        self.alpha = alpha
+        self.category_of, self.category_names = categories(self.wheel)
+        self.probabilities = {}
+        for attribute in ATTRIBUTES:
+            cells = [0] * len(self.category_names[attribute])
+            for category in self.category_of[attribute]:
+                cells[category] += 1
+            self.probabilities[attribute] = [cell / self.pockets for cell in cells]
+        # Per pocket, the category of every attribute, in ATTRIBUTES order
+        self.pocket_categories = list(zip(*(self.category_of[attribute] for attribute in ATTRIBUTES)))
+        self.counts = [0] * self.pockets
+        self.total = 0
+        self.windows = [Window(size, self.pockets) for size in windows]
+        self.runs = [[None, 0] for _ in ATTRIBUTES]
+        self.longest = [[None, 0] for _ in ATTRIBUTES]
+
+    def observe(self, winner):
+        """Add a winner dict as Table.choose produces it."""
+        location = winner['location']
+        self.add(37 if location == '00' else int(location))
+
+    def add(self, number):
+        if not 0 <= number < self.pockets:
+            raise ValueError("No pocket {0} on the {1} wheel".format(number, self.wheel.value))
+        self.counts[number] += 1
+        self.total += 1
+        for window in self.windows:
+            window.add(number)
+        for run, longest, category in zip(self.runs, self.longest, self.pocket_categories[number]):
+            if run[0] == category:
+                run[1] += 1
+            else:
+                run[0] = category
+                run[1] = 1
+            if run[1] > longest[1]:
+                longest[0] = category
+                longest[1] = run[1]
+
+    def add_numbers(self, numbers):
+        """Add a batch of pocket numbers, a list or a NumPy array, in the order they won."""
+        if not len(numbers):
+            return
+        if numpy is None or len(numbers) < max((window.size for window in self.windows), default=0):
+            for number in (numbers.tolist() if hasattr(numbers, 'tolist') else numbers):
+                self.add(number)
+            return
+        numbers = numpy.asarray(numbers, dtype=numpy.int64)
+        if numbers.min() < 0 or numbers.max() >= self.pockets:
+            raise ValueError("Pocket numbers must be below {0} on the {1} wheel".format(self.pockets,
+                                                                                      self.wheel.value))
+        for number, count in enumerate(numpy.bincount(numbers, minlength=self.pockets).tolist()):
+            self.counts[number] += count
+        self.total += len(numbers)
+        for window in self.windows:
+            window.reset(numbers.tolist() if len(numbers) < window.size else numbers[-window.size:].tolist())
+        for index, attribute in enumerate(ATTRIBUTES):
+            self.add_runs(index, numpy.asarray(self.category_of[attribute])[numbers])
+
+    def add_runs(self, index, values):
+        """Extend the runs of one attribute over a batch of its categories."""
+        run, longest = self.runs[index], self.longest[index]
+        starts = numpy.flatnonzero(numpy.diff(values)) + 1
+        bounds = numpy.concatenate(([0], starts, [len(values)]))
+        lengths = numpy.diff(bounds)
+        firsts = values[bounds[:-1]]
+        # The batch's first run continues the current one when it is of the same category
+        if run[0] == firsts[0]:
+            lengths[0] += run[1]
+        best = int(numpy.argmax(lengths))
+        if lengths[best] > longest[1]:
+            longest[0] = int(firsts[best])
+            longest[1] = int(lengths[best])
+        run[0] = int(firsts[-1])
+        run[1] = int(lengths[-1])
+
+    def category_counts(self, attribute, counts):
+        cells = [0] * len(self.category_names[attribute])
+        for number, count in enumerate(counts):
+            cells[self.category_of[attribute][number]] += count
+        return cells
+
+    def frequencies(self, counts, total):
+        result = {}
+        for attribute in ATTRIBUTES[1:]:
+            cells = self.category_counts(attribute, counts)
+            result[attribute] = {name: cell / total if total else 0.0
+                                 for name, cell in zip(self.category_names[attribute], cells)}
+        return result
+
+    def test(self, attribute, counts, total):
+        """(chi-square, degrees of freedom, p-value) of counts against a fair wheel."""
+        cells = counts if attribute == 'pocket' else self.category_counts(attribute, counts)
+        statistic = chi_square(cells, self.probabilities[attribute], total) if total else 0.0
+        degrees = len(cells) - 1
+        return statistic, degrees, chi_square_survival(statistic, degrees)
+
+    def window_json(self, window):
+        tests = {}
+        for attribute in ATTRIBUTES:
+            if attribute == 'pocket':
+                statistic = window.chi_square
+                degrees = self.pockets - 1
+                p = chi_square_survival(statistic, degrees)
+            else:
+                statistic, degrees, p = self.test(attribute, window.counts, window.filled)
+            tests[attribute] = {'chiSquare': statistic, 'degreesOfFreedom': degrees, 'pValue': p}
+        return {'filled': window.filled, 'size': window.size, 'tests': tests}
+
+    def streak_expectation(self, index, category, length):
+        """Expected number of runs at least length long of a category over the winners seen so far."""
+        p = self.probabilities[ATTRIBUTES[index]][category]
+        return self.total * (1 - p) * p ** length
+
+    def streaks_json(self):
+        names = self.category_names
+        return {attribute: {
+            'current':  {'length': run[1], 'value': None if run[0] is None else names[attribute][run[0]]},
+            'expected': self.streak_expectation(index, longest[0], longest[1]) if longest[1] else None,
+            'longest':  {'length': longest[1], 'value': None if longest[0] is None else names[attribute][longest[0]]},
+        } for index, (attribute, run, longest) in enumerate(zip(ATTRIBUTES, self.runs, self.longest))}
+
+    def alerts(self):
+        """What looks unfair: windows, full ones only, and streaks less likely than alpha."""
+        alerts = []
+        for window in self.windows:
+            if window.filled < window.size:
+                continue
+            for attribute, test in self.window_json(window)['tests'].items():
+                if test['pValue'] < self.alpha:
+                    alerts.append({'attribute': attribute, 'kind': 'window', 'pValue': test['pValue'],
+                                   'window': window.size})
+        for index, (attribute, longest) in enumerate(zip(ATTRIBUTES, self.longest)):
+            if longest[1] > 1:
+                expected = self.streak_expectation(index, longest[0], longest[1])
+                if expected < self.alpha:
+                    alerts.append({'attribute': attribute, 'expected': expected, 'kind': 'streak',
+                                   'length': longest[1], 'value': self.category_names[attribute][longest[0]]})
+        return alerts
+
+    def get_json_dict(self):
+        statistic, degrees, p = self.test('pocket', self.counts, self.total)
+        return {
+            'alerts':      self.alerts(),
+            'chiSquare':   {'chiSquare': statistic, 'degreesOfFreedom': degrees, 'pValue': p},
+            'counts':      {str(pocket_location(number)): count for number, count in enumerate(self.counts)},
+            'frequencies': self.frequencies(self.counts, self.total),
+            'streaks':     self.streaks_json(),
+            'total':       self.total,
+            'wheel':       self.wheel.value,
+            'windows':     [self.window_json(window) for window in self.windows],
+        }
+
+
+def monitor_file(path, wheel=Wheel.EUROPEAN, windows=WINDOWS, alpha=ALPHA, binary=False, chunk_size=1 << 16):
+    """Replay the hashes in a file, as verifier reads them, through a monitor."""
+    monitor = FairnessMonitor(wheel, windows, alpha)
+    if binary:
+        for _, buffer in read_binary(path, chunk_size):
+            numbers = digest_numbers(buffer, monitor.pockets)
+            monitor.add_numbers(numpy.asarray(numbers) if numpy is not None else numbers)
+        return monitor
+    numbers = []
+    for _, hash, _ in read_text(path):
+        numbers.append(winning_number(hash, monitor.pockets))
+        if len(numbers) == chunk_size:
+            monitor.add_numbers(numbers)
+            numbers = []
+    monitor.add_numbers(numbers)
+    return monitor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a stream of hashes for an unfair wheel.")
+    parser.add_argument('path', help="hashes, one per line, as verifier reads them")
+    parser.add_argument('--wheel', choices=[wheel.value for wheel in Wheel], default=Wheel.EUROPEAN.value)
+    parser.add_argument('--binary', action='store_true', help="the file holds raw 32 byte digests")
+    parser.add_argument('--window', type=int, action='append', help="sliding window size (repeatable)")
+    parser.add_argument('--alpha', type=float, default=ALPHA)
+    args = parser.parse_args(argv)
+    monitor = monitor_file(args.path, Wheel(args.wheel), tuple(args.window or WINDOWS), args.alpha, args.binary)
+    result = monitor.get_json_dict()
+    json.dump(result, sys.stdout, indent=4)
+    print()
+    return 1 if result['alerts'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Packed bets: a compact alternative to the JSON list of bets, for clients placing many chips.
+
+A request can carry its bets as two parallel arrays instead of, or as well as, a list of bets:
+
+    {"hash": "...", "wheel": "European",
+     "packed": {"outcomes": "<base64 of little-endian uint16 outcome ids>",
+                "wagers":   "<base64 of little-endian uint32 wagers>"}}
+
+An outcome id is the position of the outcome in its wheel's layout, and is stable for a wheel. The
+ids are published by the catalog (python -m packed_bets catalog --wheel European), which also
+gives the bet type each outcome is limit-checked as. The arrays are decoded straight into the bet
+book, without a dict per bet, and go through the same limit checks and settlement as JSON bets.
+A packed bet is reported with its type and outcome, and no location. Packed arrays can be built
+with the array module or NumPy (numpy.asarray(ids, '<u2').tobytes()), or from JSON bets with
+pack_bets():
+
+    python -m packed_bets pack testRequest.json
+"""
+import argparse
+import base64
+import binascii
+import copy
+import json
+import sys
+from array import array
+from table import BadBetException, Table, get_layout
+from wheel import Wheel
+
+OUTCOME_TYPECODE = 'H'
+WAGER_TYPECODE = 'I' if array('I').itemsize == 4 else 'L'
+
+
+def decode_column(text, typecode, name):
+    try:
+        data = base64.b64decode(text, validate=True)
+    except (binascii.Error, TypeError) as e:
+        raise BadBetException(f"Packed {name} are not base64: {e}")
+    column = array(typecode)
+    if len(data) % column.itemsize:
+        raise BadBetException(f"Packed {name} are {len(data)} bytes, not whole {column.itemsize} byte values")
+    column.frombytes(data)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column
+
+
+def decode(packed):
+    """The (outcome ids, wagers) arrays of a request's packed bets."""
+    outcome_ids = decode_column(packed['outcomes'], OUTCOME_TYPECODE, 'outcomes')
+    wagers = decode_column(packed['wagers'], WAGER_TYPECODE, 'wagers')
+    if len(outcome_ids) != len(wagers):
+        raise BadBetException(f"{len(outcome_ids)} packed outcome ids for {len(wagers)} wagers")
+    return outcome_ids, wagers
+
+
+def encode_column(values, typecode):
+    column = array(typecode, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return base64.b64encode(column.tobytes()).decode('ascii')
+
+
+def encode(outcome_ids, wagers):
+    """The packed bets of parallel sequences of outcome ids and integer wagers."""
+    return {
+        'outcomes': encode_column(outcome_ids, OUTCOME_TYPECODE),
+        'wagers':   encode_column(wagers, WAGER_TYPECODE),
+    }
+
+
+def pack_bets(wheel: Wheel, bets, limits=None):
+    """Packed bets placing the same wagers on the same outcomes as a list of JSON bets.
+
+    Neighbors and sector bets are packed as the bets they expand to, so their wagers must
+    divide evenly. Locations that resolve to no outcome cannot be packed.
+    """
+    book = Table(wheel=wheel, limits=limits, bets=copy.deepcopy(bets)).book
+    if -1 in book.outcome_ids:
+        raise ValueError("A bet's location resolves to no outcome")
+    if any(not wager.is_integer() for wager in book.wagers):
+        raise ValueError("Only whole wagers can be packed")
+    return encode(book.outcome_ids, (int(wager) for wager in book.wagers))
+
+
+def outcome_catalog(wheel: Wheel):
+    """Every outcome of a wheel by id, with the bet type its wagers are limit-checked as."""
+    layout = get_layout(wheel)
+    return [{
+        'id':   outcome.id,
+        'name': outcome.name,
+        'odds': outcome.odds,
+        'type': type,
+    } for outcome, type in zip(layout.outcome_list, layout.outcome_types)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    catalog = commands.add_parser('catalog', help="print the outcome ids of a wheel")
+    catalog.add_argument('--wheel', default=Wheel.EUROPEAN.value, choices=[wheel.value for wheel in Wheel])
+    pack = commands.add_parser('pack', help="print a JSON request with its bets packed")
+    pack.add_argument('request', help="JSON request file")
+    args = parser.parse_args(argv)
+
+    if args.command == 'catalog':
+        print(json.dumps(outcome_catalog(Wheel(args.wheel)), indent=2))
+        return 0
+    with open(args.request) as f:
+        request = json.load(f)
+    try:
+        packed = pack_bets(Wheel(request.get('wheel', Wheel.EUROPEAN.value)), request.pop('bets', []),
+                           request.get('table'))
+    except Exception as e:
+        print(f"Unable to pack {args.request}: {e!r}", file=sys.stderr)
+        return 1
+    request['packed'] = packed
+    print(json.dumps(request, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
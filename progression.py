@@ -0,0 +1,265 @@
+"""Betting progressions simulated over many independent sessions at once.
+
+Every session repeats one announced bet, staked at a whole number of base wagers chosen by a
+strategy after each spin. Sessions advance in lockstep, one spin for all of them per step. A
+session ends when it cannot afford its next stake (ruin), when the table would reject the stake
+(limit), when it reaches its profit target, or after max_spins.
+
+Since every stake is a multiple of the base wager, a spin's result is the multiple times the base
+bet's net result on the winning pocket. Whether the table accepts a stake is decided by building a
+Table with it, so limits behave exactly as in a round.
+
+With NumPy the sessions' balances, peaks, states and lengths are held in arrays and each step
+updates them all at once. The strategy and the limit check are then asked once per distinct state
+in the step rather than once per session, so strategies are taken to be functions of the state
+alone. Pockets are drawn from the same random.Random in the same order either way, so a seed gives
+the same result with or without NumPy.
+"""
+import copy
+import random
+from abc import ABC, abstractmethod
+from table import BadBetException, Table
+from wheel import Wheel
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+ENDINGS = ('limit', 'ruin', 'spins', 'target')
+
+
+class Strategy(ABC):
+    """A progression over stakes counted in base wagers.
+
+    start() gives a session's initial state, advance() the state after a spin, and units() the
+    stake for a state. Every strategy must define advance(), so an incomplete one cannot be built.
+    """
+
+    def start(self):
+        return 1
+
+    @abstractmethod
+    def advance(self, state, won):
+        pass
+
+    def units(self, state):
+        return state
+
+
+class Flat(Strategy):
+    def advance(self, state, won):
+        return 1
+
+
+class Martingale(Strategy):
+    def advance(self, state, won):
+        return 1 if won else state * 2
+
+
+class DAlembert(Strategy):
+    def advance(self, state, won):
+        return max(state - 1, 1) if won else state + 1
+
+
+class Fibonacci(Strategy):
+    """State is a position in the sequence: one step on after a loss, two back after a win."""
+
+    def __init__(self):
+        self.sequence = [1, 1]
+
+    def start(self):
+        return 0
+
+    def advance(self, state, won):
+        return max(state - 2, 0) if won else state + 1
+
+    def units(self, state):
+        while len(self.sequence) <= state:
+            self.sequence.append(self.sequence[-1] + self.sequence[-2])
+        return self.sequence[state]
+
+
+class Custom(Strategy):
+    """Wrap a callable (units, won) -> next units."""
+
+    def __init__(self, progression):
+        self.progression = progression
+
+    def advance(self, state, won):
+        return int(self.progression(state, won))
+
+
+STRATEGIES = {
+    'flat':       Flat,
+    'martingale': Martingale,
+    'dalembert':  DAlembert,
+    'fibonacci':  Fibonacci,
+}
+
+
+def get_strategy(strategy):
+    if isinstance(strategy, Strategy):
+        return strategy
+    if callable(strategy):
+        return Custom(strategy)
+    return STRATEGIES[strategy.lower()]()
+
+
+def percentiles(values, points=(50, 90, 99)):
+    ordered = sorted(values)
+    if not ordered:
+        return {str(point): None for point in points}
+    return {str(point): ordered[min(len(ordered) - 1, len(ordered) * point // 100)] for point in points}
+
+
+def summary(values):
+    return {
+        'max':         max(values) if values else None,
+        'mean':        sum(values) / len(values) if values else None,
+        'min':         min(values) if values else None,
+        'percentiles': percentiles(values),
+    }
+
+
+class SessionSimulator(object):
+    def __init__(self, bet, wheel=Wheel.EUROPEAN, table=None, on_limit='stop'):
+        if on_limit not in ('stop', 'cap'):
+            raise ValueError(f"Unknown limit handling: {on_limit}")
+        self.bet = bet
+        self.wheel = Wheel(wheel)
+        self.limits = table
+        self.on_limit = on_limit
+        base = Table(wheel=self.wheel, limits=self.limits, bets=[copy.deepcopy(bet)])
+        payouts, on_table = base.book.pocket_totals()
+        self.base_wager = base.book.placed
+        self.net = [payout - (base.book.placed - kept) for payout, kept in zip(payouts, on_table)]
+        self.accepted = {1: True}
+
+    def accepts(self, units):
+        """Whether the table takes the bet at this many base wagers, as a round would decide."""
+        if units not in self.accepted:
+            try:
+                bet = dict(copy.deepcopy(self.bet), wager=self.bet['wager'] * units)
+                Table(wheel=self.wheel, limits=self.limits, bets=[bet])
+                self.accepted[units] = True
+            except BadBetException:
+                self.accepted[units] = False
+        return self.accepted[units]
+
+    def allowed(self, units):
+        """The stake actually placed for a wanted stake, or None when the session has to stop."""
+        if self.accepts(units):
+            return units
+        if self.on_limit == 'cap':
+            # The base stake is always accepted, so search down for the largest stake that is
+            low, high = 1, units
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self.accepts(middle):
+                    low = middle
+                else:
+                    high = middle
+            return low
+        return None
+
+    def run(self, strategy, sessions=1000, bankroll=1000, max_spins=1000, target=None, seed=0):
+        strategy = get_strategy(strategy)
+        rng = random.Random(seed)
+        run = self.run_lists if numpy is None else self.run_arrays
+        balances, drawdowns, lengths, endings = run(strategy, sessions, bankroll, max_spins, target, rng)
+
+        distribution = {}
+        for length in lengths:
+            distribution[length] = distribution.get(length, 0) + 1
+        return {
+            'bankroll':   summary(balances),
+            'drawdown':   summary(drawdowns),
+            'endings':    {ending: endings.count(ending) for ending in ENDINGS},
+            'length':     dict(summary(lengths), distribution=sorted(distribution.items())),
+            'riskOfRuin': endings.count('ruin') / sessions if sessions else 0.0,
+            'seed':       seed,
+            'sessions':   sessions,
+        }
+
+    def run_lists(self, strategy, sessions, bankroll, max_spins, target, rng):
+        """Every session's final balance, drawdown, length and ending, one session at a time."""
+        pockets = range(len(self.net))
+        balances = [bankroll] * sessions
+        peaks = [bankroll] * sessions
+        drawdowns = [0] * sessions
+        states = [strategy.start()] * sessions
+        lengths = [0] * sessions
+        endings = ['spins'] * sessions
+        active = list(range(sessions))
+        for _ in range(max_spins):
+            if not active:
+                break
+            still_active = []
+            for session, pocket in zip(active, rng.choices(pockets, k=len(active))):
+                units = self.allowed(strategy.units(states[session]))
+                if units is None:
+                    endings[session] = 'limit'
+                    continue
+                if units * self.base_wager > balances[session]:
+                    endings[session] = 'ruin'
+                    continue
+                result = units * self.net[pocket]
+                balance = balances[session] = balances[session] + result
+                lengths[session] += 1
+                if balance > peaks[session]:
+                    peaks[session] = balance
+                elif peaks[session] - balance > drawdowns[session]:
+                    drawdowns[session] = peaks[session] - balance
+                states[session] = strategy.advance(states[session], result > 0)
+                if target is not None and balance - bankroll >= target:
+                    endings[session] = 'target'
+                    continue
+                still_active.append(session)
+            active = still_active
+        return balances, drawdowns, lengths, endings
+
+    def run_arrays(self, strategy, sessions, bankroll, max_spins, target, rng):
+        """As run_lists, with the active sessions advanced together as arrays."""
+        pockets = range(len(self.net))
+        net = numpy.asarray(self.net)
+        balances = numpy.full(sessions, bankroll, dtype=numpy.result_type(net, bankroll))
+        peaks = balances.copy()
+        drawdowns = numpy.zeros(sessions, dtype=balances.dtype)
+        lengths = numpy.zeros(sessions, dtype=numpy.int64)
+        endings = numpy.full(sessions, ENDINGS.index('spins'))
+        # Only the active sessions' states are kept, in the order of active
+        states = numpy.array([strategy.start()] * sessions)
+        active = numpy.arange(sessions)
+        for _ in range(max_spins):
+            if not len(active):
+                break
+            drawn = numpy.array(rng.choices(pockets, k=len(active)))
+            distinct, inverse = numpy.unique(states, return_inverse=True)
+            distinct = distinct.tolist()
+            # 0 stands for a stake the table will not take
+            units = numpy.array([self.allowed(strategy.units(state)) or 0 for state in distinct])[inverse]
+            limited = units == 0
+            endings[active[limited]] = ENDINGS.index('limit')
+            ruined = ~limited & (units * self.base_wager > balances[active])
+            endings[active[ruined]] = ENDINGS.index('ruin')
+            playing = ~(limited | ruined)
+            active, inverse = active[playing], inverse[playing]
+            result = units[playing].astype(numpy.int64) * net[drawn[playing]]
+            balance = balances[active] = balances[active] + result
+            lengths[active] += 1
+            peaks[active] = numpy.maximum(peaks[active], balance)
+            drawdowns[active] = numpy.maximum(drawdowns[active], peaks[active] - balance)
+            won = result > 0
+            states = numpy.where(won, numpy.array([strategy.advance(state, True) for state in distinct])[inverse],
+                                 numpy.array([strategy.advance(state, False) for state in distinct])[inverse])
+            if target is not None:
+                reached = balance - bankroll >= target
+                endings[active[reached]] = ENDINGS.index('target')
+                active, states = active[~reached], states[~reached]
+        return balances.tolist(), drawdowns.tolist(), lengths.tolist(), [ENDINGS[code] for code in endings.tolist()]
+
+
+def simulate_sessions(bet, strategy, wheel=Wheel.EUROPEAN, table=None, on_limit='stop', **kwargs):
+    """Run a progression of one announced bet over many sessions; see SessionSimulator.run."""
+    return SessionSimulator(bet, wheel=wheel, table=table, on_limit=on_limit).run(strategy, **kwargs)
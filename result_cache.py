@@ -0,0 +1,256 @@
+"""Cache of spin results, so a request that is retried is answered without settling it again.
+
+A request that names its hash is deterministic, so its result can be stored under a fingerprint of
+the request and served again. The fingerprint is taken from a canonical form of the validated
+request, in which key order and the spellings the engine treats alike (a pocket as "25" or 25, a
+straightUp location as 25 or [25], split pockets in either order, outside and sector names in any
+case, limits left out or given as their defaults) make no difference. An equivalent request is
+answered with the result stored for the first one: the bets, limits and locations it echoes are
+spelled as the first request spelled them. That is part of the cache's contract, as the results
+only differ in those spellings. Requests without a hash spin a random number and are never
+cached.
+
+The cache is off unless configured:
+
+    import result_cache
+    result_cache.configure(max_size=10000, ttl=300, path='/tmp/roulette-cache.sqlite')
+
+Results are kept in memory, least recently used first out, and expire ttl seconds after they
+were stored. With a path they are also written to a SQLite file, which outlives the process and
+is shared by every process using the same path, and is trimmed to the same ttl and max_size. Only
+successful results are cached. A cache can be shared by threads. The same configuration can be
+taken from the environment with configure_from_environment():
+
+    ROULETTE_CACHE_SIZE  results kept in memory (the cache is off when unset or 0)
+    ROULETTE_CACHE_TTL   seconds a result is served for (default 300)
+    ROULETTE_CACHE_PATH  SQLite file to also store results in
+"""
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from table import Layout, Table
+
+# Bet types whose location is a set of pockets, looked up by their pocket mask
+POCKET_SET_TYPES = frozenset(Layout.search_keys)
+
+
+def canonical_pocket(pocket):
+    # "25" and 25 name the same pocket, but "07" is looked up as written by straightUp bets
+    if isinstance(pocket, str) and pocket.isdigit() and str(int(pocket)) == pocket:
+        return int(pocket)
+    return pocket
+
+
+def canonical_location(type, location):
+    if type == 'straightUp' or type.startswith('neighbors'):
+        # Only the last pocket of a list is bet on
+        if isinstance(location, list) and location:
+            location = location[-1]
+        return canonical_pocket(location)
+    if type in POCKET_SET_TYPES and isinstance(location, list):
+        # Pockets are looked up as a set, so their order does not matter
+        return sorted((canonical_pocket(pocket) for pocket in location),
+                      key=lambda pocket: (isinstance(pocket, str), pocket))
+    if type in ('first4', 'first5'):
+        return None
+    if type == 'outside' and isinstance(location, str):
+        return location.capitalize()
+    if type == 'sector' and isinstance(location, str):
+        return location.lower()
+    return location
+
+
+def canonical_request(request):
+    """The request with every spelling the engine treats alike reduced to one."""
+    defaults = {name: limit.get_json_dict() for name, limit in Table.get_defaults().items()}
+    limits = dict(defaults)
+    for name, limit in (request.get('table') or {}).items():
+        limits[name] = dict({'max': None, 'min': 1}, **limit) if isinstance(limit, dict) else limit
+    bets = []
+    for bet in request.get('bets') or ():
+        bet = dict(bet)
+        type = bet.get('type')
+        if isinstance(type, str):
+            bet['location'] = canonical_location(type, bet.get('location'))
+        bet.setdefault('wager', 1)
+        bets.append(bet)
+    canonical = {
+        'bets':    bets,
+        'hash':    request['hash'].lower(),
+        'netting': bool(request.get('netting', False)),
+        'packed':  request.get('packed'),
+        'table':   limits,
+        'wheel':   request.get('wheel', 'European'),
+    }
+    # Any other key is kept as given, so a request the engine treats differently never shares a fingerprint
+    canonical.update({key: value for key, value in request.items() if key not in canonical})
+    return canonical
+
+
+def fingerprint(request):
+    """Hex digest identifying a validated request that names its hash."""
+    canonical = json.dumps(canonical_request(request), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class CachedResult(dict):
+    """A result served from the cache, decoded afresh from the JSON it was stored as, which it can reuse."""
+    __slots__ = ('text',)
+
+    def to_json(self):
+        # A caller can have changed its copy since, such as adding the request's timing
+        if self != json.loads(self.text):
+            return json.dumps(self)
+        return self.text
+
+
+class DiskStore(object):
+    """Results stored as JSON in a SQLite file, keyed by fingerprint."""
+
+    def __init__(self, path):
+        # Imported here so that cold starts with the cache off do not pay for it
+        import sqlite3
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                "(fingerprint TEXT PRIMARY KEY, stored REAL NOT NULL, result TEXT NOT NULL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS results_stored ON results (stored)")
+
+    def get(self, key, oldest):
+        """(stored time, JSON) of a result stored after oldest, or None."""
+        return self.connection.execute("SELECT stored, result FROM results WHERE fingerprint = ? AND stored > ?",
+                                       (key, oldest)).fetchone()
+
+    def put(self, key, stored, text):
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, stored, text))
+
+    def purge(self, oldest):
+        """Delete the results stored no later than oldest; returns how many were deleted."""
+        return self.connection.execute("DELETE FROM results WHERE stored <= ?", (oldest,)).rowcount
+
+    def trim(self, oldest, max_size):
+        """Purge the results stored no later than oldest, then all but the max_size newest; returns how many went."""
+        deleted = self.purge(oldest)
+        return deleted + self.connection.execute(
+            "DELETE FROM results WHERE fingerprint IN "
+            "(SELECT fingerprint FROM results ORDER BY stored DESC LIMIT -1 OFFSET ?)", (max_size,)).rowcount
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+class ResultCache(object):
+    """LRU cache of results in memory, bounded by max_size, with results expiring after ttl seconds.
+
+    Each entry is [stored time, result as JSON]; every hit decodes its own copy. The disk store is
+    trimmed to the same ttl and max_size when it is opened and every trim_every writes after. A
+    lock keeps the entries and counts consistent when threads share the cache.
+    """
+    trim_every = 100
+
+    def __init__(self, max_size=10000, ttl=300, path=None, clock=time.time):
+        import threading
+        self.lock = threading.Lock()
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.store = DiskStore(path) if path else None
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.disk_hits = self.expired = self.evicted = 0
+        self.writes = 0
+        if self.store is not None:
+            self.store.trim(clock() - ttl, max_size)
+
+    def key(self, request):
+        """The fingerprint to cache a validated request under, or None when it has no hash."""
+        if not request.get('hash'):
+            return None
+        return fingerprint(request)
+
+    def get(self, key):
+        """A CachedResult copy of the result stored under key, or None."""
+        with self.lock:
+            now = self.clock()
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] >= self.ttl:
+                del self.entries[key]
+                self.expired += 1
+                entry = None
+            if entry is not None:
+                self.entries.move_to_end(key)
+            elif self.store is not None:
+                found = self.store.get(key, now - self.ttl)
+                if found is not None:
+                    stored, text = found
+                    entry = self.remember(key, [stored, text])
+                    self.disk_hits += 1
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        # Responses can be changed by callers, so each gets its own copy
+        result = CachedResult(json.loads(entry[1]))
+        result.text = entry[1]
+        return result
+
+    def put(self, key, result):
+        text = json.dumps(result)
+        with self.lock:
+            entry = self.remember(key, [self.clock(), text])
+            if self.store is not None:
+                self.store.put(key, entry[0], entry[1])
+                self.writes += 1
+                if self.writes % self.trim_every == 0:
+                    self.store.trim(entry[0] - self.ttl, self.max_size)
+
+    def remember(self, key, entry):
+        # Called with the lock held
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evicted += 1
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_json_dict(self):
+        return {
+            'diskHits': self.disk_hits,
+            'evicted':  self.evicted,
+            'expired':  self.expired,
+            'hits':     self.hits,
+            'misses':   self.misses,
+            'size':     len(self.entries),
+        }
+
+
+current = None
+
+
+def configure(**kwargs):
+    """Replace the engine's result cache; configure() with no arguments switches it off."""
+    global current
+    if current is not None and current.store is not None:
+        current.store.close()
+    current = ResultCache(**kwargs) if kwargs else None
+    return current
+
+
+def configure_from_environment(environ=os.environ):
+    size = int(environ.get('ROULETTE_CACHE_SIZE') or 0)
+    if not size:
+        return configure()
+    return configure(max_size=size, ttl=float(environ.get('ROULETTE_CACHE_TTL', 300)),
+                     path=environ.get('ROULETTE_CACHE_PATH') or None)
@@ -1,14 +1,18 @@
-import sys
-from enum import Enum
 from wheel import Wheel as RouletteWheel
 from table import Table as RouletteTable
 import json
-import jsonschema
 import secrets
+import snapshot
+import instrumentation
+import packed_bets
+import result_cache
+from exposure import Exposure
+from validation import RequestValidator
 
 
 class RouletteEngine(object):
-    def __init__(self, hash=None, wheel: RouletteWheel = RouletteWheel.EUROPEAN, table=None, bets=None):
+    def __init__(self, hash=None, wheel: RouletteWheel = RouletteWheel.EUROPEAN, table=None, bets=None, trace=None,
+                 netting=False, packed=None):
         hash = hash if hash else secrets.token_hex(32)
         self.wager = None
         self.winner = None
@@ -16,64 +20,300 @@ class RouletteEngine(object):
         self.wheel = RouletteWheel(wheel)
 
         self.hash = hash.lower()
-        self.table = RouletteTable(wheel=self.wheel, limits=table, bets=bets)
+        self.table = RouletteTable(wheel=self.wheel, limits=table, bets=bets, trace=trace, netting=netting,
+                                   packed=packed and packed_bets.decode(packed))
 
     def spin(self):
-        winner = self.table.choose(self.hash)
-        for bet in list(self.table.bets):
-            if bet.outcome in winner:
-                bet.win = True
-                bet.payout = bet.outcome.odds * bet.wager
-            else:
-                bet.win = False
-                bet.payout = 0
+        self.table.choose(self.hash)
         self.success = True
-        self.wager = {
-            'payout':  sum(bet.payout for bet in self.table.bets),
-            'onTable': sum(bet.wager for bet in self.table.bets if bet.win),
-            'placed':  sum(bet.wager for bet in self.table.bets),
-            'lost':    sum(bet.wager for bet in self.table.bets if not bet.win)
+        self.wager = settle(self.table, self.table.winning_number)
+
+    def get_result(self):
+        if not self.success:
+            self.spin()
+        return self.to_json()
+
+    def get_exposure(self):
+        return self.table.get_exposure()
+
+    def get_json_dict(self):
+        # Keys are emitted in sorted order so the JSON matches json.dumps(..., sort_keys=True)
+        bets, winning_bets = bets_json(self.table.bets)
+        result = {
+            'bets':        bets,
+            'hash':        self.hash,
         }
-        self.wager['delta'] = self.wager['payout'] + self.wager['onTable'] - self.wager['lost']
+        if self.table.book.netting:
+            result['positions'] = positions_json(self.table.book.get_positions())
+        result.update({
+            'success':     self.success,
+            'table':       limits_json(self.table.limits),
+            'wager':       wager_json(self.wager),
+            'wheel':       self.table.wheel.value,
+            'winner':      winner_json(self.table.winner),
+            'winningBets': winning_bets,
+        })
+        return result
+
+    def to_json(self):
+        return json.dumps(self.get_json_dict())
+
+
+class RouletteRound(object):
+    """One spin settled for many players, each with their own bets against the shared table limits.
+
+    A player whose bets break the limits gets an error result without affecting the others.
+    """
+
+    def __init__(self, hash=None, wheel: RouletteWheel = RouletteWheel.EUROPEAN, table=None, players=None,
+                 netting=False):
+        hash = hash if hash else secrets.token_hex(32)
+        self.success = None
+        self.wheel = RouletteWheel(wheel)
+
+        self.hash = hash.lower()
+        self.limits = table
+        self.netting = netting
+        self.table = RouletteTable(wheel=self.wheel, limits=table)
+        self.players = {}
+        self.wagers = {}
+        for player, bets in (players or {}).items():
+            self.add_player(player, bets)
+
+    def add_player(self, player, bets):
+        try:
+            self.players[player] = RouletteTable(wheel=self.wheel, limits=self.limits, bets=bets, netting=self.netting)
+        except Exception as e:
+            self.reject_player(player, e)
+
+    def reject_player(self, player, error):
+        self.players[player] = error
+
+    def spin(self):
+        self.table.choose(self.hash)
+        self.success = True
+        for player, table in self.players.items():
+            if isinstance(table, RouletteTable):
+                self.wagers[player] = settle(table, self.table.winning_number)
 
     def get_result(self):
         if not self.success:
             self.spin()
         return self.to_json()
 
+    def get_exposure(self):
+        """Exposure of every accepted player's bets on this round's single spin."""
+        tables = [table for table in self.players.values() if isinstance(table, RouletteTable)]
+        if not tables:
+            return self.table.get_exposure()
+        return Exposure.combine(table.get_exposure() for table in tables)
+
+    def get_player_json_dict(self, player):
+        table = self.players[player]
+        if not isinstance(table, RouletteTable):
+            return exception_result(table)
+        bets, winning_bets = bets_json(table.bets)
+        result = {'bets': bets}
+        if table.book.netting:
+            result['positions'] = positions_json(table.book.get_positions())
+        result.update({
+            'success':     self.success,
+            'wager':       wager_json(self.wagers.get(player)),
+            'winningBets': winning_bets,
+        })
+        return result
+
     def get_json_dict(self):
-        members = dict_filter(self.__dict__, {"hash", "success", "wager"})
-        additional = {
-            'bets':        self.table.bets,
-            'table':       self.table.limits,
-            'winner':      self.table.winner,
-            'wheel':       self.table.wheel,
-            'winningBets': list(bet for bet in self.table.bets if bet.win),
+        return {
+            'hash':    self.hash,
+            'players': {player: self.get_player_json_dict(player) for player in self.players},
+            'success': self.success,
+            'table':   limits_json(self.table.limits),
+            'wheel':   self.table.wheel.value,
+            'winner':  winner_json(self.table.winner),
         }
-        return {**members, **additional}
 
     def to_json(self):
-        return json.dumps(self,
-                          default=lambda o: o.value if isinstance(o, Enum) else
-                          o.get_json_dict() if 'get_json_dict' in dir(o) and callable(getattr(o, 'get_json_dict')) else
-                          o.__dict__, sort_keys=True)
+        return json.dumps(self.get_json_dict())
 
 
-def dict_filter(haystack, needles):
-    return dict([(i, haystack[i]) for i in haystack if i in set(needles)])
+def settle(table, winning_number):
+    wager = table.book.settle(winning_number)
+    wager['delta'] = wager['payout'] + wager['onTable'] - wager['lost']
+    return wager
 
 
-with open('RouletteRequestSchema.json') as f:
-    requestSchema = json.load(f)
+def bets_json(bets):
+    encoded = [bet.get_json_dict() for bet in bets]
+    return encoded, [bet_json for bet, bet_json in zip(bets, encoded) if bet.win]
 
 
-def process_request(request):
+def positions_json(positions):
+    return [{
+        'outcome': outcome and outcome.get_json_dict(),
+        'payout':  payout,
+        'wager':   stake,
+        'win':     win,
+    } for outcome, stake, win, payout in positions]
+
+
+def limits_json(limits):
+    return {name: limits[name].get_json_dict() for name in sorted(limits)}
+
+
+def wager_json(wager):
+    return wager and {
+        'delta':   wager['delta'],
+        'lost':    wager['lost'],
+        'onTable': wager['onTable'],
+        'payout':  wager['payout'],
+        'placed':  wager['placed'],
+    }
+
+
+def winner_json(winner):
+    return winner and {
+        'color':    winner['color'],
+        'location': winner['location'],
+        'parity':   winner['parity'],
+    }
+
+
+requestSchema = snapshot.load()
+if requestSchema is None:
+    with open(snapshot.SCHEMA_PATH) as f:
+        requestSchema = json.load(f)
+
+
+requestValidator = RequestValidator(requestSchema)
+
+
+def validate_request(request):
+    requestValidator.validate(request)
+
+
+def exception_result(e):
+    return {"success": False, "exception": {"type": str(type(e)), "message": str(e)}}
+
+
+def handle_request(request, trace=None):
+    """Spin a request. A trace passed in is left to the caller to finish."""
+    owner = trace is None
+    if owner:
+        trace = instrumentation.start()
+    if not trace:
+        return spin_request(request)
+    result = spin_request(request, trace)
+    instrumentation.annotate(trace, result)
+    if owner:
+        instrumentation.finish(trace)
+    return result
+
+
+def spin_request(request, trace=None):
+    error = requestValidator.first_error(request)
+    if trace:
+        trace.mark('validate')
+    if error is not None:
+        return exception_result(error)
+    cache = result_cache.current
+    # The fingerprint is taken before the engine, which consumes some bet locations
+    key = cache.key(request) if cache is not None else None
+    if key is not None:
+        result = cache.get(key)
+        if trace:
+            trace.mark('cache')
+        if result is not None:
+            if trace:
+                trace.count('cacheHits')
+            return result
+    try:
+        engine = RouletteEngine(**request, trace=trace)
+        if not engine.success:
+            engine.spin()
+        if trace:
+            trace.mark('spin')
+        result = engine.get_json_dict()
+        if trace:
+            trace.mark('encode')
+    except Exception as e:
+        result = exception_result(e)
+    # Only successful spins are cached, so an error is never served in place of a later success
+    if key is not None and result.get('success'):
+        cache.put(key, result)
+    return result
+
+
+def handle_exposure(request):
+    """Price a request's bets on every pocket instead of spinning."""
+    error = requestValidator.first_error(request)
+    if error is not None:
+        return exception_result(error)
     try:
-        jsonschema.validate(instance=request, schema=requestSchema)
-    except jsonschema.exceptions.ValidationError as e:
-        return json.dumps({"success": False, "exception": {"type": str(type(e)), "message": str(e)}})
+        request = {key: value for key, value in request.items() if key != 'hash'}
+        exposure = RouletteEngine(**request).get_exposure()
+        return {'exposure': exposure.get_json_dict(), 'success': True}
+    except Exception as e:
+        return exception_result(e)
+
+
+def handle_batch(requests):
+    rounds = requests['rounds'] if isinstance(requests, dict) else requests
+    if not isinstance(rounds, list):
+        return exception_result(TypeError("A batch needs a list of rounds"))
+    return [handle_request(request) for request in rounds]
+
+
+def handle_round(request):
+    players = request.get('players') if isinstance(request, dict) else None
+    if not isinstance(players, dict):
+        return exception_result(ValueError("A round needs a players object of player id to bets"))
+    shared = {key: value for key, value in request.items() if key != 'players'}
+    error = requestValidator.first_error(shared)
+    if error is not None:
+        return exception_result(error)
     try:
-        engine = RouletteEngine(**request)
-        return engine.get_result()
+        game = RouletteRound(**shared)
+        for player, bets in players.items():
+            error = requestValidator.first_error({'bets': bets})
+            if error is None:
+                game.add_player(player, bets)
+            else:
+                game.reject_player(player, error)
+        game.spin()
+        return game.get_json_dict()
     except Exception as e:
-        return json.dumps({"success": False, "exception": {"type": str(type(e)), "message": str(e)}})
+        return exception_result(e)
+
+
+def is_batch(request):
+    return isinstance(request, list) or (isinstance(request, dict) and 'rounds' in request)
+
+
+def is_round(request):
+    return isinstance(request, dict) and 'players' in request
+
+
+def process_request(request):
+    trace = instrumentation.start()
+    if not trace:
+        return encode_result(handle_request(request))
+    response = encode_result(handle_request(request, trace))
+    trace.mark('serialize')
+    trace.count('bytesSerialized', len(response))
+    instrumentation.finish(trace)
+    return response
+
+
+def encode_result(result):
+    if isinstance(result, result_cache.CachedResult):
+        return result.to_json()
+    return json.dumps(result)
+
+
+def process_batch(requests):
+    return json.dumps(handle_batch(requests))
+
+
+def process_round(request):
+    return json.dumps(handle_round(request))
@@ -0,0 +1,314 @@
+"""Many virtual tables' rounds run by one asyncio scheduler, with their betting windows on one timer.
+
+Each table takes bets from its players into a buffer while its betting window is open. When
+windows close, every table that closed is settled in the same pass: the rounds are handed out in
+batches, to a pool of worker processes when there are workers or else on the event loop, and each
+table's next window opens at once, so bets placed during settlement go to the next round.
+
+    scheduler = RoundScheduler(workers=4)
+    scheduler.open_table('t1', Wheel.EUROPEAN, limits, betting_seconds=15, hashes=hashes)
+    result = await scheduler.place('t1', 'alice', [{'type': 'straightUp', 'location': 17, 'wager': 5}])
+    # result is the round as RouletteRound.get_json_dict() reports it, for every player at the table
+    await scheduler.run()
+
+A table spins the hashes it is given in order, such as a hash chain played back from its end, and
+is closed when a window closes with no hash left for it; without hashes every round spins a random
+hash. Closing a table cancels the result of its open round. Bets are validated
+as they are placed and limit-checked when the round settles, where a player over the limits gets
+an error result without affecting the others. The scheduler keeps the bets it is given, and
+settling can consume their locations.
+
+Time comes from clock() and waiting from sleep(), so a SimulatedClock runs rounds as fast as they
+settle, deterministically. get_metrics() reports how late windows were closed and results
+delivered (lag) against the clock, the time spent settling, and rounds and bets per second.
+
+    python -m scheduler --tables 500 --rounds 20 --bets 50 --workers 4 --simulated
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import Histogram
+from roulette import RouletteRound, exception_result, requestValidator
+from wheel import Wheel
+
+BETTING_SECONDS = 15.0
+MAX_BATCH = 64
+
+
+class SimulatedClock(object):
+    """A clock whose time only moves when something sleeps, straight to when it would wake."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, delay):
+        self.now += max(delay, 0)
+        await asyncio.sleep(0)
+
+
+def settle_rounds(jobs):
+    """Spin and settle a batch of (hash, wheel, limits, players, netting) rounds; their JSON dicts."""
+    results = []
+    for hash, wheel, limits, players, netting in jobs:
+        try:
+            game = RouletteRound(hash=hash, wheel=wheel, table=limits, players=players, netting=netting)
+            game.spin()
+            results.append(game.get_json_dict())
+        except Exception as e:
+            results.append(exception_result(e))
+    return results
+
+
+class VirtualTable(object):
+    """A table's settings and the bets of its open round."""
+
+    def __init__(self, table_id, wheel, limits, betting_seconds, hashes, netting, opened):
+        self.table_id = table_id
+        self.wheel = Wheel(wheel)
+        self.limits = limits
+        self.betting_seconds = betting_seconds
+        self.hashes = None if hashes is None else iter(hashes)
+        self.netting = netting
+        self.round = 0
+        self.closes_at = opened + betting_seconds
+        self.players = {}
+        self.bets = 0
+        self.result = asyncio.get_running_loop().create_future()
+
+    def next_round(self):
+        """Start the next betting window; returns the closed round's (players, result future)."""
+        closed = self.players, self.result
+        self.round += 1
+        self.closes_at += self.betting_seconds
+        self.players = {}
+        self.bets = 0
+        self.result = asyncio.get_running_loop().create_future()
+        return closed
+
+    def get_json_dict(self):
+        return {
+            'bets':     self.bets,
+            'closesAt': self.closes_at,
+            'players':  len(self.players),
+            'round':    self.round,
+            'wheel':    self.wheel.value,
+        }
+
+
+class RoundScheduler(object):
+    def __init__(self, betting_seconds=BETTING_SECONDS, workers=0, max_batch=MAX_BATCH, clock=time.monotonic,
+                 sleep=asyncio.sleep):
+        self.betting_seconds = betting_seconds
+        self.workers = workers
+        self.max_batch = max_batch
+        self.clock = clock
+        self.sleep = sleep
+        self.executor = None
+        self.tables = {}
+        self.deadlines = []
+        self.scheduled = 0
+        self.changed = None
+        self.started = clock()
+        self.counts = {'bets': 0, 'rounds': 0, 'settlements': 0, 'tablesClosed': 0, 'tablesOpened': 0}
+        self.lag = Histogram()
+
+    def start(self):
+        if self.workers and self.executor is None:
+            from server import init_worker
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def open_table(self, table_id, wheel=Wheel.EUROPEAN, limits=None, betting_seconds=None, hashes=None,
+                   netting=False):
+        """Open a table, whose first betting window closes betting_seconds from now."""
+        if table_id in self.tables:
+            raise ValueError(f"Table {table_id!r} is already open")
+        error = requestValidator.first_error({'table': limits or {}, 'wheel': Wheel(wheel).value})
+        if error is not None:
+            raise error
+        table = VirtualTable(table_id, wheel, limits, betting_seconds or self.betting_seconds, hashes, netting,
+                             self.clock())
+        self.tables[table_id] = table
+        self.counts['tablesOpened'] += 1
+        self.schedule(table)
+        return table
+
+    def close_table(self, table_id):
+        """Close a table now; the bets of its open round are cancelled."""
+        table = self.tables.pop(table_id)
+        table.result.cancel()
+        self.counts['tablesClosed'] += 1
+
+    def schedule(self, table):
+        # The count keeps deadlines at the same time in the order they were scheduled
+        self.scheduled += 1
+        heapq.heappush(self.deadlines, (table.closes_at, self.scheduled, table.round, table.table_id))
+        if self.changed is not None:
+            self.changed.set()
+
+    def place(self, table_id, player, bets):
+        """Add a player's bets to a table's open round; returns the future of that round's result."""
+        table = self.tables[table_id]
+        error = requestValidator.first_error({'bets': bets})
+        if error is not None:
+            raise error
+        table.players.setdefault(player, []).extend(bets)
+        table.bets += len(bets)
+        self.counts['bets'] += len(bets)
+        return table.result
+
+    def due(self, now):
+        """Take every table whose betting window has closed by now, starting its next window."""
+        due = []
+        while self.deadlines and self.deadlines[0][0] <= now:
+            closes_at, _, round, table_id = heapq.heappop(self.deadlines)
+            table = self.tables.get(table_id)
+            if table is None or table.round != round:
+                continue
+            try:
+                hash = None if table.hashes is None else next(table.hashes)
+            except StopIteration:
+                self.close_table(table_id)
+                continue
+            players, result = table.next_round()
+            self.lag.add('close', (now - closes_at) * 1e9)
+            due.append((closes_at, result, (hash, table.wheel, table.limits, players, table.netting)))
+            self.schedule(table)
+        return due
+
+    async def settle(self, due):
+        """Settle closed rounds together, in batches, and hand out their results."""
+        started = time.perf_counter_ns()
+        jobs = [job for _, _, job in due]
+        batches = [jobs[start:start + self.max_batch] for start in range(0, len(jobs), self.max_batch)]
+        if self.executor is None:
+            results = [result for batch in batches for result in settle_rounds(batch)]
+        else:
+            loop = asyncio.get_running_loop()
+            settled = await asyncio.gather(*(loop.run_in_executor(self.executor, settle_rounds, batch)
+                                             for batch in batches))
+            results = [result for batch in settled for result in batch]
+        self.lag.add('settle', time.perf_counter_ns() - started)
+        now = self.clock()
+        for (closes_at, future, _), result in zip(due, results):
+            self.lag.add('result', (now - closes_at) * 1e9)
+            if not future.done():
+                future.set_result(result)
+        self.counts['rounds'] += len(results)
+        self.counts['settlements'] += 1
+
+    async def tick(self):
+        """Settle every table due by now; returns how many rounds were settled."""
+        due = self.due(self.clock())
+        if due:
+            await self.settle(due)
+        return len(due)
+
+    async def run(self, until=None):
+        """Run rounds until the clock reaches until, or for as long as there are tables to run."""
+        self.start()
+        self.changed = asyncio.Event()
+        while self.tables or (until is not None and self.clock() < until):
+            await self.tick()
+            now = self.clock()
+            if until is not None and now >= until:
+                break
+            deadline = self.deadlines[0][0] if self.deadlines else until
+            if deadline is None:
+                break
+            if until is not None:
+                deadline = min(deadline, until)
+            self.changed.clear()
+            sleeper = asyncio.ensure_future(self.sleep(deadline - now))
+            waker = asyncio.ensure_future(self.changed.wait())
+            await asyncio.wait((sleeper, waker), return_when=asyncio.FIRST_COMPLETED)
+            sleeper.cancel()
+            waker.cancel()
+
+    def get_metrics(self):
+        elapsed = self.clock() - self.started
+        lag = self.lag.get_json_dict()
+        return {
+            'counts':         dict(self.counts),
+            'elapsedSeconds': elapsed,
+            'lag':            lag['phases'],
+            'openTables':     len(self.tables),
+            'throughput':     {
+                'betsPerSecond':   self.counts['bets'] / elapsed if elapsed > 0 else None,
+                'roundsPerSecond': self.counts['rounds'] / elapsed if elapsed > 0 else None,
+            },
+            'workers':        self.workers,
+        }
+
+
+def random_bets(rng, count):
+    bets = []
+    for _ in range(count):
+        n = 3 * rng.randint(0, 10) + rng.randint(1, 2)
+        bets.append(rng.choice([
+            {'type': 'straightUp', 'wager': 1, 'location': rng.randint(0, 36)},
+            {'type': 'split', 'wager': 2, 'location': [n, n + 3]},
+            {'type': 'outside', 'wager': 5, 'location': rng.choice(['red', 'black', 'odd', 'even'])},
+        ]))
+    return bets
+
+
+async def demo(tables, rounds, bets, betting_seconds, workers, simulated, seed=0):
+    """Run rounds on many tables, each player betting as every window opens; the scheduler's metrics."""
+    clock = SimulatedClock() if simulated else None
+    scheduler = RoundScheduler(betting_seconds=betting_seconds, workers=workers,
+                               **({'clock': clock, 'sleep': clock.sleep} if simulated else {}))
+    rng = random.Random(seed)
+    players = []
+    for index in range(tables):
+        table_id = f"table-{index}"
+        scheduler.open_table(table_id, Wheel.AMERICAN if index % 4 == 0 else Wheel.EUROPEAN,
+                             hashes=(rng.randbytes(32).hex() for _ in range(rounds)))
+        players.append(asyncio.ensure_future(play(scheduler, table_id, rng, bets)))
+    try:
+        await scheduler.run()
+    finally:
+        scheduler.shutdown()
+    await asyncio.gather(*players, return_exceptions=True)
+    return scheduler.get_metrics()
+
+
+async def play(scheduler, table_id, rng, bets):
+    while table_id in scheduler.tables:
+        result = scheduler.place(table_id, 'player', random_bets(rng, bets))
+        try:
+            await result
+        except asyncio.CancelledError:
+            return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run many tables' rounds on one scheduler and report its metrics.")
+    parser.add_argument('--tables', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=10, help="rounds per table")
+    parser.add_argument('--bets', type=int, default=20, help="bets per round at every table")
+    parser.add_argument('--betting-seconds', type=float, default=1.0)
+    parser.add_argument('--workers', type=int, default=0, help="worker processes (default: settle on the event loop)")
+    parser.add_argument('--simulated', action='store_true', help="run on a simulated clock, as fast as rounds settle")
+    args = parser.parse_args(argv)
+    metrics = asyncio.run(demo(args.tables, args.rounds, args.bets, args.betting_seconds, args.workers,
+                               args.simulated))
+    json.dump(metrics, sys.stdout, indent=4)
+    print()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
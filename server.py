@@ -0,0 +1,335 @@
+"""Standalone HTTP front end for the engine, for running it outside Lambda.
+
+Run it with::
+
+    python -m server --port 8080 --workers 4
+
+POST / takes the same JSON as the Lambda handler: a single request, a batch (a list, or an
+object with "rounds") or a multi-player round (an object with "players"). POST /exposure prices
+a request without spinning. GET /health and GET /metrics report on the server.
+
+Connections are HTTP/1.1 keep-alive, and pipelined requests on a connection are worked on
+together and answered in order. Rounds run in a pool of worker processes that import the engine,
+with its layouts and validator, once at startup. Each worker is handed everything that queued up
+while it was busy (up to max_batch requests) in one go, which keeps the cost of passing work to
+it low under load without delaying requests when the server is idle. At most max_pending requests are queued or in
+progress at any time; beyond that the server answers 503 with Retry-After straight away rather
+than letting latency grow. Workers take the result cache's settings from the environment (see
+result_cache); with ROULETTE_CACHE_PATH set they share its store. Try it with the bundled load client::
+
+    python -m load_client --url http://127.0.0.1:8080/ --requests 20000 --connections 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+from instrumentation import Histogram
+
+MAX_BODY = 10 * 1024 * 1024
+MAX_HEADER = 64 * 1024
+MAX_PENDING = 1024
+PIPELINE_DEPTH = 32
+MAX_BATCH = 16
+KEEP_ALIVE_TIMEOUT = 75
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def init_worker():
+    """Load the engine once per worker process, including both wheels' layouts."""
+    # Importing the engine loads the schema, validator and layout snapshot; jsonschema is loaded
+    # now too, rather than by the first invalid request
+    import roulette
+    import result_cache
+    roulette.requestValidator.load()
+    from table import get_layout
+    from wheel import Wheel
+    for wheel in Wheel:
+        get_layout(wheel)
+    result_cache.configure_from_environment()
+
+
+def worker_pid():
+    return os.getpid()
+
+
+def work(kind, body):
+    """Run one HTTP request body through the engine; returns (status, encoded JSON)."""
+    from roulette import exception_result, handle_exposure, is_batch, is_round, process_batch, process_request, \
+        process_round
+    try:
+        request = json.loads(body)
+    except ValueError as e:
+        return HTTPStatus.BAD_REQUEST, json.dumps(exception_result(e)).encode()
+    if kind == 'exposure':
+        return HTTPStatus.OK, json.dumps(handle_exposure(request)).encode()
+    if is_batch(request):
+        return HTTPStatus.OK, process_batch(request).encode()
+    if is_round(request):
+        return HTTPStatus.OK, process_round(request).encode()
+    return HTTPStatus.OK, process_request(request).encode()
+
+
+def work_batch(jobs):
+    return [work(kind, body) for kind, body in jobs]
+
+
+def error_body(status, message):
+    return json.dumps({'exception': {'message': message, 'type': HTTPStatus(status).phrase},
+                       'success': False}).encode()
+
+
+def encode_response(status, body, keep_alive, headers=()):
+    head = ["HTTP/1.1 {0} {1}".format(int(status), HTTPStatus(status).phrase),
+            "Content-Type: application/json",
+            "Content-Length: {0}".format(len(body)),
+            "Connection: {0}".format('keep-alive' if keep_alive else 'close')]
+    head.extend("{0}: {1}".format(name, value) for name, value in headers)
+    return ('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body
+
+
+async def read_request(reader, timeout, max_body=MAX_BODY):
+    """(method, path, keep_alive, body) of the next request on a connection, or None at its end."""
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), timeout)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Request headers too large")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+    connection = headers.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Chunked request bodies are not supported")
+    length = headers.get('content-length', '0')
+    # Only plain digits: int() would also take a sign, spaces or underscores
+    if not (length.isascii() and length.isdigit()):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length")
+    length = int(length)
+    if length > max_body:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body over {0} bytes".format(max_body))
+    try:
+        body = await reader.readexactly(length) if length else b''
+    except (asyncio.IncompleteReadError, ConnectionError):
+        return None
+    return method, target.split('?', 1)[0], keep_alive, body
+
+
+class RouletteServer(object):
+    def __init__(self, workers=None, max_pending=MAX_PENDING, pipeline_depth=PIPELINE_DEPTH,
+                 keep_alive_timeout=KEEP_ALIVE_TIMEOUT, max_body=MAX_BODY, max_batch=MAX_BATCH):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.pipeline_depth = pipeline_depth
+        self.keep_alive_timeout = keep_alive_timeout
+        self.max_body = max_body
+        self.max_batch = max_batch
+        self.executor = None
+        self.server = None
+        self.jobs = None
+        self.feeders = []
+        self.handlers = set()
+        self.pending = 0
+        self.connections = 0
+        self.started = time.time()
+        self.counts = {'connections': 0, 'rejected': 0, 'requests': 0}
+        self.statuses = {}
+        self.latency = Histogram()
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        # Start every worker now rather than on the first requests
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, worker_pid)
+                               for _ in range(self.workers)))
+        self.jobs = asyncio.Queue()
+        self.feeders = [asyncio.ensure_future(self.feed()) for _ in range(self.workers)]
+        self.server = await asyncio.start_server(self.connection, host, port, limit=MAX_HEADER)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stop accepting connections, answer the requests already read and stop the workers."""
+        if self.server is not None:
+            self.server.close()
+        handlers = list(self.handlers)
+        for handler in handlers:
+            handler.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for feeder in self.feeders:
+            feeder.cancel()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    def get_metrics(self):
+        return {
+            'connections':   self.connections,
+            'counts':        dict(self.counts),
+            'latency':       self.latency.get_json_dict(),
+            'maxPending':    self.max_pending,
+            'pending':       self.pending,
+            'statuses':      {str(status): count for status, count in sorted(self.statuses.items())},
+            'uptimeSeconds': time.time() - self.started,
+            'workers':       self.workers,
+        }
+
+    async def run_job(self, kind, body):
+        started = time.perf_counter_ns()
+        future = asyncio.get_running_loop().create_future()
+        self.jobs.put_nowait((kind, body, future))
+        try:
+            status, body = await future
+            return status, body, ()
+        except Exception as e:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, error_body(HTTPStatus.INTERNAL_SERVER_ERROR, str(e)), ()
+        finally:
+            self.pending -= 1
+            self.latency.add(kind, time.perf_counter_ns() - started)
+
+    async def feed(self):
+        """Keep one worker busy: everything queued while it works goes to it as the next batch."""
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self.jobs.get()]
+            while len(jobs) < self.max_batch and not self.jobs.empty():
+                jobs.append(self.jobs.get_nowait())
+            try:
+                results = await loop.run_in_executor(self.executor, work_batch,
+                                                     [(kind, body) for kind, body, _ in jobs])
+            except Exception as e:
+                for _, _, future in jobs:
+                    future.set_exception(e)
+                continue
+            for (_, _, future), result in zip(jobs, results):
+                future.set_result(result)
+
+    def dispatch(self, method, path, body):
+        """An awaitable of (status, body, headers) for a request."""
+        self.counts['requests'] += 1
+        if path in ('/', '/spin', '/exposure'):
+            if method != 'POST':
+                return immediate(HTTPStatus.METHOD_NOT_ALLOWED, error_body(HTTPStatus.METHOD_NOT_ALLOWED,
+                                                                           "Use POST"))
+            if self.pending >= self.max_pending:
+                self.counts['rejected'] += 1
+                return immediate(HTTPStatus.SERVICE_UNAVAILABLE,
+                                 error_body(HTTPStatus.SERVICE_UNAVAILABLE, "Server busy"), [('Retry-After', 1)])
+            self.pending += 1
+            return self.run_job('exposure' if path == '/exposure' else 'spin', body)
+        if method != 'GET':
+            return immediate(HTTPStatus.METHOD_NOT_ALLOWED, error_body(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET"))
+        if path == '/health':
+            return immediate(HTTPStatus.OK, json.dumps({'status': 'ok', 'workers': self.workers}).encode())
+        if path == '/metrics':
+            return immediate(HTTPStatus.OK, json.dumps(self.get_metrics()).encode())
+        return immediate(HTTPStatus.NOT_FOUND, error_body(HTTPStatus.NOT_FOUND, "No such path: " + path))
+
+    async def connection(self, reader, writer):
+        self.handlers.add(asyncio.current_task())
+        self.connections += 1
+        self.counts['connections'] += 1
+        # Responses in request order; its size bounds how far a client can pipeline ahead
+        responses = asyncio.Queue(self.pipeline_depth)
+        replies = asyncio.ensure_future(self.reply(responses, writer))
+        try:
+            while not replies.done():
+                try:
+                    request = await read_request(reader, self.keep_alive_timeout, self.max_body)
+                except HttpError as e:
+                    await responses.put((immediate(e.status, error_body(e.status, str(e))), False))
+                    break
+                if request is None:
+                    break
+                method, path, keep_alive, body = request
+                await responses.put((asyncio.ensure_future(self.dispatch(method, path, body)), keep_alive))
+                if not keep_alive:
+                    break
+        except asyncio.CancelledError:
+            # The server is closing: stop reading, but answer the requests already read
+            pass
+        finally:
+            if not replies.done():
+                await responses.put(None)
+            await replies
+            self.connections -= 1
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def reply(self, responses, writer):
+        failed = False
+        while True:
+            item = await responses.get()
+            if item is None:
+                return
+            response, keep_alive = item
+            status, body, headers = await response
+            self.statuses[int(status)] = self.statuses.get(int(status), 0) + 1
+            if failed:
+                continue
+            try:
+                writer.write(encode_response(status, body, keep_alive, headers))
+                await writer.drain()
+            except ConnectionError:
+                # Keep awaiting the rounds already queued, so pending counts stay right
+                failed = True
+            if not keep_alive:
+                return
+
+
+async def immediate(status, body, headers=()):
+    return status, body, headers
+
+
+async def serve(host, port, **kwargs):
+    server = RouletteServer(**kwargs)
+    await server.start(host, port)
+    print("Serving on http://{0}:{1}/ with {2} workers".format(host, server.port, server.workers), flush=True)
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopping.set)
+    await stopping.wait()
+    await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the roulette engine over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help="requests queued or running before the server answers 503")
+    parser.add_argument('--pipeline-depth', type=int, default=PIPELINE_DEPTH)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH,
+                        help="most queued requests handed to a worker at once")
+    parser.add_argument('--keep-alive', type=float, default=KEEP_ALIVE_TIMEOUT, help="idle connection timeout")
+    args = parser.parse_args(argv)
+    asyncio.run(serve(args.host, args.port, workers=args.workers, max_pending=args.max_pending,
+                      pipeline_depth=args.pipeline_depth, keep_alive_timeout=args.keep_alive,
+                      max_batch=args.max_batch))
+
+
+if __name__ == '__main__':
+    main()
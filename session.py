@@ -0,0 +1,161 @@
+"""A live table that takes bets one at a time and keeps its totals as it goes.
+
+Every bet is resolved and limit-checked once, when it is placed, and its wagers are added to
+running totals: placed, inside and outside, stake per outcome, and the payout and the wagers kept
+on every pocket. Removing or replacing a bet takes its wagers back out again, so each change costs
+the same however many bets are on the table. A spin reads the winning pocket's totals, and reset()
+clears the bets for the next round while keeping the table's layout and limits.
+
+    session = TableSession(Wheel.EUROPEAN, limits)
+    chip = session.add('straightUp', [17], 5)
+    session.replace(chip, 'split', [17, 20], 10)
+    session.spin(hash)
+    result = session.get_json_dict()
+    session.reset()
+"""
+import copy
+import re
+import secrets
+from exposure import Exposure
+from roulette import bets_json, limits_json, wager_json, winner_json
+from table import Bet, BetBook, InsideBetsTooLarge, InsideBetsTooSmall, Table
+from wheel import Wheel
+
+
+class TableSession(object):
+    def __init__(self, wheel: Wheel = Wheel.EUROPEAN, limits=None):
+        self.table = Table(wheel=Wheel(wheel), limits=limits)
+        self.wheel = self.table.wheel
+        self.layout = self.table.layout
+        self.limits = self.table.limits
+        self.reset()
+
+    def reset(self):
+        """Clear the bets and the last spin, ready for the next round."""
+        self.bets = {}
+        self.reset_totals()
+        self.next_id = 0
+        self.hash = None
+        self.wager = None
+        self.table.winner = None
+        self.table.winning_number = None
+
+    def __len__(self):
+        return len(self.bets)
+
+    def resolve(self, type, location, wager):
+        """The (type, location, wager, outcome) rows a bet is placed as, checked against the limits."""
+        table = self.table
+        if re.match(Bet.NeighborsRegEx, type):
+            bets = Bet.from_neighbors(table=table, type=type, location=copy.copy(location), wager=wager)
+        elif type == 'sector':
+            bets = Bet.from_sector(table=table, type=type, location=location, wager=wager)
+        else:
+            # Resolving a location can consume it, and the announced location is kept for reporting
+            bets = [Bet(table=table, type=type, location=copy.copy(location), wager=wager)]
+        return [(bet.type, bet.location, bet.wager, bet.outcome) for bet in bets]
+
+    def check_inside(self, inside):
+        limit = self.limits["totalInside"]
+        if limit.max and inside > limit.max:
+            raise InsideBetsTooLarge(inside, limit.max)
+
+    @staticmethod
+    def inside_wager(rows):
+        return sum(wager for type, _, wager, _ in rows if type not in BetBook.outside_types)
+
+    def apply(self, rows, sign):
+        """Add (sign 1) or take back (sign -1) the wagers of a bet's rows."""
+        outcome_pockets = self.layout.outcome_pockets
+        payouts = self.payouts
+        on_table = self.on_table
+        for type, _, wager, outcome in rows:
+            wager *= sign
+            outcome_id = -1 if outcome is None else outcome.id
+            self.stakes[outcome_id] = self.stakes.get(outcome_id, 0) + wager
+            self.placed += wager
+            if type in BetBook.outside_types:
+                self.outside += wager
+            else:
+                self.inside += wager
+            if outcome is not None:
+                payout = outcome.odds * wager
+                for number in outcome_pockets[outcome.name]:
+                    payouts[number] += payout
+                    on_table[number] += wager
+
+    def add(self, type, location=None, wager=1):
+        """Place a bet and return its id; a bet over any limit raises and is not placed."""
+        rows = self.resolve(type, location, wager)
+        self.check_inside(self.inside + self.inside_wager(rows))
+        bet_id = self.next_id
+        self.next_id += 1
+        self.bets[bet_id] = (type, location, wager, rows)
+        self.apply(rows, 1)
+        return bet_id
+
+    def remove(self, bet_id):
+        type, location, wager, rows = self.bets.pop(bet_id)
+        self.apply(rows, -1)
+        if not self.bets:
+            # Start the next bets from exact zeros rather than whatever rounding is left
+            self.reset_totals()
+
+    def replace(self, bet_id, type, location=None, wager=1):
+        """Swap a bet for another under the same id; the old bet stays if the new one is rejected."""
+        old = self.bets[bet_id]
+        rows = self.resolve(type, location, wager)
+        self.check_inside(self.inside - self.inside_wager(old[3]) + self.inside_wager(rows))
+        self.apply(old[3], -1)
+        self.bets[bet_id] = (type, location, wager, rows)
+        self.apply(rows, 1)
+
+    def reset_totals(self):
+        self.stakes = {}
+        self.payouts = [0] * len(self.layout.pockets)
+        self.on_table = [0] * len(self.layout.pockets)
+        self.placed = self.inside = self.outside = 0
+
+    def spin(self, hash=None):
+        """Spin and settle the bets on the table; returns the wager summary as a round reports it."""
+        limit = self.limits["totalInside"]
+        if self.inside and self.inside < limit.min:
+            raise InsideBetsTooSmall(self.inside, limit.min)
+        self.hash = (hash if hash else secrets.token_hex(32)).lower()
+        self.table.choose(self.hash)
+        number = self.table.winning_number
+        payout, on_table = self.payouts[number], self.on_table[number]
+        lost = self.placed - on_table
+        self.wager = {
+            'payout':  payout,
+            'onTable': on_table,
+            'placed':  self.placed,
+            'lost':    lost,
+            'delta':   payout + on_table - lost,
+        }
+        return self.wager
+
+    def get_exposure(self):
+        return Exposure(self.wheel, self.placed, self.payouts, self.on_table)
+
+    def get_book(self):
+        """The bets placed, in the order they were placed, as a BetBook settled on the last spin."""
+        book = BetBook(self.layout)
+        for _, _, _, rows in self.bets.values():
+            for row in rows:
+                book.append(*row)
+        book.winning_number = self.table.winning_number
+        return book
+
+    def get_json_dict(self):
+        bets, winning_bets = bets_json(self.get_book().get_bets())
+        return {
+            'bets':        bets,
+            'hash':        self.hash,
+            'success':     self.wager is not None,
+            'table':       limits_json(self.limits),
+            'wager':       wager_json(self.wager),
+            'wheel':       self.wheel.value,
+            'winner':      winner_json(self.table.winner),
+            'winningBets': winning_bets,
+        }
@@ -0,0 +1,148 @@
+"""Monte Carlo simulation of a fixed set of bets over many spins.
+
+A round's result only depends on the winning pocket, so each worker just counts how often every
+pocket wins over its share of the spins; the distribution of delta and the outcome hit rates
+follow from those counts and the table's per-pocket payouts. Spins are split into fixed-size
+chunks seeded from (seed, chunk), so a result is reproducible from its seed whatever the number
+of workers. With NumPy a prng chunk's pockets are drawn as one block of random bits and counted
+in arrays; the pockets are the same ones random.Random.choices would draw, so the counts are too.
+
+    python -m simulation testRequest.json --spins 10000000 --seed 1
+"""
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from exposure import pocket_location
+from roulette import RouletteEngine, requestValidator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+SOURCES = ('prng', 'hash')
+CHUNK_SIZE = 1000000
+Z_95 = 1.959963984540054
+
+
+def chunk_seed(seed, chunk):
+    return hashlib.sha256("{0}:{1}".format(seed, chunk).encode()).digest()
+
+
+def count_pockets(pocket_count, spins, seed, chunk, source='prng'):
+    """How often each pocket wins over one chunk of spins."""
+    if source == 'prng':
+        rng = random.Random(chunk_seed(seed, chunk))
+        if numpy is not None:
+            return count_choices(rng, pocket_count, spins)
+        counts = Counter(rng.choices(range(pocket_count), k=spins))
+        return [counts[number] for number in range(pocket_count)]
+    # Hashes are chained from the chunk seed, and pockets derived from them exactly as Table.choose does
+    counts = [0] * pocket_count
+    digest = chunk_seed(seed, chunk)
+    for _ in range(spins):
+        digest = hashlib.sha256(digest).digest()
+        counts[(int.from_bytes(digest[:7], 'big') >> 4) % pocket_count] += 1
+    return counts
+
+
+def count_choices(rng, pocket_count, spins):
+    """Counts of rng.choices(range(pocket_count), k=spins), drawn in arrays."""
+    # random() takes two 32-bit words per float, which getrandbits() returns in the same order
+    words = numpy.frombuffer(rng.getrandbits(64 * spins).to_bytes(8 * spins, 'little'), dtype='<u4')
+    words = words.reshape(spins, 2)
+    floats = ((words[:, 0] >> 5).astype(numpy.float64) * 67108864.0 + (words[:, 1] >> 6)) / 9007199254740992.0
+    pockets = numpy.floor(floats * pocket_count).astype(numpy.int64)
+    return numpy.bincount(pockets, minlength=pocket_count).tolist()
+
+
+def _count_chunk(args):
+    return count_pockets(*args)
+
+
+def interval(mean, stdev, n):
+    margin = Z_95 * stdev / math.sqrt(n) if n else 0.0
+    return [mean - margin, mean + margin]
+
+
+def simulate(request, spins, seed=0, workers=None, source='prng', chunk_size=CHUNK_SIZE):
+    """Simulate a request (in the shape process_request accepts) over a number of spins."""
+    if source not in SOURCES:
+        raise ValueError(f"Unknown simulation source: {source}")
+    requestValidator.validate(request)
+    engine = RouletteEngine(**{key: value for key, value in request.items() if key != 'hash'})
+    table = engine.table
+    pocket_count = len(table.pockets)
+    payouts, on_table = table.book.pocket_totals()
+    deltas = [payout + kept - (table.book.placed - kept) for payout, kept in zip(payouts, on_table)]
+
+    chunks = [(pocket_count, min(chunk_size, spins - start), seed, chunk, source)
+              for chunk, start in enumerate(range(0, spins, chunk_size))]
+    if workers == 1 or len(chunks) <= 1:
+        results = [count_pockets(*chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_count_chunk, chunks))
+    counts = [sum(column) for column in zip(*results)] if results else [0] * pocket_count
+
+    distribution = Counter()
+    for delta, count in zip(deltas, counts):
+        if count:
+            distribution[delta] += count
+    mean = sum(delta * count for delta, count in distribution.items()) / spins if spins else 0.0
+    variance = sum((delta - mean) ** 2 * count for delta, count in distribution.items()) / spins if spins else 0.0
+
+    hit_rates = {}
+    for outcome_id in sorted(table.book.stakes):
+        if outcome_id < 0:
+            continue
+        outcome = table.layout.outcome_list[outcome_id]
+        hits = sum(counts[number] for number in table.layout.outcome_pockets[outcome.name])
+        rate = hits / spins if spins else 0.0
+        hit_rates[outcome.name] = {
+            'confidence95': interval(rate, math.sqrt(rate * (1 - rate)), spins),
+            'expected':     len(table.layout.outcome_pockets[outcome.name]) / pocket_count,
+            'hits':         hits,
+            'rate':         rate,
+        }
+
+    return {
+        'delta':    {
+            'confidence95': interval(mean, math.sqrt(variance), spins),
+            'distribution': [[delta, distribution[delta]] for delta in sorted(distribution)],
+            'expected':     sum(deltas) / pocket_count,
+            'mean':         mean,
+            'stdev':        math.sqrt(variance),
+        },
+        'hitRates': hit_rates,
+        'pockets':  {str(pocket_location(number)): count for number, count in enumerate(counts)},
+        'seed':     seed,
+        'source':   source,
+        'spins':    spins,
+        'wheel':    engine.wheel.value,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate a roulette request over many spins.")
+    parser.add_argument('request', help="JSON request file, as accepted by process_request")
+    parser.add_argument('--spins', type=int, default=1000000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--source', choices=SOURCES, default='prng',
+                        help="seeded PRNG pockets, or pockets from a SHA-256 hash chain as Table.choose derives them")
+    args = parser.parse_args(argv)
+    with open(args.request) as f:
+        request = json.load(f)
+    json.dump(simulate(request, args.spins, seed=args.seed, workers=args.workers, source=args.source),
+              sys.stdout, indent=4)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Startup snapshot holding the request schema and both wheel layouts, ready to unpickle.
+
+Build it next to the modules (the Docker image does this at build time)::
+
+    python -m snapshot
+
+A snapshot is only used while the sources it was built from are unchanged. Set
+ROULETTE_SNAPSHOT to load it from elsewhere, or to an empty string to always build at startup.
+"""
+import hashlib
+import json
+import os
+import pickle
+import table
+from wheel import Wheel
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_PATH = os.path.join(ROOT, 'RouletteRequestSchema.json')
+SNAPSHOT_PATH = os.environ.get('ROULETTE_SNAPSHOT', os.path.join(ROOT, 'roulette.snapshot'))
+SOURCES = ('wheel.py', 'table.py', 'RouletteRequestSchema.json')
+
+
+def fingerprint():
+    digest = hashlib.sha256()
+    for name in SOURCES:
+        with open(os.path.join(ROOT, name), 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def build(path=SNAPSHOT_PATH):
+    with open(SCHEMA_PATH) as f:
+        schema = json.load(f)
+    snapshot = {
+        'fingerprint': fingerprint(),
+        'schema':      schema,
+        # Pickled separately so a process only unpickles the wheels it serves
+        'layouts':     {wheel: pickle.dumps(table.Layout(wheel), protocol=pickle.HIGHEST_PROTOCOL)
+                        for wheel in Wheel},
+    }
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+def load(path=SNAPSHOT_PATH):
+    """Install the snapshot's layouts and return its schema, or None if there is no current snapshot."""
+    if not path:
+        return None
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        # Missing, or written by an incompatible version: build at startup instead
+        return None
+    if snapshot.get('fingerprint') != fingerprint():
+        return None
+    table.layout_snapshots.update(snapshot['layouts'])
+    return snapshot['schema']
+
+
+if __name__ == '__main__':
+    print(build())
@@ -1,16 +1,28 @@
 from wheel import Wheel, Pocket
+from exposure import Exposure
+import copy
+import pickle
 import re
-from dataclasses import dataclass
+from array import array
+from dataclasses import dataclass, field, replace
+from types import MappingProxyType
 
 
 @dataclass(frozen=True)
 class Outcome:
     name: str
     odds: int
+    # Bit n is set when the outcome wins on pocket n; filled in when the Layout is built
+    mask: int = field(default=0, compare=False, repr=False)
+    # Position of the outcome in its Layout's outcome_list
+    id: int = field(default=-1, compare=False, repr=False)
 
     def __str__(self):
         return f"{self.name} ({self.odds}:1)"
 
+    def get_json_dict(self):
+        return {'name': self.name, 'odds': self.odds}
+
 
 class TableLimit(object):
     def __init__(self, min=1, max=None):
@@ -20,39 +32,255 @@ class TableLimit(object):
     def __str__(self):
         return "[{0}:{1}]".format(self.min, self.max)
 
+    def get_json_dict(self):
+        return {'max': self.max, 'min': self.min}
+
+
+# The announced sector bets of the European wheel: the units a sector's wager is divided into,
+# and the (type, location, units) of every bet it places
+SECTORS = {
+    'tiers':            (6, (('split', (5, 8), 1), ('split', (10, 11), 1), ('split', (13, 16), 1),
+                             ('split', (23, 24), 1), ('split', (27, 30), 1), ('split', (33, 36), 1))),
+    'voisins':          (9, (('split', (4, 7), 1), ('split', (12, 15), 1), ('split', (18, 21), 1),
+                             ('split', (19, 22), 1), ('split', (32, 35), 1), ('split3', (0, 2, 3), 2),
+                             ('corner', (25, 26, 28, 29), 2))),
+    'orphelins plein':  (8, (('straightUp', 1, 1), ('straightUp', 6, 1), ('straightUp', 9, 1),
+                             ('straightUp', 14, 1), ('straightUp', 17, 1), ('straightUp', 20, 1),
+                             ('straightUp', 31, 1), ('straightUp', 34, 1))),
+    'orphelins cheval': (5, (('split', (6, 9), 1), ('split', (14, 17), 1), ('split', (17, 20), 1),
+                             ('split', (31, 34), 1), ('straightUp', 1, 1))),
+    'jeu zero':         (4, (('split', (0, 3), 1), ('split', (12, 15), 1), ('split', (32, 35), 1),
+                             ('straightUp', 26, 1))),
+}
+
+
+class Layout(object):
+    """Pockets and outcomes of a wheel, built once and shared read-only by every Table.
+
+    It also holds the expansions of announced bets, already resolved to outcomes: neighbors keyed
+    by (neighbors per side, pocket number) and sectors keyed by their SECTORS name. Each is a
+    tuple of (type, location, outcome, units) rows, where a tuple location is reported as a list.
+
+    The position of an outcome in outcome_list is its id, and outcome_types holds the bet type a
+    wager on each id is limit-checked as. Ids are stable for a wheel, so clients can send packed
+    bets by id (see packed_bets).
+    """
+
+    # Bet types located by the pockets they cover, and the name fragment identifying their outcomes
+    search_keys = {
+        "split":  "Split",
+        "split3": "3Way",
+        "street": "Street",
+        "corner": "Corner",
+        "line":   "Line",
+        "column": "Column",
+        "dozen":  "Dozen",
+    }
+
+    def __init__(self, wheel: Wheel):
+        self.wheel = wheel
+        self.pockets = None
+        self.outcomes = {}
+        self._members = [set() for _ in self.wheel.get_track()]
+
+        build_pockets(self)
+        outcome_pockets = {name: set() for name in self.outcomes}
+        for number, members in enumerate(self._members):
+            for outcome in members:
+                outcome_pockets[outcome.name].add(number)
+        self.outcome_pockets = MappingProxyType({k: frozenset(v) for k, v in outcome_pockets.items()})
+        self.outcomes = MappingProxyType({
+            name: replace(outcome, mask=sum(1 << number for number in outcome_pockets[name]), id=id)
+            for id, (name, outcome) in enumerate(self.outcomes.items())
+        })
+        self.outcome_list = tuple(self.outcomes.values())
+        self.outcome_types = tuple(self._outcome_type(outcome.name) for outcome in self.outcome_list)
+        self.pockets = tuple(Pocket(self.outcomes[outcome.name] for outcome in members) for members in self._members)
+        self.locations = MappingProxyType(self._build_locations())
+        self.neighbors = MappingProxyType(self._build_neighbors())
+        self.sectors = MappingProxyType(self._build_sectors())
+        del self._members
+
+    def _outcome_type(self, name):
+        if name == 'Zero-Line':
+            return 'first5' if self.wheel == Wheel.AMERICAN else 'first4'
+        if name in ('Red', 'Black', 'Even', 'Odd', 'High', 'Low'):
+            return 'outside'
+        for type, search_key in self.search_keys.items():
+            if search_key in name:
+                return type
+        return 'straightUp'
+
+    def _build_locations(self):
+        # Any set of pockets covered by exactly one outcome of a bet type locates that outcome.
+        # Sets of pockets are keyed by their bitmask, and every subset of an outcome's mask is visited.
+        locations = {}
+        for type, search_key in self.search_keys.items():
+            found = {}
+            ambiguous = set()
+            for name, outcome in self.outcomes.items():
+                if search_key not in name:
+                    continue
+                subset = outcome.mask
+                while subset:
+                    if subset in found:
+                        ambiguous.add(subset)
+                    found[subset] = outcome
+                    subset = (subset - 1) & outcome.mask
+            locations[type] = MappingProxyType({mask: outcome for mask, outcome in found.items()
+                                                if mask not in ambiguous})
+        return locations
+
+    def _build_neighbors(self):
+        track = self.wheel.get_track()
+        templates = {}
+        for count in range(1, 10):
+            for index, number in enumerate(track):
+                # Bet.from_neighbors does not wrap past the end of the track, so neither do these
+                if index + count >= len(track):
+                    continue
+                # Resolving a straightUp list location consumes it, leaving an empty list to report
+                templates[count, number] = tuple(('straightUp', (), self.outcomes.get(str(track[i])), 1)
+                                                 for i in range(index - count, index + count + 1))
+        return templates
+
+    def _build_sectors(self):
+        if self.wheel != Wheel.EUROPEAN:
+            return {}
+        templates = {}
+        for name, (units, bets) in SECTORS.items():
+            templates[name] = (units, tuple(
+                (type, location, self.outcomes.get(str(location)) if type == 'straightUp'
+                 else self.find_outcome(type, location), share)
+                for type, location, share in bets))
+        return templates
+
+    def find_outcome(self, type: str, location):
+        """Look up the outcome a bet type covers at a location, or None if it is missing or ambiguous."""
+        mask = 0
+        try:
+            for x in location:
+                bit = 1 << (37 if x == '00' else int(x))
+                if mask & bit:
+                    return None
+                mask |= bit
+        except (TypeError, ValueError):
+            return None
+        return self.locations[type].get(mask)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['outcomes'] = dict(self.outcomes)
+        state['outcome_pockets'] = dict(self.outcome_pockets)
+        state['locations'] = {type: dict(masks) for type, masks in self.locations.items()}
+        state['neighbors'] = dict(self.neighbors)
+        state['sectors'] = dict(self.sectors)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.outcomes = MappingProxyType(self.outcomes)
+        self.outcome_pockets = MappingProxyType(self.outcome_pockets)
+        self.locations = MappingProxyType({type: MappingProxyType(masks) for type, masks in self.locations.items()})
+        self.neighbors = MappingProxyType(self.neighbors)
+        self.sectors = MappingProxyType(self.sectors)
+
+    def add_outcome(self, number: int, outcome: Outcome):
+        if self.pockets is not None:
+            raise TypeError("Layout is immutable once built")
+        self._members[number].add(outcome)
+        if outcome.name in self.outcomes and self.outcomes[outcome.name] != outcome:
+            raise ValueError(f"Duplicate Outcome Name Found: {outcome.name}")
+        else:
+            self.outcomes[outcome.name] = outcome
+
+
+# Layouts by wheel, built on first use or unpickled from a startup snapshot's layout_snapshots
+layouts = {}
+layout_snapshots = {}
+
+
+def get_layout(wheel: Wheel) -> Layout:
+    layout = layouts.get(wheel)
+    if layout is None:
+        snapshot = layout_snapshots.pop(wheel, None)
+        layout = layouts[wheel] = pickle.loads(snapshot) if snapshot else Layout(wheel)
+    return layout
+
 
 class Table(object):
-    def __init__(self, wheel: Wheel, limits=None, bets=None):
+    def __init__(self, wheel: Wheel, limits=None, bets=None, trace=None, netting=False, packed=None):
         self.wheel = wheel
-        self.pockets = tuple(Pocket() for _ in self.wheel.get_track())
+        self.layout = get_layout(self.wheel)
+        self.pockets = self.layout.pockets
         self.limits = self.get_defaults().copy()
         self.limits.update({k: TableLimit(**v) for k, v in limits.items()} if limits else {})
-        self.outcomes = {}
+        self.outcomes = self.layout.outcomes
         self.winner = None
-
-        build_pockets(self)
-        self.bets = []
-        if bets:
-            # Standard Bets
-            self.bets += [Bet(table=self, **bet) for bet in bets if
-                          not (re.match(Bet.NeighborsRegEx, bet['type']) or bet['type'] == 'sector')] if bets else {}
+        self.winning_number = None
+
+        self.book = BetBook(self.layout, netting=netting)
+        if trace:
+            trace.mark('table')
+        if bets or packed:
+            bets = bets or []
+            if netting:
+                self.book.announce(bets)
+
+            # Standard Bets, setting aside the neighbors and sector bets to place after them
+            neighbors = []
+            sectors = []
+            for index, bet in enumerate(bets):
+                if bet['type'] == 'sector':
+                    sectors.append(index)
+                elif re.match(Bet.NeighborsRegEx, bet['type']):
+                    neighbors.append(index)
+                else:
+                    self.book.announcing = index
+                    self.book.add(table=self, **bet)
+            if trace:
+                trace.mark('bets')
 
             # Neighbors Bets
-            neighbors_bets = [Bet.from_neighbors(table=self, **bet) for bet in bets if
-                              re.match(Bet.NeighborsRegEx, bet['type'])]
-            self.bets += [inner for outer in neighbors_bets for inner in outer]
+            for index in neighbors:
+                self.book.announcing = index
+                self.book.extend(Bet.from_neighbors(table=self, **bets[index]))
+            if trace:
+                trace.mark('neighbors')
 
             # Sector Bets
-            sector_bets = [Bet.from_sector(table=self, **bet) for bet in bets if bet['type'] == 'sector']
-            self.bets += [inner for outer in sector_bets for inner in outer]
-
-            inside_wager = sum([bet.wager for bet in self.bets if bet.type not in ["column", "dozen", "outside"]])
+            for index in sectors:
+                self.book.announcing = index
+                self.book.extend(Bet.from_sector(table=self, **bets[index]))
+            if trace:
+                trace.mark('sectors')
+
+            # Packed Bets, as (outcome ids, wagers) arrays
+            if packed:
+                self.book.add_packed(self, *packed)
+                if trace:
+                    trace.mark('packed')
+                    trace.count('betsPacked', len(packed[0]))
+            if trace:
+                trace.count('betsParsed', len(bets))
+                trace.count('outcomesResolved', len(self.book))
+
+            inside_wager = self.book.inside
 
             if inside_wager and inside_wager < self.limits["totalInside"].min:
                 raise InsideBetsTooSmall(inside_wager, self.limits["totalInside"].min)
             if self.limits["totalInside"].max and inside_wager > self.limits["totalInside"].max:
                 raise InsideBetsTooLarge(inside_wager, self.limits["totalInside"].max)
 
+    @property
+    def bets(self):
+        return self.book.get_bets()
+
+    def get_exposure(self):
+        """The exact payout on every pocket for the bets on the table, without spinning."""
+        payouts, on_table = self.book.pocket_totals()
+        return Exposure(self.wheel, self.book.placed, payouts, on_table)
+
     @staticmethod
     def get_defaults():
         return {
@@ -64,23 +292,13 @@ class Table(object):
             "first4":       TableLimit(min=1, max=None),
             "first5":       TableLimit(min=1, max=None),
             "doubleStreet": TableLimit(min=1, max=None),
+            "line":         TableLimit(min=1, max=None),
             "column":       TableLimit(min=1, max=None),
             "dozen":        TableLimit(min=1, max=None),
             "outside":      TableLimit(min=1, max=None),
             "totalInside":  TableLimit(min=1, max=None),
         }
 
-    def add_outcome(self, number: int, outcome: Outcome):
-        pockets = list(self.pockets)
-        pocket = set(pockets[number])
-        pocket.add(outcome)
-        pockets[number] = Pocket(pocket)
-        self.pockets = tuple(pockets)
-        if outcome.name in self.outcomes and self.outcomes[outcome.name] != outcome:
-            raise ValueError(f"Duplicate Outcome Name Found: {outcome.name}")
-        else:
-            self.outcomes[outcome.name] = outcome
-
     def get_outcome(self, name: str):
         return self.outcomes.get(name)
 
@@ -92,12 +310,14 @@ class Table(object):
             return self.get_outcome(location.capitalize())
         elif type in ['first4', 'first5']:
             return self.get_outcome('Zero-Line')
-        elif type == 'split3':
-            search_key = '3Way'
-        elif type in ["split", "street", "corner", "line", "column", "dozen"]:
-            search_key = type.capitalize()
+        elif type in Layout.search_keys:
+            outcome = self.layout.find_outcome(type, location)
+            if outcome:
+                return outcome
+            search_key = Layout.search_keys[type]
         else:
             raise UnableToDetermineBet(type=type, location=location)
+        # Missing or ambiguous locations fall through to the scan to report what was found
         # secondPass = [val for key, val in firstPass.items() if location & ]
         pocket_numbers = list(map(lambda x: 37 if x == '00' else int(x), location))
         pockets = list({val for key, val in enumerate(self.pockets) if key in pocket_numbers})
@@ -115,16 +335,21 @@ class Table(object):
         h = int(hash[0:13], 16)
         pocket_count = len(self.pockets)
         res = h % pocket_count
-        self.winner = {
+        self.winning_number = res
+        self.winner = self.describe_pocket(res)
+        return self.pockets[res]
+
+    @staticmethod
+    def describe_pocket(res):
+        return {
             'location': ('00' if res == 37 else res),
             'color':    ('Green' if res in [0, 37] else (
                 'Red' if res in Wheel.get_red() else 'Black')),
             'parity':   (None if res in [0, 37] else ('Odd' if res % 2 else 'Even')),
         }
-        return self.pockets[res]
 
 
-def add_zero_line(table: Table):
+def add_zero_line(table: Layout):
     # Zero Line Bet
     odds = 6 if table.wheel == Wheel.AMERICAN else 8
     zero = Outcome("Zero-Line", odds)
@@ -136,7 +361,7 @@ def add_zero_line(table: Table):
         table.add_outcome(37, zero)
 
 
-def add_even_money(table: Table):
+def add_even_money(table: Layout):
     # Even-Money Bets
     red = Outcome('Red', 1)
     black = Outcome('Black', 1)
@@ -161,7 +386,7 @@ def add_even_money(table: Table):
             table.add_outcome(n, black)
 
 
-def add_column(table: Table):
+def add_column(table: Layout):
     # Column Bets
     for c in range(0, 3):
         column = Outcome(f"Column {c + 1}", 2)
@@ -169,7 +394,7 @@ def add_column(table: Table):
             table.add_outcome(3 * r + c + 1, column)
 
 
-def add_dozen(table: Table):
+def add_dozen(table: Layout):
     # Dozen Bets
     for d in range(0, 3):
         dozen = Outcome(f"Dozen {d + 1}", 2)
@@ -177,7 +402,7 @@ def add_dozen(table: Table):
             table.add_outcome(12 * d + m + 1, dozen)
 
 
-def add_line(table: Table):
+def add_line(table: Layout):
     # Line Bets
     for r in range(0, 11):
         n = 3 * r + 1
@@ -190,7 +415,7 @@ def add_line(table: Table):
         table.add_outcome(n + 5, line)
 
 
-def add_corner(table: Table):
+def add_corner(table: Layout):
     # Corner Bets
     for r in range(0, 11):
         n = 3 * r + 1
@@ -207,7 +432,7 @@ def add_corner(table: Table):
         table.add_outcome(n + 4, corner)
 
 
-def add_street(table: Table):
+def add_street(table: Layout):
     # Street Bets
     for r in range(0, 12):
         n = 3 * r + 1
@@ -217,7 +442,7 @@ def add_street(table: Table):
         table.add_outcome(n + 2, street)
 
 
-def add_split3(table: Table):
+def add_split3(table: Layout):
     # Split3 Bets
 
     z12 = Outcome('3Way 0-1-2', 11)
@@ -240,7 +465,7 @@ def add_split3(table: Table):
         table.add_outcome(2, z23)
 
 
-def add_split(table: Table):
+def add_split(table: Layout):
     # Split Bets
     for r in range(0, 12):
         n = 3 * r + 1
@@ -274,7 +499,7 @@ def add_split(table: Table):
         table.add_outcome(3, z3)
 
 
-def add_straight(table: Table):
+def add_straight(table: Layout):
     # Straight Bets
     for n in range(0, 37):
         table.add_outcome(n, Outcome(str(n), 35))
@@ -282,7 +507,7 @@ def add_straight(table: Table):
         table.add_outcome(37, Outcome('00', 35))
 
 
-def build_pockets(table: Table):
+def build_pockets(table: Layout):
     add_straight(table=table)
     add_split(table=table)
     add_split3(table=table)
@@ -335,6 +560,7 @@ class UnableToDetermineBet(BadBetException):
 
 
 class Bet(object):
+    __slots__ = ('win', 'payout', 'type', 'location', 'wager', 'outcome')
     NeighborsRegEx: str = '^neighbors([1-9])$'
 
     @classmethod
@@ -356,6 +582,9 @@ class Bet(object):
         track = table.wheel.get_track()
         if location not in track:
             raise UnableToDetermineBet(type=type, location=location)
+        template = table.layout.neighbors.get((num_neighbors_per_side, location))
+        if template is not None:
+            return cls.from_template(table, template, wager, total_bets)
         track_index = track.index(location)
         pockets = [track[i] for i in
                    range(track_index - num_neighbors_per_side, track_index + num_neighbors_per_side + 1)]
@@ -382,14 +611,7 @@ class Bet(object):
             raise BetNotAvailable
         if wager % 6:
             raise BadBetException('Wager for sector Tiers du Cylindre should be multiple of 6')
-        return [
-            Bet(table=table, type='split', location=[5, 8], wager=(wager / 6)),
-            Bet(table=table, type='split', location=[10, 11], wager=(wager / 6)),
-            Bet(table=table, type='split', location=[13, 16], wager=(wager / 6)),
-            Bet(table=table, type='split', location=[23, 24], wager=(wager / 6)),
-            Bet(table=table, type='split', location=[27, 30], wager=(wager / 6)),
-            Bet(table=table, type='split', location=[33, 36], wager=(wager / 6)),
-        ]
+        return cls.from_sector_bets(table, 'tiers', wager)
 
     @classmethod
     def from_sector_voisins(cls, table: Table, wager):
@@ -397,15 +619,7 @@ class Bet(object):
             raise BetNotAvailable
         if wager % 9:
             raise BadBetException('Wager for sector les Voisins du Zero should be multiple of 9')
-        return [
-            Bet(table=table, type='split', location=[4, 7], wager=(wager / 9)),
-            Bet(table=table, type='split', location=[12, 15], wager=(wager / 9)),
-            Bet(table=table, type='split', location=[18, 21], wager=(wager / 9)),
-            Bet(table=table, type='split', location=[19, 22], wager=(wager / 9)),
-            Bet(table=table, type='split', location=[32, 35], wager=(wager / 9)),
-            Bet(table=table, type='split3', location=[0, 2, 3], wager=(2 * wager / 9)),
-            Bet(table=table, type='corner', location=[25, 26, 28, 29], wager=(2 * wager / 9)),
-        ]
+        return cls.from_sector_bets(table, 'voisins', wager)
 
     @classmethod
     def from_sector_orphelins(cls, table: Table, location, wager):
@@ -414,25 +628,10 @@ class Bet(object):
         if 'plein' in location.lower():
             if wager % 8:
                 raise BadBetException('Wager for sector les Orphelins en Plein should be multiple of 8')
-            return [
-                Bet(table=table, type='straightUp', location=1, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=6, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=9, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=14, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=17, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=20, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=31, wager=(wager / 8)),
-                Bet(table=table, type='straightUp', location=34, wager=(wager / 8)),
-            ]
+            return cls.from_sector_bets(table, 'orphelins plein', wager)
         if wager % 5:
             raise BadBetException('Wager for sector les Orphelins en Cheval should be multiple of 5')
-        return [
-            Bet(table=table, type='split', location=[6, 9], wager=(wager / 5)),
-            Bet(table=table, type='split', location=[14, 17], wager=(wager / 5)),
-            Bet(table=table, type='split', location=[17, 20], wager=(wager / 5)),
-            Bet(table=table, type='split', location=[31, 34], wager=(wager / 5)),
-            Bet(table=table, type='straightUp', location=1, wager=(wager / 5)),
-        ]
+        return cls.from_sector_bets(table, 'orphelins cheval', wager)
 
     @classmethod
     def from_sector_jeu_zero(cls, table: Table, wager):
@@ -440,26 +639,272 @@ class Bet(object):
             raise BetNotAvailable
         if wager % 4:
             raise BadBetException('Wager for sector Jeu Zero should be multiple of 4')
-        return [
-            Bet(table=table, type='split', location=[0, 3], wager=(wager / 4)),
-            Bet(table=table, type='split', location=[12, 15], wager=(wager / 4)),
-            Bet(table=table, type='split', location=[32, 35], wager=(wager / 4)),
-            Bet(table=table, type='straightUp', location=26, wager=(wager / 4)),
-        ]
+        return cls.from_sector_bets(table, 'jeu zero', wager)
+
+    @classmethod
+    def from_sector_bets(cls, table: Table, name, wager):
+        units, template = table.layout.sectors[name]
+        return cls.from_template(table, template, wager, units)
+
+    @classmethod
+    def from_template(cls, table: Table, template, wager, units):
+        """Place a wager over an expansion template's rows, checking each bet as Bet() would."""
+        bets = []
+        for type, location, outcome, share in template:
+            bet = cls.view(type, list(location) if isinstance(location, tuple) else location,
+                           wager / units if share == 1 else share * wager / units, outcome)
+            bet.check_limit(table.limits[type])
+            bets.append(bet)
+        return bets
 
     def __init__(self, table: Table, type, location, wager=1):
         self.win = None
+        self.payout = None
         self.type = type
         self.location = location
         self.wager = wager
         self.outcome = table.get_outcome_by_type_location(type=type, location=location)
-        if wager < table.limits[type].min:
-            raise BetTooSmallException(self, table.limits[type].min)
-        if table.limits[type].max and wager > table.limits[type].max:
-            raise BetTooLargeException(self, table.limits[type].max)
+        self.check_limit(table.limits[type])
+
+    @classmethod
+    def view(cls, type, location, wager, outcome, win=None, payout=None):
+        """Build a Bet from already resolved fields, without checking it against a table."""
+        bet = cls.__new__(cls)
+        bet.win = win
+        bet.payout = payout
+        bet.type = type
+        bet.location = location
+        bet.wager = wager
+        bet.outcome = outcome
+        return bet
+
+    def check_limit(self, limit: TableLimit):
+        if self.wager < limit.min:
+            raise BetTooSmallException(self, limit.min)
+        if limit.max and self.wager > limit.max:
+            raise BetTooLargeException(self, limit.max)
 
     def __str__(self):
         return "{0} Bet for {1} at {2}".format(self.type, self.wager, self.location)
 
+    def get_json_dict(self):
+        return {
+            'location': self.location,
+            'outcome':  self.outcome and self.outcome.get_json_dict(),
+            'payout':   self.payout,
+            'type':     self.type,
+            'wager':    self.wager,
+            'win':      self.win,
+        }
+
     def __repr__(self):
         return "Bet(type={0},location={1},wager={2})".format(self.type, self.location, self.wager)
+
+
+class BetBook(object):
+    """The bets on a table, stored column-wise.
+
+    Each bet is a row across the columns: its outcome id (-1 when the location resolved to no
+    outcome), wager, whether that wager is a float, type code and location. Wagers are also
+    totalled per outcome as bets are added, so settlement only visits the outcomes that were
+    bet on. Bet objects are only built, as views, when the bets are asked for.
+
+    With netting, the book also remembers the bets as they were announced and which announced
+    bet every row came from. Its bets are then the announced bets, each with the payout of all
+    its rows, and its positions are the stakes netted per outcome.
+    """
+    types = ("straightUp", "split", "split3", "street", "corner", "first4", "first5", "line",
+             "column", "dozen", "outside")
+    codes = {type: code for code, type in enumerate(types)}
+    outside_types = frozenset(("column", "dozen", "outside"))
+
+    def __init__(self, layout: Layout, netting=False):
+        self.layout = layout
+        self.netting = netting
+        self.announced = None
+        self.announced_ids = array('i') if netting else None
+        self.announcing = -1
+        self.outcome_ids = array('i')
+        self.wagers = array('d')
+        self.float_wagers = array('B')
+        self.type_codes = array('B')
+        self.locations = []
+        self.stakes = {}
+        self.placed = 0
+        self.inside = 0
+        self.winning_number = None
+        self._bets = None
+
+    def __len__(self):
+        return len(self.outcome_ids)
+
+    def add(self, table: Table, type, location, wager=1):
+        """Resolve and limit-check a bet as Bet does, without keeping a Bet object for it."""
+        outcome = table.get_outcome_by_type_location(type=type, location=location)
+        limit = table.limits[type]
+        if wager < limit.min or (limit.max and wager > limit.max):
+            Bet.view(type, location, wager, outcome).check_limit(limit)
+        self.append(type, location, wager, outcome)
+
+    def add_packed(self, table: Table, outcome_ids, wagers):
+        """Add bets given as parallel arrays of outcome ids and integer wagers.
+
+        Each wager is limit-checked as a bet of its outcome's type in the layout's outcome_types,
+        and a Bet is only built to raise the limit error. The rows have no location.
+        """
+        if len(outcome_ids) != len(wagers):
+            raise BadBetException(f"{len(outcome_ids)} packed outcome ids for {len(wagers)} wagers")
+        outcome_types = self.layout.outcome_types
+        outcome_count = len(outcome_types)
+        outcomes = self.layout.outcome_list
+        codes = self.codes
+        limits = {}
+        type_codes = bytearray(len(outcome_ids))
+        stakes = self.stakes
+        placed = inside = 0
+        for row, (outcome_id, wager) in enumerate(zip(outcome_ids, wagers)):
+            if not 0 <= outcome_id < outcome_count:
+                raise UnableToDetermineBet(type=None, location=outcome_id)
+            type = outcome_types[outcome_id]
+            limit = limits.get(type)
+            if limit is None:
+                limit = limits[type] = table.limits[type]
+            if wager < limit.min or (limit.max and wager > limit.max):
+                Bet.view(type, None, wager, outcomes[outcome_id]).check_limit(limit)
+            type_codes[row] = codes[type]
+            stakes[outcome_id] = stakes.get(outcome_id, 0) + wager
+            placed += wager
+            if type not in self.outside_types:
+                inside += wager
+        self.outcome_ids.extend(array('i', outcome_ids))
+        self.wagers.extend(array('d', wagers))
+        self.float_wagers.frombytes(bytes(len(type_codes)))
+        self.type_codes.frombytes(type_codes)
+        self.locations.extend([None] * len(type_codes))
+        if self.announced_ids is not None:
+            start = len(self.announced)
+            types = self.types
+            self.announced.extend((types[code], None, wager) for code, wager in zip(type_codes, wagers))
+            self.announced_ids.extend(range(start, start + len(type_codes)))
+        self.placed += placed
+        self.inside += inside
+        self._bets = None
+
+    def announce(self, bets):
+        """Keep the announced bets for reporting, before they are resolved (which can consume locations)."""
+        self.announced = [(bet['type'], copy.deepcopy(bet.get('location')), bet.get('wager', 1)) for bet in bets]
+
+    def extend(self, bets):
+        for bet in bets:
+            self.append(bet.type, bet.location, bet.wager, bet.outcome)
+
+    def append(self, type, location, wager, outcome):
+        outcome_id = -1 if outcome is None else outcome.id
+        self.outcome_ids.append(outcome_id)
+        self.wagers.append(wager)
+        self.float_wagers.append(isinstance(wager, float))
+        self.type_codes.append(self.codes[type])
+        self.locations.append(location)
+        if self.announced_ids is not None:
+            self.announced_ids.append(self.announcing)
+        self.stakes[outcome_id] = self.stakes.get(outcome_id, 0) + wager
+        self.placed += wager
+        if type not in self.outside_types:
+            self.inside += wager
+        self._bets = None
+
+    def settle(self, winning_number: int):
+        """Settle every bet on the winning pocket and return the wager summary."""
+        winning_bit = 1 << winning_number
+        outcomes = self.layout.outcome_list
+        payout = on_table = lost = 0
+        for outcome_id, stake in self.stakes.items():
+            if outcome_id >= 0 and outcomes[outcome_id].mask & winning_bit:
+                payout += outcomes[outcome_id].odds * stake
+                on_table += stake
+            else:
+                lost += stake
+        self.winning_number = winning_number
+        self._bets = None
+        return {
+            'payout':  payout,
+            'onTable': on_table,
+            'placed':  self.placed,
+            'lost':    lost,
+        }
+
+    def pocket_totals(self):
+        """For every pocket, the payout and the wagers kept on the table if that pocket wins."""
+        outcomes = self.layout.outcome_list
+        outcome_pockets = self.layout.outcome_pockets
+        payouts = [0] * len(self.layout.pockets)
+        on_table = [0] * len(self.layout.pockets)
+        for outcome_id, stake in self.stakes.items():
+            if outcome_id < 0:
+                continue
+            outcome = outcomes[outcome_id]
+            payout = outcome.odds * stake
+            for number in outcome_pockets[outcome.name]:
+                payouts[number] += payout
+                on_table[number] += stake
+        return payouts, on_table
+
+    def get_bets(self):
+        """Bet views of every row, with win and payout filled in once the book is settled."""
+        if self._bets is None and self.netting:
+            self._bets = self.get_announced_bets()
+        if self._bets is None:
+            outcomes = self.layout.outcome_list
+            types = self.types
+            winning_bit = None if self.winning_number is None else 1 << self.winning_number
+            bets = []
+            for outcome_id, wager, float_wager, type_code, location in zip(
+                    self.outcome_ids, self.wagers, self.float_wagers, self.type_codes, self.locations):
+                outcome = None if outcome_id < 0 else outcomes[outcome_id]
+                wager = wager if float_wager else int(wager)
+                if winning_bit is None:
+                    bets.append(Bet.view(types[type_code], location, wager, outcome))
+                elif outcome is not None and outcome.mask & winning_bit:
+                    bets.append(Bet.view(types[type_code], location, wager, outcome, True, outcome.odds * wager))
+                else:
+                    bets.append(Bet.view(types[type_code], location, wager, outcome, False, 0))
+            self._bets = bets
+        return self._bets
+
+    def get_announced_bets(self):
+        """Bet views of the announced bets; one covering several outcomes has no single outcome."""
+        outcomes = self.layout.outcome_list
+        winning_bit = None if self.winning_number is None else 1 << self.winning_number
+        rows = [[] for _ in self.announced or ()]
+        for announced_id, outcome_id, wager, float_wager in zip(
+                self.announced_ids, self.outcome_ids, self.wagers, self.float_wagers):
+            rows[announced_id].append((outcome_id, wager if float_wager else int(wager)))
+        bets = []
+        for (type, location, wager), placed in zip(self.announced or (), rows):
+            outcome_ids = {outcome_id for outcome_id, _ in placed}
+            outcome_id = outcome_ids.pop() if len(outcome_ids) == 1 else -1
+            outcome = None if outcome_id < 0 else outcomes[outcome_id]
+            if winning_bit is None:
+                bets.append(Bet.view(type, location, wager, outcome))
+                continue
+            won = [(outcome_id, wager) for outcome_id, wager in placed
+                   if outcome_id >= 0 and outcomes[outcome_id].mask & winning_bit]
+            bets.append(Bet.view(type, location, wager, outcome, bool(won),
+                                 sum(outcomes[outcome_id].odds * wager for outcome_id, wager in won)))
+        return bets
+
+    def get_positions(self):
+        """(outcome, stake, win, payout) netted per outcome bet on, in outcome order."""
+        outcomes = self.layout.outcome_list
+        winning_bit = None if self.winning_number is None else 1 << self.winning_number
+        positions = []
+        for outcome_id in sorted(self.stakes):
+            stake = self.stakes[outcome_id]
+            outcome = None if outcome_id < 0 else outcomes[outcome_id]
+            if winning_bit is None:
+                positions.append((outcome, stake, None, None))
+            elif outcome is not None and outcome.mask & winning_bit:
+                positions.append((outcome, stake, True, outcome.odds * stake))
+            else:
+                positions.append((outcome, stake, False, 0))
+        return positions
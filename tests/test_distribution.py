@@ -0,0 +1,59 @@
+import itertools
+import json
+import math
+import unittest
+from wheel import Wheel
+from table import Table
+from distribution import ResultDistribution, load_numpy
+
+
+class TestResultDistribution(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            request = json.load(f)
+        self.exposure = Table(wheel=Wheel.EUROPEAN, limits=request['table'], bets=request['bets']).get_exposure()
+        self.backends = ['python'] + (['numpy'] if load_numpy() is not None else [])
+
+    def test_matches_enumeration(self):
+        bets = [{'type': 'straightUp', 'wager': 2, 'location': 17},
+                {'type': 'column', 'wager': 3, 'location': [2]}, {'type': 'outside', 'wager': 5, 'location': 'red'}]
+        net = Table(wheel=Wheel.AMERICAN, bets=bets).get_exposure().net
+        for spins in [1, 2, 3]:
+            expected = {}
+            for pockets in itertools.product(net, repeat=spins):
+                expected[sum(pockets)] = expected.get(sum(pockets), 0) + len(net) ** -spins
+            for backend in self.backends:
+                distribution = ResultDistribution.from_net(net, spins, backend)
+                items = dict((value, probability) for value, probability in distribution.items() if probability > 1e-12)
+                self.assertEqual(sorted(items), sorted(expected))
+                for value, probability in expected.items():
+                    self.assertAlmostEqual(items[value], probability, places=12)
+
+    def test_straight_up_is_binomial(self):
+        spins, pockets = 100, 37
+        distribution = Table(wheel=Wheel.EUROPEAN, bets=[{'type': 'straightUp', 'wager': 1, 'location': 0}]) \
+            .get_exposure().get_distribution(spins)
+        items = dict(distribution.items())
+        for hits in range(0, 15):
+            expected = math.comb(spins, hits) * (1 / pockets) ** hits * (1 - 1 / pockets) ** (spins - hits)
+            self.assertAlmostEqual(items.get(36 * hits - spins, 0.0), expected, places=12)
+
+    def test_summary(self):
+        for backend in self.backends:
+            distribution = self.exposure.get_distribution(200, backend)
+            self.assertAlmostEqual(sum(distribution.probabilities), 1.0, places=9)
+            self.assertAlmostEqual(distribution.mean, 200 * self.exposure.expected_value, places=6)
+            quantiles = [distribution.quantile(q) for q in (0.01, 0.5, 0.99)]
+            self.assertEqual(quantiles, sorted(quantiles))
+            self.assertAlmostEqual(distribution.probability_of_loss(),
+                                   sum(p for value, p in distribution.items() if value < 0), places=9)
+            self.assertLessEqual(distribution.probability_of_loss(1000), distribution.probability_of_loss())
+            self.assertEqual(distribution.get_json_dict()['spins'], 200)
+
+    def test_single_spin(self):
+        distribution = self.exposure.get_distribution(1)
+        expected = {}
+        for net in self.exposure.net:
+            expected[net] = expected.get(net, 0) + 1 / len(self.exposure.net)
+        self.assertEqual(sorted(distribution.items()), sorted(expected.items()))
@@ -0,0 +1,81 @@
+import copy
+import json
+import subprocess
+import sys
+import unittest
+from wheel import Wheel
+from table import Table
+from exposure import Exposure, house_exposure
+from roulette import RouletteRound, handle_exposure
+
+
+class TestExposure(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+
+    def test_matches_settlement_on_every_pocket(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            bets = [bet for bet in self.request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+            table = Table(wheel=wheel, limits=self.request['table'], bets=copy.deepcopy(bets))
+            exposure = table.get_exposure()
+            self.assertEqual(len(exposure.net), len(table.pockets))
+            for number in range(len(table.pockets)):
+                wager = table.book.settle(number)
+                self.assertEqual(exposure.payouts[number], wager['payout'])
+                self.assertEqual(exposure.net[number], wager['payout'] - wager['lost'])
+
+    def test_straight_up(self):
+        for wheel, pockets in [(Wheel.AMERICAN, 38), (Wheel.EUROPEAN, 37)]:
+            exposure = Table(wheel=wheel, bets=[{'type': 'straightUp', 'wager': 10, 'location': 17}]).get_exposure()
+            self.assertAlmostEqual(exposure.house_edge, (pockets - 36) / pockets)
+            self.assertAlmostEqual(exposure.expected_value, -10 * (pockets - 36) / pockets)
+            self.assertEqual(exposure.worst_case, 350)
+            self.assertEqual(exposure.worst_pockets, [17])
+            mean = exposure.expected_value
+            self.assertAlmostEqual(exposure.variance, ((350 - mean) ** 2 + (pockets - 1) * (-10 - mean) ** 2) / pockets)
+        exposure = Table(wheel=Wheel.AMERICAN,
+                         bets=[{'type': 'split', 'wager': 1, 'location': ['00', 3]}]).get_exposure()
+        self.assertEqual(exposure.worst_pockets, [3, '00'])
+
+    def test_aggregation(self):
+        first = Table(wheel=Wheel.EUROPEAN, bets=[{'type': 'straightUp', 'wager': 10, 'location': 17}]).get_exposure()
+        second = Table(wheel=Wheel.EUROPEAN, bets=[{'type': 'outside', 'wager': 20, 'location': 'red'}]).get_exposure()
+        combined = Exposure.combine([first, second])
+        self.assertEqual(combined.placed, 30)
+        self.assertEqual(combined.net[17], 350 - 20)
+        self.assertEqual(combined.net[1], 20 - 10)
+        self.assertAlmostEqual(combined.expected_value, first.expected_value + second.expected_value)
+        house = house_exposure([first, second])
+        self.assertEqual(house['tables'], 2)
+        self.assertEqual(house['worstCaseBound'], 370)
+        self.assertAlmostEqual(house['variance'], first.variance + second.variance)
+        shared = house_exposure([first, second], shared_spin=True)
+        self.assertEqual((shared['worstCase'], shared['worstPockets']), (330, [17]))
+        self.assertAlmostEqual(shared['variance'], combined.variance)
+        # A table the house wins on every pocket lowers the bound rather than counting as zero
+        lost = Exposure(Wheel.EUROPEAN, 10, [0] * 37, [0] * 37)
+        self.assertEqual(house_exposure([first, lost])['worstCaseBound'], 350 - 10)
+        with self.assertRaises(ValueError):
+            Exposure.combine([first, Table(wheel=Wheel.AMERICAN).get_exposure()])
+
+    def test_round_and_request(self):
+        game = RouletteRound(players={'a': [{'type': 'straightUp', 'wager': 10, 'location': 17}],
+                                      'b': [{'type': 'outside', 'wager': 20, 'location': 'red'}]})
+        self.assertEqual(game.get_exposure().net[17], 330)
+        result = handle_exposure(self.request)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['exposure']['placed'], 311)
+        self.assertFalse(handle_exposure({'hash': 'x'})['success'])
+
+    def test_request_path_does_not_load_numpy(self):
+        probe = ("import json, sys, lambda_function\n"
+                 "request = json.load(open('testRequest.json'))\n"
+                 "assert lambda_function.lambda_handler(request, None)['success']\n"
+                 "assert 'numpy' not in sys.modules and 'distribution' not in sys.modules\n")
+        subprocess.run([sys.executable, '-c', probe], check=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
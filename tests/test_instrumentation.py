@@ -0,0 +1,82 @@
+import json
+import logging
+import subprocess
+import sys
+import unittest
+import instrumentation
+from roulette import handle_request, process_request
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.request['hash'] = 'a' * 64
+        self.addCleanup(instrumentation.configure)
+
+    def fresh(self):
+        return json.loads(json.dumps(self.request))
+
+    def test_disabled(self):
+        self.assertIsNone(instrumentation.start())
+        self.assertNotIn('timing', handle_request(self.fresh()))
+
+    def test_disabled_imports_nothing(self):
+        probe = ("import sys, instrumentation\n"
+                 "assert instrumentation.start() is None\n"
+                 "assert not {'cProfile', 'logging', 'pstats', 'random', 'tracemalloc'} & set(sys.modules)\n")
+        subprocess.run([sys.executable, '-c', probe], check=True)
+
+    def test_response_timing(self):
+        expected = handle_request(self.fresh())
+        instrumentation.configure(respond=True)
+        result = handle_request(self.fresh())
+        timing = result.pop('timing')
+        self.assertEqual(result, expected)
+        self.assertEqual(list(timing['phases']),
+                         ['validate', 'table', 'bets', 'neighbors', 'sectors', 'spin', 'encode'])
+        self.assertAlmostEqual(sum(timing['phases'].values()), timing['totalMs'], places=6)
+        self.assertEqual(timing['counters']['betsParsed'], len(self.request['bets']))
+        self.assertGreater(timing['counters']['outcomesResolved'], len(self.request['bets']))
+
+    def test_histogram_and_serialized_bytes(self):
+        histogram = instrumentation.Histogram()
+        instrumentation.configure(sinks=[histogram])
+        responses = [process_request(self.fresh()) for _ in range(5)]
+        self.assertNotIn('timing', json.loads(responses[0]))
+        self.assertIs(instrumentation.get_histogram(), histogram)
+        summary = histogram.get_json_dict()
+        self.assertEqual(summary['requests'], 5)
+        self.assertEqual(summary['counters']['bytesSerialized'], sum(map(len, responses)))
+        self.assertEqual(summary['phases']['serialize']['count'], 5)
+        low, high = summary['phases']['total']['percentilesMs']['50'], summary['phases']['total']['percentilesMs']['99']
+        self.assertLessEqual(low, high)
+
+    def test_sampling(self):
+        draws = iter([0.5, 0.05, 0.9])
+        histogram = instrumentation.Histogram()
+        instrumentation.configure(sinks=[histogram], sample_rate=0.1, rng=lambda: next(draws))
+        for _ in range(3):
+            handle_request(self.fresh())
+        self.assertEqual(histogram.requests, 1)
+
+    def test_profile_and_memory(self):
+        profiles = []
+        histogram = instrumentation.Histogram()
+        instrumentation.configure(sinks=[histogram], profile_rate=1.0, memory_rate=1.0, profile_sink=profiles.append)
+        handle_request(self.fresh())
+        self.assertEqual(len(profiles), 1)
+        self.assertGreater(histogram.counters['peakBytes'], 0)
+
+    def test_log_sink_and_environment(self):
+        current = instrumentation.configure_from_environment({'ROULETTE_TIMING': 'log, response',
+                                                              'ROULETTE_TIMING_SAMPLE': '0.5'})
+        self.assertTrue(current.respond)
+        self.assertEqual(current.sample_rate, 0.5)
+        self.assertIsInstance(current.sinks[0], instrumentation.LogSink)
+        instrumentation.configure(sinks=[instrumentation.LogSink()])
+        with self.assertLogs('roulette.timing', logging.INFO) as logs:
+            handle_request(self.fresh())
+        self.assertIn('validate=', logs.output[0])
+        self.assertFalse(instrumentation.configure_from_environment({}).enabled)
@@ -0,0 +1,120 @@
+import contextlib
+import copy
+import io
+import json
+import os
+import tempfile
+import unittest
+from wheel import Wheel
+from roulette import RouletteEngine
+from journal import JournalError, JournalReader, JournalWriter, main, pack_location, unpack_location
+
+
+def hash_for(number, salt=0):
+    return format(number, '013x') + format(salt, '051x')
+
+
+class TestJournal(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'rounds.rj')
+
+    def engine(self, wheel, number, salt=0, netting=False):
+        bets = [bet for bet in self.request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+        engine = RouletteEngine(hash=hash_for(number, salt), wheel=wheel, table=self.request['table'],
+                                bets=copy.deepcopy(bets), netting=netting)
+        engine.spin()
+        return engine
+
+    def test_export_matches_engine(self):
+        engines = [self.engine(wheel, number, salt) for salt, wheel in enumerate(Wheel)
+                   for number in range(len(wheel.get_track()))]
+        with JournalWriter(self.path, buffer_size=4096) as writer:
+            writer.extend(engines)
+        with JournalReader(self.path) as reader:
+            self.assertEqual(len(reader), len(engines))
+            for number, engine in enumerate(engines):
+                self.assertEqual(reader.to_json(number), engine.to_json())
+                self.assertEqual(reader.find(engine.hash), [number])
+            summary = reader.summary()
+            self.assertEqual(summary['rounds'], len(engines))
+            self.assertEqual(summary['placed'], sum(engine.wager['placed'] for engine in engines))
+            self.assertEqual(summary['winners']['American']['00'], 1)
+            self.assertEqual([record.winner for record in reader], [engine.table.winning_number for engine in engines])
+
+    def test_netting_rounds_export_expanded_bets(self):
+        netted, plain = self.engine(Wheel.EUROPEAN, 26, netting=True), self.engine(Wheel.EUROPEAN, 26)
+        with JournalWriter(self.path) as writer:
+            writer.append(netted)
+        with JournalReader(self.path) as reader:
+            self.assertEqual(reader.get_json_dict(0), plain.get_json_dict())
+
+    def test_reopen_and_unindexed_rounds(self):
+        with JournalWriter(self.path) as writer:
+            writer.append(self.engine(Wheel.EUROPEAN, 1))
+            writer.append(self.engine(Wheel.EUROPEAN, 2))
+        # A writer that flushes but never closes leaves its rounds out of the index
+        writer = JournalWriter(self.path)
+        writer.append(self.engine(Wheel.EUROPEAN, 1))
+        writer.append(self.engine(Wheel.AMERICAN, 3))
+        writer.flush()
+        with JournalReader(self.path) as reader:
+            self.assertEqual((len(reader), reader.index_covers), (4, 2))
+            self.assertEqual(reader.find(hash_for(1)), [0, 2])
+            self.assertEqual(reader.find(hash_for(3)), [3])
+            self.assertEqual(reader.find(hash_for(4)), [])
+        writer.rounds_file.close()
+        writer.bets_file.close()
+        with JournalWriter(self.path) as writer:
+            self.assertEqual(len(writer), 4)
+            writer.append(self.engine(Wheel.EUROPEAN, 3, salt=1))
+        with JournalReader(self.path) as reader:
+            self.assertEqual((len(reader), reader.index_covers, reader.indexed), (5, 5, 5))
+            self.assertEqual(reader.find(hash_for(1)), [0, 2])
+            self.assertEqual(reader.get_json_dict(3)['wheel'], 'American')
+
+    def test_partial_record_dropped(self):
+        engine = self.engine(Wheel.EUROPEAN, 7)
+        with JournalWriter(self.path) as writer:
+            writer.append(engine)
+        with open(self.path, 'ab') as f:
+            f.write(b'\0' * 10)
+        with JournalWriter(self.path) as writer:
+            writer.append(engine)
+        with JournalReader(self.path) as reader:
+            self.assertEqual(reader.find(engine.hash), [0, 1])
+            self.assertEqual(reader.to_json(1), engine.to_json())
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'{"not": "a journal"}')
+        with self.assertRaises(JournalError):
+            JournalWriter(self.path)
+        with self.assertRaises(JournalError):
+            JournalWriter(self.path + '.unsettled').append(RouletteEngine(hash=hash_for(1)))
+
+    def test_locations(self):
+        for location in (None, 0, 36, '27', 'red', [], [10, 14], ['25', 26], ['00'], 300, [1, 2, 3, 4, 5, 6]):
+            out = bytearray(b'x')
+            pack_location(location, out)
+            self.assertEqual(unpack_location(out, 1), (location, len(out)))
+
+    def test_cli(self):
+        engine = self.engine(Wheel.EUROPEAN, 17)
+        with JournalWriter(self.path) as writer:
+            writer.append(engine)
+        for argv in (['export', self.path, engine.hash], ['export', self.path, '0']):
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                self.assertEqual(main(argv), 0)
+            self.assertEqual(json.loads(output.getvalue()), json.loads(engine.to_json()))
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            self.assertEqual(main(['export', self.path, hash_for(18)]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from load_replay import compare, main, replay, run, synthesize
+from roulette import requestValidator
+
+
+class TestLoadReplay(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.template = json.load(f)
+
+    def test_synthesized_mix(self):
+        requests = list(synthesize(self.template, 400, bets=(2, 5), american=0.5, invalid=0.25, seed=3))
+        self.assertEqual(requests, list(synthesize(self.template, 400, bets=(2, 5), american=0.5, invalid=0.25,
+                                                   seed=3)))
+        invalid = [request for request in requests if requestValidator.first_error(request) is not None]
+        self.assertTrue(60 < len(invalid) < 140, len(invalid))
+        valid = [request for request in requests if request not in invalid]
+        self.assertTrue(all(2 <= len(request['bets']) <= 5 for request in valid))
+        american = [request for request in valid if request['wheel'] == 'American']
+        self.assertTrue(100 < len(american) < 200, len(american))
+        self.assertFalse(any(bet['type'] == 'sector' for request in american for bet in request['bets']))
+        self.assertEqual(len({request['hash'] for request in requests}), len(requests))
+
+    def test_targets_agree(self):
+        lines = [json.dumps(request) + '\n' for request in synthesize(self.template, 30, invalid=0.3, seed=1)]
+        reports = [run(lines, target, concurrency=2, alloc_sample=5) for target in ('process_request', 'lambda')]
+        self.assertEqual(reports[0]['results'], reports[1]['results'])
+        self.assertIn("<class 'jsonschema.exceptions.ValidationError'>", reports[0]['results'])
+        for report in reports:
+            self.assertEqual(report['requests'], 30)
+            self.assertEqual(sum(report['results'].values()), 30)
+            self.assertEqual(list(report['latencyMs']), ['50', '95', '99', '99.9'])
+            self.assertEqual(report['allocations']['sampled'], 5)
+            self.assertGreater(report['allocations']['peakKiBMean'], 0)
+
+    def test_rate(self):
+        lines = [json.dumps(dict(self.template, bets=self.template['bets'][:3]))]
+        latencies, results, elapsed = replay(lambda request: None, lines, count=21, concurrency=2, rate=200)
+        self.assertEqual((len(latencies), results), (21, {'ok': 21}))
+        self.assertGreaterEqual(elapsed, 0.1)
+
+    def test_compare(self):
+        report = {'latencyMs': {'50': 1.0, '99': 13.0, '99.9': None}}
+        self.assertEqual(list(compare(report, {'latencyMs': {'50': 1.0, '99': 10.0, '99.9': 20.0}}, 0.25)), ['99'])
+        self.assertEqual(compare(report, {}, 0.25), {})
+
+    def test_cli(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mix.ndjson')
+            report_path = os.path.join(directory, 'report.json')
+            self.assertEqual(main(['synthesize', '--count', '20', '--bets', '1', '3', '--output', path]), 0)
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(['run', path, '--warmup', '2', '--alloc-sample', '0',
+                                       '--output', report_path]), 0)
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual((report['requests'], report['allocations']), (20, None))
+            report['latencyMs'] = {point: 1e-6 for point in report['latencyMs']}
+            with open(report_path, 'w') as f:
+                json.dump(report, f)
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                self.assertEqual(main(['run', path, '--warmup', '0', '--alloc-sample', '0',
+                                       '--baseline', report_path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+import monitor
+from monitor import FairnessMonitor, chi_square_survival, monitor_file
+from table import Table
+from verifier import generate_chain
+from wheel import Wheel
+
+
+class TestFairnessMonitor(unittest.TestCase):
+
+    def test_chi_square_survival(self):
+        for statistic, degrees, expected in ((3.841458820694124, 1, 0.05), (50.99846016571065, 36, 0.05),
+                                             (0, 36, 1.0)):
+            self.assertAlmostEqual(chi_square_survival(statistic, degrees), expected, places=6)
+
+    def test_batches_match_single_winners(self):
+        rng = random.Random(3)
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            pockets = len(wheel.get_track())
+            numbers = [rng.randrange(pockets) for _ in range(3000)] + [5] * 7
+            single = FairnessMonitor(wheel, windows=(37, 500))
+            for number in numbers:
+                single.add(number)
+            backends = [None] + ([monitor.numpy] if monitor.numpy is not None else [])
+            for backend in backends:
+                with mock.patch('monitor.numpy', backend):
+                    batched = FairnessMonitor(wheel, windows=(37, 500))
+                    batched.add_numbers(numbers[:1200])
+                    batched.add_numbers(numbers[1200:1300])
+                    batched.add_numbers(numbers[1300:])
+                self.assertEqual(batched.get_json_dict(), single.get_json_dict())
+            self.assertEqual(single.streaks_json()['pocket']['current'], {'length': 7, 'value': '5'})
+
+    def test_window_statistic(self):
+        windowed = FairnessMonitor(windows=(100,))
+        rng = random.Random(5)
+        numbers = [rng.randrange(37) for _ in range(250)]
+        for number in numbers:
+            windowed.add(number)
+        fresh = FairnessMonitor(windows=())
+        for number in numbers[-100:]:
+            fresh.add(number)
+        window = windowed.window_json(windowed.windows[0])
+        self.assertEqual(window['filled'], 100)
+        self.assertAlmostEqual(window['tests']['pocket']['chiSquare'], fresh.test('pocket', fresh.counts, 100)[0])
+        self.assertEqual(window['tests']['color'], dict(zip(('chiSquare', 'degreesOfFreedom', 'pValue'),
+                                                            fresh.test('color', fresh.counts, 100))))
+
+    def test_observes_winners(self):
+        table = Table(wheel=Wheel.AMERICAN)
+        watcher = FairnessMonitor(Wheel.AMERICAN)
+        for digest in generate_chain('winners', 200):
+            table.choose(digest.hex())
+            watcher.observe(table.winner)
+        table.choose(format(37, '013x') + '0' * 51)
+        watcher.observe(table.winner)
+        result = watcher.get_json_dict()
+        self.assertEqual(result['total'], 201)
+        self.assertGreaterEqual(result['counts']['00'], 1)
+        self.assertAlmostEqual(sum(result['frequencies']['color'].values()), 1)
+        self.assertEqual(result['alerts'], [])
+        with self.assertRaises(ValueError):
+            FairnessMonitor(Wheel.EUROPEAN).add(37)
+
+    def test_flags_biased_source(self):
+        rng = random.Random(9)
+        biased = FairnessMonitor(windows=(370, 3700))
+        biased.add_numbers([rng.choice((0, 17)) if rng.random() < 0.05 else rng.randrange(37) for _ in range(4000)])
+        kinds = {(alert['kind'], alert['attribute']) for alert in biased.alerts()}
+        self.assertIn(('window', 'pocket'), kinds)
+        stuck = FairnessMonitor()
+        stuck.add_numbers([rng.randrange(37) for _ in range(1000)] + [1, 3, 5, 7, 9, 12, 14, 16, 18, 19] * 3)
+        self.assertIn(('streak', 'color'), {(alert['kind'], alert['attribute']) for alert in stuck.alerts()})
+
+    def test_monitor_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hashes.txt')
+            digests = list(generate_chain('file', 500))
+            with open(path, 'w') as f:
+                f.writelines(digest.hex() + '\n' for digest in digests)
+            with open(path + '.bin', 'wb') as f:
+                f.write(b''.join(digests))
+            text = monitor_file(path, Wheel.AMERICAN, chunk_size=64).get_json_dict()
+            binary = monitor_file(path + '.bin', Wheel.AMERICAN, binary=True, chunk_size=64).get_json_dict()
+            self.assertEqual(text, binary)
+            self.assertEqual(text['total'], 500)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import base64
+import contextlib
+import copy
+import hashlib
+import io
+import json
+import unittest
+from array import array
+import packed_bets
+from packed_bets import decode, encode, main, outcome_catalog, pack_bets
+from roulette import RouletteEngine, handle_request
+from table import BadBetException, BetTooLargeException, BetTooSmallException, InsideBetsTooLarge, Table, \
+    UnableToDetermineBet, get_layout
+from wheel import Wheel
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def hash_for(number):
+    return format(number, '013x') + '0' * 51
+
+
+class TestPackedBets(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.limits = self.request['table']
+
+    def bets(self, wheel):
+        # American neighbors of 00 place a straightUp on pocket 37, which has no outcome to pack
+        return [bet for bet in self.request['bets']
+                if wheel == Wheel.EUROPEAN or not bet['type'].startswith(('sector', 'neighbors'))]
+
+    def test_catalog_ids_are_stable(self):
+        digests = {
+            Wheel.AMERICAN: 'efb1214c876c08a40fa61923b8938b5aad52cb28aa795f742916980d86e7d832',
+            Wheel.EUROPEAN: '24de1482809e977e9b054819cecc2adc2758958b6a2a517e08e9b73e7305f6f5',
+        }
+        for wheel, digest in digests.items():
+            catalog = outcome_catalog(wheel)
+            self.assertEqual(hashlib.sha256(json.dumps(catalog).encode()).hexdigest(), digest)
+            self.assertEqual([entry['id'] for entry in catalog], list(range(len(catalog))))
+        types = {entry['name']: entry['type'] for entry in outcome_catalog(Wheel.AMERICAN)}
+        self.assertEqual([types[name] for name in ('00', 'Split 0-00', '3Way 00-2-3', 'Line 2', 'Zero-Line', 'Red')],
+                         ['straightUp', 'split', 'split3', 'line', 'first5', 'outside'])
+
+    def test_settles_as_json_bets(self):
+        for wheel in Wheel:
+            packed = pack_bets(wheel, self.bets(wheel), self.limits)
+            for number in range(len(wheel.get_track())):
+                plain = RouletteEngine(hash=hash_for(number), wheel=wheel, table=self.limits,
+                                       bets=copy.deepcopy(self.bets(wheel)))
+                compact = RouletteEngine(hash=hash_for(number), wheel=wheel, table=self.limits, packed=packed)
+                plain.spin()
+                compact.spin()
+                self.assertEqual(compact.wager, plain.wager)
+                self.assertEqual(compact.get_exposure().get_json_dict(), plain.get_exposure().get_json_dict())
+                self.assertEqual([(bet.outcome, bet.wager, bet.win, bet.payout) for bet in compact.table.bets],
+                                 [(bet.outcome, bet.wager, bet.win, bet.payout) for bet in plain.table.bets])
+            self.assertEqual({bet.location for bet in compact.table.bets}, {None})
+
+    def test_mixed_and_netted(self):
+        bets = [{'type': 'straightUp', 'wager': 2, 'location': 17},
+                {'type': 'outside', 'wager': 5, 'location': 'red'}]
+        layout = get_layout(Wheel.EUROPEAN)
+        packed = encode([layout.outcomes['17'].id, layout.outcomes['Dozen 2'].id], [3, 4])
+        for netting in (False, True):
+            engine = RouletteEngine(hash=hash_for(17), bets=copy.deepcopy(bets), packed=packed, netting=netting)
+            engine.spin()
+            self.assertEqual(engine.wager, {'delta': 187, 'lost': 5, 'onTable': 9, 'payout': 183, 'placed': 14})
+            self.assertEqual([(bet.type, bet.location, bet.wager) for bet in engine.table.bets],
+                             [('straightUp', 17, 2), ('outside', 'red', 5), ('straightUp', None, 3),
+                              ('dozen', None, 4)])
+        self.assertEqual([position['wager'] for position in engine.get_json_dict()['positions']], [5, 4, 5])
+
+    def test_limits(self):
+        layout = get_layout(Wheel.EUROPEAN)
+        corner = {'type': 'corner', 'location': [1, 5]}
+        column = {'type': 'column', 'location': [1]}
+        for bets, limits, error in (
+                ([dict(corner, wager=201)], self.limits, BetTooLargeException),
+                ([dict(column, wager=4)], self.limits, BetTooSmallException),
+                ([dict(corner, wager=100)] * 2, dict(self.limits, totalInside={'max': 150}), InsideBetsTooLarge)):
+            with self.assertRaises(error):
+                RouletteEngine(hash=hash_for(1), table=limits, bets=copy.deepcopy(bets))
+            ids = [layout.find_outcome(bet['type'], bet['location']).id for bet in bets]
+            with self.assertRaises(error):
+                RouletteEngine(hash=hash_for(1), table=limits, packed=encode(ids, [bet['wager'] for bet in bets]))
+        with self.assertRaises(UnableToDetermineBet):
+            RouletteEngine(packed=encode([len(layout.outcome_list)], [1]))
+        with self.assertRaises(BadBetException):
+            RouletteEngine(packed=encode([1], []))
+
+    def test_every_catalog_type_has_default_limits(self):
+        for wheel in Wheel:
+            layout = get_layout(wheel)
+            line = layout.find_outcome('line', [1, 4])
+            self.assertEqual(layout.outcome_types[line.id], 'line')
+            # Neither request gives a line limit, so both take the default
+            engine = RouletteEngine(hash=hash_for(4), wheel=wheel, packed=encode([line.id], [6]))
+            plain = RouletteEngine(hash=hash_for(4), wheel=wheel,
+                                   bets=[{'type': 'line', 'wager': 6, 'location': [1, 4]}])
+            engine.spin()
+            plain.spin()
+            self.assertEqual(engine.wager, plain.wager)
+            self.assertGreater(engine.wager['payout'], 0)
+            self.assertLessEqual({entry['type'] for entry in outcome_catalog(wheel)}, set(Table.get_defaults()))
+
+    def test_decode(self):
+        packed = encode([0, 156, 65535], [1, 2 ** 32 - 1, 7])
+        self.assertEqual(packed['outcomes'], base64.b64encode(bytes([0, 0, 156, 0, 255, 255])).decode())
+        outcome_ids, wagers = decode(packed)
+        self.assertEqual((outcome_ids.tolist(), wagers.tolist()), ([0, 156, 65535], [1, 2 ** 32 - 1, 7]))
+        if numpy is not None:
+            self.assertEqual(decode({'outcomes': base64.b64encode(numpy.array([5, 9], '<u2').tobytes()).decode(),
+                                     'wagers': base64.b64encode(numpy.array([3, 4], '<u4').tobytes()).decode()}),
+                             (array(packed_bets.OUTCOME_TYPECODE, [5, 9]), array(packed_bets.WAGER_TYPECODE, [3, 4])))
+        for bad in ({'outcomes': 'AAA=', 'wagers': ''}, {'outcomes': 'AA A', 'wagers': ''},
+                    {'outcomes': 'AAAA', 'wagers': 'AQAAAA=='}):
+            with self.assertRaises(BadBetException):
+                decode(bad)
+
+    def test_requests(self):
+        request = {'hash': hash_for(5), 'table': self.limits,
+                   'packed': pack_bets(Wheel.EUROPEAN, self.bets(Wheel.EUROPEAN), self.limits)}
+        plain = handle_request({'hash': hash_for(5), 'table': self.limits, 'bets': self.bets(Wheel.EUROPEAN)})
+        result = handle_request(request)
+        self.assertEqual(result['wager'], plain['wager'])
+        self.assertIn('ValidationError', handle_request(dict(request, packed={'outcomes': 5}))['exception']['type'])
+        self.assertIn('BadBetException', handle_request(dict(request, packed={'outcomes': 'AAA=', 'wagers': ''}))
+                      ['exception']['type'])
+
+    def test_cli(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['pack', 'testRequest.json']), 0)
+        packed = json.loads(output.getvalue())
+        self.assertNotIn('bets', packed)
+        self.assertEqual(packed['packed'], pack_bets(Wheel.EUROPEAN, self.request['bets'], self.limits))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(main(['catalog', '--wheel', 'American']), 0)
+        self.assertEqual(json.loads(output.getvalue()), outcome_catalog(Wheel.AMERICAN))
+
+
+if __name__ == '__main__':
+    unittest.main()
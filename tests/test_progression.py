@@ -0,0 +1,78 @@
+import random
+import unittest
+from unittest import mock
+import progression
+from roulette import RouletteEngine
+from progression import Fibonacci, Martingale, SessionSimulator, Strategy, simulate_sessions
+
+
+def hash_for(number):
+    return format(number, '013x') + '0' * 51
+
+
+class TestProgression(unittest.TestCase):
+
+    def test_session_matches_engine(self):
+        bet = {'type': 'split', 'location': [17, 20], 'wager': 2}
+        simulator = SessionSimulator(bet, table={'split': {'max': 40}})
+        result = simulator.run(Martingale(), sessions=1, bankroll=500, max_spins=60, seed=11)
+
+        rng = random.Random(11)
+        strategy = Martingale()
+        state, balance, spins = strategy.start(), 500, 0
+        for _ in range(60):
+            pocket = rng.choices(range(37), k=1)[0]
+            wager = 2 * strategy.units(state)
+            if wager > 40 or wager > balance:
+                break
+            engine = RouletteEngine(hash=hash_for(pocket), table={'split': {'max': 40}},
+                                    bets=[dict(bet, location=[17, 20], wager=wager)])
+            engine.spin()
+            net = engine.wager['payout'] - engine.wager['lost']
+            balance += net
+            spins += 1
+            state = strategy.advance(state, net > 0)
+        self.assertEqual(result['bankroll']['min'], balance)
+        self.assertEqual(result['length']['min'], spins)
+
+    def test_limits_and_ruin(self):
+        bet = {'type': 'outside', 'location': 'red', 'wager': 5}
+        stopped = simulate_sessions(bet, 'martingale', table={'outside': {'max': 80}}, sessions=300,
+                                    bankroll=10000, max_spins=500)
+        self.assertEqual(stopped['endings']['limit'], 300)
+        capped = simulate_sessions(bet, 'martingale', table={'outside': {'max': 80}}, on_limit='cap',
+                                   sessions=300, bankroll=100, max_spins=500)
+        self.assertEqual(capped['endings']['limit'], 0)
+        self.assertGreater(capped['riskOfRuin'], 0.5)
+        self.assertGreater(capped['drawdown']['mean'], 0)
+
+    def test_strategies(self):
+        fibonacci = Fibonacci()
+        self.assertEqual([fibonacci.units(state) for state in range(7)], [1, 1, 2, 3, 5, 8, 13])
+        bet = {'type': 'neighbors1', 'location': [0], 'wager': 3}
+        for strategy in ('flat', 'dalembert', 'fibonacci', lambda units, won: 1 if won else units + 2):
+            result = simulate_sessions(bet, strategy, sessions=50, bankroll=300, max_spins=100, target=60, seed=2)
+            self.assertEqual(sum(result['endings'].values()), 50)
+            self.assertEqual(sum(count for length, count in result['length']['distribution']), 50)
+        with self.assertRaises(TypeError):
+            type('Incomplete', (Strategy,), {})()
+        self.assertEqual(simulate_sessions(bet, 'flat', sessions=20, seed=4),
+                         simulate_sessions(bet, 'flat', sessions=20, seed=4))
+
+    def test_backends_agree(self):
+        red = {'type': 'outside', 'location': 'red', 'wager': 5}
+        neighbors = {'type': 'neighbors1', 'location': [0], 'wager': 3}
+        for bet, strategy, options in (
+                (red, 'martingale', {'table': {'outside': {'max': 80}}, 'on_limit': 'cap', 'bankroll': 100}),
+                (red, 'martingale', {'table': {'outside': {'max': 80}}, 'bankroll': 10000}),
+                (neighbors, 'fibonacci', {'bankroll': 300, 'target': 60}),
+                (neighbors, lambda units, won: 1 if won else units + 2, {'bankroll': 300, 'target': 60})):
+            results = []
+            for backend in [None] + ([progression.numpy] if progression.numpy is not None else []):
+                with mock.patch('progression.numpy', backend):
+                    results.append(simulate_sessions(bet, strategy, sessions=200, max_spins=150, seed=3, **options))
+            self.assertEqual(results[1:], results[:1] * (len(results) - 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import unittest
+import instrumentation
+import result_cache
+from result_cache import ResultCache, fingerprint
+from roulette import handle_request, process_request
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestFingerprint(unittest.TestCase):
+
+    def setUp(self):
+        self.request = {'hash': 'A' * 64, 'wheel': 'European', 'table': {'split': {'max': 10}},
+                        'bets': [{'type': 'straightUp', 'wager': 2, 'location': 25},
+                                 {'type': 'split', 'wager': 3, 'location': [20, 17]},
+                                 {'type': 'outside', 'wager': 1, 'location': 'red'},
+                                 {'type': 'sector', 'wager': 4, 'location': 'Jeu Zero'}]}
+
+    def test_equivalent_spellings(self):
+        respelled = {'bets': [{'location': [25], 'wager': 2, 'type': 'straightUp'},
+                              {'location': ['17', '20'], 'type': 'split', 'wager': 3},
+                              {'type': 'outside', 'wager': 1, 'location': 'Red'},
+                              {'type': 'sector', 'wager': 4, 'location': 'jeu zero'}],
+                     'table': {'split': {'min': 1, 'max': 10}, 'straightUp': {}}, 'hash': 'a' * 64}
+        self.assertEqual(fingerprint(respelled), fingerprint(self.request))
+        self.assertEqual(fingerprint(dict(self.request, bets=[dict(self.request['bets'][0], location='25')]
+                                          + self.request['bets'][1:])), fingerprint(self.request))
+        self.assertNotEqual(fingerprint(dict(self.request, foo=1)), fingerprint(self.request))
+
+    def test_different_requests(self):
+        base = fingerprint(self.request)
+        for change in ({'hash': 'b' * 64}, {'wheel': 'American'}, {'netting': True}, {'table': {}},
+                       {'bets': self.request['bets'][::-1]},
+                       {'bets': [dict(self.request['bets'][0], wager=3)] + self.request['bets'][1:]},
+                       {'bets': [dict(self.request['bets'][0], location='07')] + self.request['bets'][1:]}):
+            self.assertNotEqual(fingerprint(dict(self.request, **change)), base, change)
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_lru_and_ttl(self):
+        clock = Clock()
+        cache = ResultCache(max_size=2, ttl=10, clock=clock)
+        cache.put('a', {'n': 1})
+        cache.put('b', {'n': 2})
+        self.assertEqual(cache.get('a'), {'n': 1})
+        cache.put('c', {'n': 3})
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), {'n': 1})
+        clock.now += 10
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.get_json_dict(), {'diskHits': 0, 'evicted': 1, 'expired': 1, 'hits': 2,
+                                                 'misses': 2, 'size': 1})
+
+    def test_copies(self):
+        cache = ResultCache()
+        cache.put('a', {'n': 1})
+        annotated = cache.get('a')
+        annotated['timing'] = {}
+        self.assertEqual(cache.get('a'), {'n': 1})
+        self.assertEqual(json.loads(annotated.to_json()), {'n': 1, 'timing': {}})
+        self.assertIs(cache.get('a').to_json(), cache.get('a').to_json())
+        result = {'bets': [{'wager': 1}]}
+        cache.put('b', result)
+        result['bets'][0]['wager'] = 2
+        changed = cache.get('b')
+        changed['bets'][0]['wager'] = 999
+        self.assertEqual(json.loads(changed.to_json()), {'bets': [{'wager': 999}]})
+        self.assertEqual(cache.get('b'), {'bets': [{'wager': 1}]})
+        self.assertEqual(json.loads(cache.get('b').to_json()), {'bets': [{'wager': 1}]})
+
+    def test_disk_store(self):
+        clock = Clock()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite')
+            first = ResultCache(ttl=10, path=path, clock=clock)
+            first.put('a', {'n': 1})
+            second = ResultCache(ttl=10, path=path, clock=clock)
+            self.assertEqual(second.get('a'), {'n': 1})
+            self.assertEqual(second.disk_hits, 1)
+            clock.now += 10
+            self.assertIsNone(ResultCache(ttl=10, path=path, clock=clock).get('a'))
+            # Opening the last cache trimmed the expired result from the shared store
+            self.assertEqual((len(first.store), first.store.purge(clock.now - 10)), (0, 0))
+            first.store.close()
+            second.store.close()
+
+    def test_disk_store_trimmed(self):
+        clock = Clock()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite')
+            cache = ResultCache(max_size=3, ttl=10, path=path, clock=clock)
+            cache.trim_every = 2
+            for n in range(6):
+                clock.now += 1
+                cache.put(str(n), {'n': n})
+            self.assertEqual(len(cache.store), 3)
+            clock.now += 8
+            cache.store.close()
+            reopened = ResultCache(max_size=3, ttl=10, path=path, clock=clock)
+            self.assertEqual(len(reopened.store), 2)
+            self.assertEqual(reopened.get('4'), {'n': 4})
+            reopened.store.close()
+
+
+class TestCachedRequests(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.request['hash'] = 'c' * 64
+        self.addCleanup(result_cache.configure)
+        self.addCleanup(instrumentation.configure)
+
+    def fresh(self):
+        return json.loads(json.dumps(self.request))
+
+    def test_hits_match_spins(self):
+        expected = process_request(self.fresh())
+        cache = result_cache.configure(max_size=10)
+        self.assertEqual(process_request(self.fresh()), expected)
+        self.assertEqual(process_request(self.fresh()), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        limits = dict(self.request, table=dict(self.request['table'], totalInside={'min': 1000}))
+        error = handle_request(json.loads(json.dumps(limits)))
+        self.assertEqual(handle_request(json.loads(json.dumps(limits))), error)
+        self.assertIn('InsideBetsTooSmall', error['exception']['type'])
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (1, 3, 1))
+
+    def test_equivalent_requests_share_result(self):
+        cache = result_cache.configure(max_size=10)
+        first = dict(self.fresh(), bets=[{'type': 'straightUp', 'wager': 2, 'location': '25'},
+                                         {'type': 'split', 'wager': 3, 'location': [20, 17]},
+                                         {'type': 'outside', 'wager': 5, 'location': 'red'}])
+        second = dict(self.fresh(), bets=[{'type': 'straightUp', 'wager': 2, 'location': 25},
+                                          {'type': 'split', 'wager': 3, 'location': [17, 20]},
+                                          {'type': 'outside', 'wager': 5, 'location': 'red'}])
+        result = handle_request(json.loads(json.dumps(first)))
+        # The second spelling is answered with the first one's result, locations and all
+        self.assertEqual(handle_request(json.loads(json.dumps(second))), result)
+        self.assertEqual([bet['location'] for bet in result['bets']], ['25', [20, 17], 'red'])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        result_cache.configure()
+        uncached = handle_request(second)
+        self.assertEqual([bet['location'] for bet in uncached['bets']], [25, [17, 20], 'red'])
+        self.assertEqual(dict(uncached, bets=None), dict(result, bets=None))
+
+    def test_shared_by_threads(self):
+        cache = result_cache.configure(max_size=3)
+        requests = [dict(self.fresh(), hash=format(n, '064x')) for n in range(6)]
+
+        def worker():
+            for request in requests * 20:
+                handle_request(json.loads(json.dumps(request)))
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.hits + cache.misses, 4 * 6 * 20)
+        self.assertEqual(len(cache), 3)
+        self.assertLessEqual(cache.evicted, cache.misses - 3)
+
+    def test_cold_start_without_sqlite(self):
+        probe = ("import sys, lambda_function\n"
+                 "assert 'sqlite3' not in sys.modules\n")
+        subprocess.run([sys.executable, '-c', probe], check=True)
+
+    def test_errors_not_cached(self):
+        cache = result_cache.configure(max_size=10)
+        self.assertIn('TypeError', handle_request(dict(self.fresh(), foo=1))['exception']['type'])
+        self.assertNotIn('exception', handle_request(self.fresh()))
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 2, 1))
+
+    def test_bypassed_without_hash(self):
+        cache = result_cache.configure(max_size=10)
+        request = self.fresh()
+        del request['hash']
+        first, second = handle_request(json.loads(json.dumps(request))), handle_request(request)
+        self.assertNotIn('exception', first)
+        self.assertNotIn('exception', second)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+        self.assertIn('ValidationError', handle_request({'hash': 'x'})['exception']['type'])
+        self.assertEqual(len(cache), 0)
+
+    def test_hit_timing(self):
+        result_cache.configure(max_size=10)
+        instrumentation.configure(respond=True)
+        handle_request(self.fresh())
+        timing = handle_request(self.fresh())['timing']
+        self.assertEqual(list(timing['phases']), ['validate', 'cache'])
+        self.assertEqual(timing['counters'], {'cacheHits': 1})
+        cache = result_cache.current
+        self.assertNotIn('timing', cache.get(cache.key(self.request)))
+
+    def test_configure_from_environment(self):
+        self.assertIsNone(result_cache.configure_from_environment({}))
+        cache = result_cache.configure_from_environment({'ROULETTE_CACHE_SIZE': '5', 'ROULETTE_CACHE_TTL': '2'})
+        self.assertEqual((cache.max_size, cache.ttl, cache.store), (5, 2.0, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
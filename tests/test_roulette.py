@@ -0,0 +1,166 @@
+import copy
+import json
+import unittest
+from enum import Enum
+from wheel import Wheel
+from table import get_layout
+from roulette import RouletteEngine, handle_batch, handle_round, process_batch, process_request
+from lambda_function import lambda_handler
+
+
+def hash_for(number):
+    return format(number, '013x') + '0' * 51
+
+
+class TestSettlement(unittest.TestCase):
+
+    def test_masks_match_pockets(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            layout = get_layout(wheel)
+            for outcome in layout.outcomes.values():
+                for number, pocket in enumerate(layout.pockets):
+                    self.assertEqual(bool(outcome.mask >> number & 1), outcome in pocket, (wheel, outcome, number))
+
+    def test_spin_matches_pocket_membership(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            layout = get_layout(wheel)
+            for number, pocket in enumerate(layout.pockets):
+                engine = RouletteEngine(hash=hash_for(number), wheel=wheel)
+                for outcome in layout.outcome_list:
+                    engine.table.book.append('straightUp', outcome.name, 2, outcome)
+                engine.spin()
+                self.assertEqual(engine.table.winning_number, number)
+                for bet in engine.table.bets:
+                    self.assertEqual(bet.win, bet.outcome in pocket)
+                    self.assertEqual(bet.payout, bet.outcome.odds * 2 if bet.win else 0)
+                winners = [bet for bet in engine.table.bets if bet.win]
+                self.assertEqual(engine.wager['placed'], 2 * len(engine.table.bets))
+                self.assertEqual(engine.wager['onTable'], 2 * len(winners))
+                self.assertEqual(engine.wager['payout'], sum(bet.payout for bet in winners))
+                self.assertEqual(engine.wager['lost'], 2 * (len(engine.table.bets) - len(winners)))
+
+
+def legacy_json(engine):
+    # The generic encoder the explicit serializer replaced
+    def default(o):
+        if isinstance(o, Enum):
+            return o.value
+        if o is engine:
+            return {'hash': o.hash, 'success': o.success, 'wager': o.wager, 'bets': o.table.bets,
+                    'table': o.table.limits, 'winner': o.table.winner, 'wheel': o.table.wheel,
+                    'winningBets': [bet for bet in o.table.bets if bet.win]}
+        if hasattr(o, 'mask'):
+            return {'name': o.name, 'odds': o.odds}
+        if hasattr(o, '__slots__'):
+            return {slot: getattr(o, slot) for slot in o.__slots__}
+        return o.__dict__
+    return json.dumps(engine, default=default, sort_keys=True)
+
+
+class TestSerialization(unittest.TestCase):
+
+    def test_matches_legacy_encoder(self):
+        with open('testRequest.json') as f:
+            request = json.load(f)
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            bets = [bet for bet in request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+            for number in range(len(get_layout(wheel).pockets)):
+                engine = RouletteEngine(hash=hash_for(number), wheel=wheel, table=request['table'],
+                                        bets=copy.deepcopy(bets))
+                engine.spin()
+                self.assertEqual(engine.to_json(), legacy_json(engine))
+                self.assertEqual(engine.to_json(), json.dumps(engine.get_json_dict(), sort_keys=True))
+
+    def test_netting_response(self):
+        with open('testRequest.json') as f:
+            request = json.load(f)
+        request['hash'] = hash_for(26)
+        plain = json.loads(process_request(copy.deepcopy(request)))
+        netted = json.loads(process_request(dict(copy.deepcopy(request), netting=True)))
+        self.assertEqual(netted['wager'], plain['wager'])
+        self.assertEqual(list(netted), sorted(netted))
+        self.assertEqual(len(netted['bets']), len(request['bets']))
+        self.assertLess(len(netted['positions']), len(plain['bets']))
+        self.assertAlmostEqual(sum(position['wager'] for position in netted['positions']), plain['wager']['placed'])
+        self.assertNotIn('positions', plain)
+        invalid = json.loads(process_request(dict(copy.deepcopy(request), netting='yes')))
+        self.assertIn('ValidationError', invalid['exception']['type'])
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.request['hash'] = hash_for(25)
+        self.invalid = {'hash': 'not a hash'}
+        self.unavailable = {'wheel': 'American', 'bets': [{'type': 'sector', 'wager': 6, 'location': 'tiers'}]}
+
+    def test_batch_matches_single_requests(self):
+        rounds = [self.request, self.invalid, self.unavailable, copy.deepcopy(self.request)]
+        expected = [json.loads(process_request(copy.deepcopy(request))) for request in rounds]
+        self.assertEqual(handle_batch(copy.deepcopy(rounds)), expected)
+        self.assertEqual(handle_batch({'rounds': copy.deepcopy(rounds)}), expected)
+        self.assertEqual(json.loads(process_batch(copy.deepcopy(rounds))), expected)
+
+    def test_batch_isolates_errors(self):
+        results = handle_batch([self.invalid, self.unavailable, copy.deepcopy(self.request)])
+        self.assertEqual([result['success'] for result in results], [False, False, True])
+        self.assertIn('ValidationError', results[0]['exception']['type'])
+        self.assertIn('BetNotAvailable', results[1]['exception']['type'])
+
+    def test_lambda_handler(self):
+        expected = json.loads(process_request(copy.deepcopy(self.request)))
+        self.assertEqual(lambda_handler(copy.deepcopy(self.request), None), expected)
+        self.assertEqual(lambda_handler({'rounds': [copy.deepcopy(self.request)]}, None), [expected])
+        self.assertEqual(lambda_handler([], None), [])
+        for rounds in (5, None, {'hash': self.request['hash']}):
+            result = lambda_handler({'rounds': rounds}, None)
+            self.assertFalse(result['success'])
+            self.assertIn('TypeError', result['exception']['type'])
+
+
+class TestRound(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.players = {
+            'alice': self.request['bets'],
+            'bob':   [{'type': 'straightUp', 'wager': 5, 'location': 17}],
+            'carol': [{'type': 'straightUp', 'wager': 500, 'location': 17}],
+            'dave':  [{'type': 'split', 'wager': 1, 'location': 'oops'}],
+            'erin':  [{'type': 'straightUp', 'wager': 1, 'location': 17}],
+        }
+
+    def test_players_match_single_engines(self):
+        for number in (0, 17, 25):
+            round_request = {'hash': hash_for(number), 'wheel': 'European', 'table': self.request['table'],
+                             'players': copy.deepcopy(self.players)}
+            result = handle_round(round_request)
+            self.assertTrue(result['success'])
+            self.assertEqual(list(result['players']), list(self.players))
+            for player, bets in self.players.items():
+                single = json.loads(process_request({'hash': hash_for(number), 'wheel': 'European',
+                                                     'table': self.request['table'], 'bets': copy.deepcopy(bets)}))
+                if single['success']:
+                    for key in ('hash', 'table', 'wheel', 'winner'):
+                        self.assertEqual(result[key], single.pop(key))
+                self.assertEqual(result['players'][player], single, player)
+
+    def test_isolated_player_errors(self):
+        result = handle_round({'hash': hash_for(17), 'table': self.request['table'],
+                               'players': copy.deepcopy(self.players)})
+        self.assertIn('BetTooLargeException', result['players']['carol']['exception']['type'])
+        self.assertIn('ValidationError', result['players']['dave']['exception']['type'])
+        self.assertIn('InsideBetsTooSmall', result['players']['erin']['exception']['type'])
+        self.assertEqual(result['players']['bob']['wager']['payout'], 175)
+
+    def test_round_errors(self):
+        self.assertFalse(handle_round({'players': []})['success'])
+        self.assertIn('ValidationError', handle_round({'hash': 'x', 'players': {}})['exception']['type'])
+        self.assertEqual(lambda_handler({'hash': hash_for(3), 'players': {}}, None)['players'], {})
+
+
+if __name__ == '__main__':
+    unittest.main()
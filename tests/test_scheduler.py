@@ -0,0 +1,101 @@
+import asyncio
+import copy
+import json
+import unittest
+import jsonschema
+from roulette import RouletteRound
+from scheduler import RoundScheduler, SimulatedClock, demo
+from wheel import Wheel
+
+
+def hash_for(number):
+    return format(number, '013x') + '0' * 51
+
+
+class TestRoundScheduler(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+        self.bets = [bet for bet in self.request['bets'] if bet['type'] != 'sector']
+
+    def scheduler(self, **kwargs):
+        clock = SimulatedClock()
+        return RoundScheduler(betting_seconds=10, clock=clock, sleep=clock.sleep, **kwargs), clock
+
+    def test_windows_and_bulk_settlement(self):
+        async def test():
+            scheduler, clock = self.scheduler()
+            scheduler.open_table('a', Wheel.EUROPEAN, self.request['table'], hashes=[hash_for(17), hash_for(3)])
+            scheduler.open_table('b', Wheel.AMERICAN, self.request['table'], hashes=[hash_for(37)])
+            scheduler.open_table('c', betting_seconds=4, hashes=[hash_for(1)] * 3)
+            first = scheduler.place('a', 'alice', copy.deepcopy(self.bets))
+            scheduler.place('a', 'bob', [{'type': 'straightUp', 'wager': 500, 'location': 17}])
+            american = scheduler.place('b', 'carol', [{'type': 'split', 'wager': 5, 'location': ['00', 3]}])
+            self.assertEqual(await scheduler.tick(), 0)
+            clock.now = 9.5
+            self.assertEqual(await scheduler.tick(), 2)
+            self.assertFalse(first.done())
+            self.assertIs(scheduler.place('a', 'alice', [{'type': 'outside', 'wager': 5, 'location': 'red'}]), first)
+            clock.now = 10
+            self.assertEqual(await scheduler.tick(), 2)
+            self.assertTrue(american.done())
+            second = scheduler.place('a', 'alice', [{'type': 'outside', 'wager': 5, 'location': 'red'}])
+            scheduler.close_table('a')
+            return scheduler, await first, await american, second
+
+        scheduler, first, american, second = asyncio.run(test())
+        expected = RouletteRound(hash=hash_for(17), table=self.request['table'],
+                                 players={'alice': copy.deepcopy(self.bets)
+                                          + [{'type': 'outside', 'wager': 5, 'location': 'red'}],
+                                          'bob': [{'type': 'straightUp', 'wager': 500, 'location': 17}]})
+        expected.spin()
+        self.assertEqual(first, expected.get_json_dict())
+        self.assertIn('BetTooLargeException', first['players']['bob']['exception']['type'])
+        self.assertEqual((american['wheel'], american['players']['carol']['wager']['payout']), ('American', 85))
+        self.assertTrue(second.cancelled())
+        self.assertEqual(scheduler.counts, {'bets': len(self.bets) + 4, 'rounds': 4, 'settlements': 2,
+                                            'tablesClosed': 1, 'tablesOpened': 3})
+
+    def test_hashes_run_out(self):
+        async def test():
+            scheduler, clock = self.scheduler()
+            scheduler.open_table('a', hashes=[hash_for(n) for n in range(5)])
+            results = []
+            while 'a' in scheduler.tables:
+                results.append(scheduler.place('a', 'alice', [{'type': 'straightUp', 'wager': 1, 'location': 4}]))
+                await scheduler.run(until=clock() + 10)
+            return scheduler, clock, [await result for result in results[:-1]], results[-1]
+
+        scheduler, clock, results, last = asyncio.run(test())
+        self.assertEqual([result['winner']['location'] for result in results], [0, 1, 2, 3, 4])
+        self.assertEqual([result['players']['alice']['wager']['payout'] for result in results], [0, 0, 0, 0, 35])
+        self.assertTrue(last.cancelled())
+        self.assertEqual(clock(), 60)
+        metrics = scheduler.get_metrics()
+        self.assertEqual(metrics['throughput']['roundsPerSecond'], 5 / 60)
+        self.assertEqual(metrics['lag']['close']['count'], 5)
+
+    def test_rejects_invalid_requests(self):
+        async def test():
+            scheduler, _ = self.scheduler()
+            scheduler.open_table('a')
+            with self.assertRaises(ValueError):
+                scheduler.open_table('a')
+            with self.assertRaises(jsonschema.ValidationError):
+                scheduler.open_table('b', limits={'split': {'min': 0}})
+            with self.assertRaises(jsonschema.ValidationError):
+                scheduler.place('a', 'alice', [{'type': 'straightUp', 'wager': 1, 'location': 99}])
+            self.assertEqual(scheduler.tables['a'].get_json_dict()['bets'], 0)
+
+        asyncio.run(test())
+
+    def test_demo_in_workers(self):
+        metrics = asyncio.run(demo(tables=6, rounds=3, bets=5, betting_seconds=1, workers=1, simulated=True))
+        self.assertEqual(metrics['counts']['rounds'], 18)
+        self.assertEqual(metrics['counts']['settlements'], 3)
+        self.assertEqual(metrics['openTables'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
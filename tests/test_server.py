@@ -0,0 +1,85 @@
+import asyncio
+import json
+import unittest
+from roulette import process_request
+from server import RouletteServer
+from load_client import encode_request, read_response, run
+
+
+class TestServer(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+
+    def serve(self, test, **kwargs):
+        async def main():
+            server = RouletteServer(workers=1, **kwargs)
+            await server.start('127.0.0.1', 0)
+            try:
+                reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+                try:
+                    return await test(server, reader, writer)
+                finally:
+                    writer.close()
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def spin(self, hash):
+        return json.dumps(dict(self.request, hash=hash)).encode()
+
+    def test_pipelined_requests_answer_in_order(self):
+        hashes = [str(digit) * 64 for digit in range(1, 6)]
+
+        async def test(server, reader, writer):
+            writer.write(b''.join(encode_request('localhost', '/', self.spin(hash)) for hash in hashes))
+            writer.write(encode_request('localhost', '/', json.dumps([dict(self.request, hash=hashes[0])]).encode()))
+            writer.write(encode_request('localhost', '/', b'not json'))
+            writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            return [await read_response(reader) for _ in range(len(hashes) + 3)]
+
+        responses = self.serve(test)
+        for hash, (status, body) in zip(hashes, responses):
+            self.assertEqual(status, 200)
+            self.assertEqual(body.decode(), process_request(dict(json.loads(json.dumps(self.request)), hash=hash)))
+        status, body = responses[len(hashes)]
+        self.assertEqual(json.loads(body)[0]['hash'], hashes[0])
+        self.assertEqual(responses[len(hashes) + 1][0], 400)
+        metrics = json.loads(responses[-1][1])
+        self.assertEqual(metrics['counts']['requests'], len(hashes) + 3)
+
+    def test_backpressure_and_errors(self):
+        async def test(server, reader, writer):
+            writer.write(encode_request('localhost', '/', self.spin('a' * 64)))
+            writer.write(b'GET /health HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            writer.write(b'GET /missing HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            writer.write(b'GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n')
+            responses = [await read_response(reader) for _ in range(4)]
+            responses.append(await reader.read())
+            return responses
+
+        responses = self.serve(test, max_pending=0)
+        self.assertEqual([status for status, _ in responses[:4]], [503, 200, 404, 405])
+        self.assertEqual(json.loads(responses[1][1])['status'], 'ok')
+        self.assertEqual(responses[4], b'')
+
+    def test_rejects_bad_content_length(self):
+        for length in (b'-5', b'+5', b'5_0', b'x'):
+            async def test(server, reader, writer):
+                writer.write(b'POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: ' + length + b'\r\n\r\n')
+                response = await read_response(reader)
+                return response, await reader.read()
+
+            (status, body), rest = self.serve(test)
+            self.assertEqual((status, json.loads(body)['exception']['message'], rest),
+                             (400, 'Malformed Content-Length', b''), length)
+
+    def test_load_client(self):
+        async def test(server, reader, writer):
+            return await run('http://127.0.0.1:{0}/'.format(server.port), [self.spin('b' * 64)] * 40,
+                             connections=4, pipeline=3)
+
+        report = self.serve(test)
+        self.assertEqual(report['requests'], 40)
+        self.assertEqual(report['statuses'], {'200': 40})
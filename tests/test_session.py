@@ -0,0 +1,81 @@
+import copy
+import json
+import random
+import unittest
+from wheel import Wheel
+from table import BetTooLargeException, InsideBetsTooLarge, InsideBetsTooSmall
+from roulette import RouletteEngine
+from session import TableSession
+
+
+class TestTableSession(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+
+    def test_matches_engine(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            bets = [bet for bet in self.request['bets'] if wheel == Wheel.EUROPEAN or bet['type'] != 'sector']
+            session = TableSession(wheel, self.request['table'])
+            for bet in copy.deepcopy(bets):
+                session.add(**bet)
+            for digit in '0123456789abcdef':
+                engine = RouletteEngine(hash=digit * 64, wheel=wheel, table=self.request['table'],
+                                        bets=copy.deepcopy(bets))
+                engine.spin()
+                self.assertEqual(session.spin(digit * 64), engine.wager)
+                self.assertEqual(session.get_exposure().net, engine.get_exposure().net)
+                result = session.get_json_dict()
+                expected = engine.get_json_dict()
+                self.assertEqual(result['winner'], expected['winner'])
+                self.assertEqual(len(result['bets']), len(expected['bets']))
+                self.assertEqual(sorted(bet['outcome']['name'] for bet in result['winningBets']),
+                                 sorted(bet['outcome']['name'] for bet in expected['winningBets']))
+
+    def test_remove_and_replace(self):
+        rng = random.Random(3)
+        session = TableSession(Wheel.EUROPEAN, self.request['table'])
+        placed = {}
+        for bet in copy.deepcopy(self.request['bets']) * 3:
+            placed[session.add(**bet)] = bet
+        for bet_id in rng.sample(sorted(placed), 60):
+            if rng.random() < 0.5:
+                session.remove(bet_id)
+                del placed[bet_id]
+            else:
+                placed[bet_id] = {'type': 'straightUp', 'location': [rng.randint(0, 36)], 'wager': rng.randint(1, 5)}
+                session.replace(bet_id, **placed[bet_id])
+        fresh = TableSession(Wheel.EUROPEAN, self.request['table'])
+        for bet_id in sorted(placed):
+            fresh.add(**placed[bet_id])
+        for name in ['placed', 'inside', 'outside', 'payouts', 'on_table']:
+            self.assertEqual(getattr(session, name), getattr(fresh, name), name)
+        self.assertEqual(session.spin('c' * 64), fresh.spin('c' * 64))
+
+        for bet_id in list(session.bets):
+            session.remove(bet_id)
+        self.assertEqual((session.placed, session.payouts, session.stakes), (0, [0] * 37, {}))
+
+    def test_limits_reject_chips_immediately(self):
+        session = TableSession(Wheel.EUROPEAN, {'straightUp': {'max': 10}, 'totalInside': {'min': 5, 'max': 20}})
+        chip = session.add('straightUp', [17], 10)
+        with self.assertRaises(BetTooLargeException):
+            session.add('straightUp', [18], 11)
+        session.add('split', [17, 20], 8)
+        with self.assertRaises(InsideBetsTooLarge):
+            session.add('straightUp', [19], 3)
+        with self.assertRaises(InsideBetsTooLarge):
+            session.replace(chip, 'corner', [17, 21], 13)
+        self.assertEqual(session.inside, 18)
+        session.replace(chip, 'corner', [17, 21], 12)
+        self.assertEqual((len(session), session.inside, session.outside), (2, 20, 0))
+        session.add('outside', 'red', 100)
+        self.assertEqual((session.placed, session.outside), (120, 100))
+
+        session.reset()
+        session.add('straightUp', [17], 1)
+        with self.assertRaises(InsideBetsTooSmall):
+            session.spin('a' * 64)
+        session.add('straightUp', [18], 4)
+        self.assertEqual(session.spin('a' * 64)['placed'], 5)
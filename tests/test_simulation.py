@@ -0,0 +1,58 @@
+import copy
+import hashlib
+import json
+import random
+import unittest
+from collections import Counter
+from unittest import mock
+import simulation
+from wheel import Wheel
+from table import Table
+from simulation import chunk_seed, count_pockets, simulate
+
+
+class TestSimulation(unittest.TestCase):
+
+    def setUp(self):
+        with open('testRequest.json') as f:
+            self.request = json.load(f)
+
+    def test_reproducible_across_workers(self):
+        single = simulate(copy.deepcopy(self.request), 20000, seed=5, workers=1, chunk_size=3000)
+        pooled = simulate(copy.deepcopy(self.request), 20000, seed=5, workers=2, chunk_size=3000)
+        self.assertEqual(single, pooled)
+        other = simulate(copy.deepcopy(self.request), 20000, seed=6, workers=1, chunk_size=3000)
+        self.assertNotEqual(single['pockets'], other['pockets'])
+
+    def test_statistics(self):
+        result = simulate(copy.deepcopy(self.request), 200000, seed=1, workers=1)
+        self.assertEqual(sum(result['pockets'].values()), 200000)
+        self.assertEqual(sum(count for delta, count in result['delta']['distribution']), 200000)
+        low, high = result['delta']['confidence95']
+        margin = (high - low) / 2
+        self.assertLess(abs(result['delta']['mean'] - result['delta']['expected']), 3 * margin)
+        column = result['hitRates']['Column 2']
+        self.assertAlmostEqual(column['expected'], 12 / 37)
+        self.assertEqual(column['hits'], sum(result['pockets'][str(n)] for n in range(2, 37, 3)))
+
+    def test_hash_source_matches_choose(self):
+        table = Table(wheel=Wheel.AMERICAN)
+        expected = [0] * 38
+        digest = chunk_seed(3, 0)
+        for _ in range(500):
+            digest = hashlib.sha256(digest).digest()
+            table.choose(digest.hex())
+            expected[table.winning_number] += 1
+        self.assertEqual(count_pockets(38, 500, 3, 0, source='hash'), expected)
+
+    def test_prng_backends_agree(self):
+        for spins in (0, 1, 5000):
+            counts = Counter(random.Random(chunk_seed(7, 2)).choices(range(37), k=spins))
+            expected = [counts[number] for number in range(37)]
+            for backend in [None] + ([simulation.numpy] if simulation.numpy is not None else []):
+                with mock.patch('simulation.numpy', backend):
+                    self.assertEqual(count_pockets(37, spins, 7, 2), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
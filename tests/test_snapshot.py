@@ -0,0 +1,50 @@
+import json
+import os
+import pickle
+import tempfile
+import unittest
+import snapshot
+import table
+from wheel import Wheel
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'roulette.snapshot')
+
+    def tearDown(self):
+        table.layout_snapshots.clear()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        snapshot.build(self.path)
+        schema = snapshot.load(self.path)
+        with open(snapshot.SCHEMA_PATH) as f:
+            self.assertEqual(schema, json.load(f))
+        for wheel in Wheel:
+            layout = pickle.loads(table.layout_snapshots[wheel])
+            built = table.Layout(wheel)
+            self.assertEqual(layout.pockets, built.pockets)
+            self.assertEqual(dict(layout.outcomes), dict(built.outcomes))
+            self.assertEqual({k: v.mask for k, v in layout.outcomes.items()},
+                             {k: v.mask for k, v in built.outcomes.items()})
+            self.assertEqual({k: dict(v) for k, v in layout.locations.items()},
+                             {k: dict(v) for k, v in built.locations.items()})
+            with self.assertRaises(TypeError):
+                layout.outcomes['new'] = layout.outcomes['0']
+
+    def test_missing_or_stale(self):
+        self.assertIsNone(snapshot.load(self.path))
+        self.assertIsNone(snapshot.load(''))
+        with open(self.path, 'wb') as f:
+            pickle.dump({'fingerprint': 'stale', 'schema': {}, 'layouts': {}}, f)
+        self.assertIsNone(snapshot.load(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertIsNone(snapshot.load(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
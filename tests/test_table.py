@@ -0,0 +1,183 @@
+import random
+import unittest
+from itertools import combinations
+from wheel import Wheel
+from table import (SECTORS, Bet, BetTooLargeException, InsideBetsTooSmall, Layout, Table, UnableToDetermineBet,
+                   get_layout)
+
+
+class TestLayout(unittest.TestCase):
+
+    def test_layout_shared(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            first = Table(wheel=wheel)
+            second = Table(wheel=wheel)
+            self.assertIs(first.layout, second.layout)
+            self.assertIs(first.pockets, second.pockets)
+            self.assertIs(first.outcomes, get_layout(wheel).outcomes)
+
+    def test_pocket_count(self):
+        self.assertEqual(len(get_layout(Wheel.AMERICAN).pockets), 38)
+        self.assertEqual(len(get_layout(Wheel.EUROPEAN).pockets), 37)
+
+    def test_outcome_pockets(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            layout = get_layout(wheel)
+            for name, numbers in layout.outcome_pockets.items():
+                outcome = layout.outcomes[name]
+                for number, pocket in enumerate(layout.pockets):
+                    self.assertEqual(number in numbers, outcome in pocket)
+        self.assertEqual(get_layout(Wheel.EUROPEAN).outcome_pockets['Zero-Line'], {0, 1, 2, 3})
+        self.assertEqual(get_layout(Wheel.AMERICAN).outcome_pockets['Zero-Line'], {0, 1, 2, 3, 37})
+
+    def test_layout_immutable(self):
+        layout = get_layout(Wheel.EUROPEAN)
+        with self.assertRaises(TypeError):
+            layout.add_outcome(0, layout.outcomes['0'])
+        with self.assertRaises(TypeError):
+            layout.outcomes['new'] = layout.outcomes['0']
+
+
+class TestOutcomeLookup(unittest.TestCase):
+
+    def scan(self, layout, type, numbers):
+        search_key = Layout.search_keys[type]
+        found = [layout.outcomes[name] for name, covered in layout.outcome_pockets.items()
+                 if search_key in name and numbers <= covered]
+        return found[0] if len(found) == 1 else None
+
+    def test_index_matches_scan(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            layout = get_layout(wheel)
+            numbers = range(len(layout.pockets))
+            for type in Layout.search_keys:
+                for size in range(1, 4):
+                    for location in combinations(numbers, size):
+                        self.assertEqual(layout.find_outcome(type, list(location)),
+                                         self.scan(layout, type, frozenset(location)), (wheel, type, location))
+
+    def test_location_aliases(self):
+        american = Table(wheel=Wheel.AMERICAN)
+        for location in (['00', 3], [37, 3], ['3', '00'], ['37', 3]):
+            self.assertEqual(american.get_outcome_by_type_location('split', location).name, 'Split 00-3')
+        european = Table(wheel=Wheel.EUROPEAN)
+        self.assertEqual(european.get_outcome_by_type_location('corner', ['10', 14]).name, 'Corner 10-11-13-14')
+        self.assertEqual(european.get_outcome_by_type_location('dozen', [13]).name, 'Dozen 2')
+
+    def test_lookup_errors(self):
+        table = Table(wheel=Wheel.EUROPEAN)
+        with self.assertRaises(UnableToDetermineBet):
+            table.get_outcome_by_type_location('corner', [1, 9])
+        with self.assertRaises(UnableToDetermineBet):
+            table.get_outcome_by_type_location('line', [1])
+        with self.assertRaisesRegex(Exception, 'Location Not Found'):
+            table.get_outcome_by_type_location('split', ['00', 3])
+        with self.assertRaisesRegex(Exception, 'Location Not Found'):
+            table.get_outcome_by_type_location('split', [1, 1])
+
+
+class TestBetBook(unittest.TestCase):
+
+    def random_bets(self, rng, count):
+        choices = [
+            ('straightUp', lambda: rng.randint(0, 36)), ('split', lambda: [17, 20]), ('street', lambda: [4]),
+            ('corner', lambda: [26, 30]), ('column', lambda: [rng.randint(1, 36)]),
+            ('dozen', lambda: [rng.randint(1, 36)]), ('outside', lambda: rng.choice(['red', 'odd', 'high'])),
+            ('neighbors2', lambda: [rng.choice([0, 11, 25])]), ('sector', lambda: 'jeu zero'),
+        ]
+        bets = []
+        for _ in range(count):
+            type, location = rng.choice(choices)
+            wager = rng.randint(1, 5) * (5 if type == 'neighbors2' else 4 if type == 'sector' else 1)
+            bets.append({'type': type, 'wager': wager, 'location': location()})
+        return bets
+
+    def test_settle_matches_bets(self):
+        rng = random.Random(7)
+        for _ in range(20):
+            table = Table(wheel=Wheel.EUROPEAN, bets=self.random_bets(rng, 50))
+            number = rng.randint(0, 36)
+            summary = table.book.settle(number)
+            bets = table.bets
+            self.assertEqual(len(bets), len(table.book))
+            winners = [bet for bet in bets if bet.win]
+            self.assertTrue(all(bet.outcome in table.pockets[number] for bet in winners))
+            for key, expected in (('payout', sum(bet.payout for bet in bets)),
+                                  ('onTable', sum(bet.wager for bet in winners)),
+                                  ('placed', sum(bet.wager for bet in bets)),
+                                  ('lost', sum(bet.wager for bet in bets if not bet.win))):
+                self.assertEqual(summary[key], expected)
+                self.assertIs(type(summary[key]), type(expected), key)
+
+    def test_views_keep_wager_types(self):
+        table = Table(wheel=Wheel.EUROPEAN, bets=[{'type': 'straightUp', 'wager': 2, 'location': 3},
+                                                  {'type': 'neighbors1', 'wager': 3, 'location': [0]}])
+        self.assertEqual([type(bet.wager) for bet in table.bets], [int, float, float, float])
+        self.assertEqual([bet.outcome.name for bet in table.bets], ['3', '26', '0', '32'])
+        self.assertEqual(table.book.inside, 5)
+
+    def test_limits(self):
+        with self.assertRaises(BetTooLargeException) as context:
+            Table(wheel=Wheel.EUROPEAN, limits={'split': {'max': 2}},
+                  bets=[{'type': 'split', 'wager': 3, 'location': [1, 2]}])
+        self.assertEqual(repr(context.exception.bet), 'Bet(type=split,location=[1, 2],wager=3)')
+        with self.assertRaises(InsideBetsTooSmall):
+            Table(wheel=Wheel.EUROPEAN, limits={'totalInside': {'min': 5}},
+                  bets=[{'type': 'split', 'wager': 3, 'location': [1, 2]}])
+
+
+class TestAnnouncedBets(unittest.TestCase):
+
+    def assertSameBets(self, bets, expected):
+        self.assertEqual([(bet.type, bet.location, bet.wager, type(bet.wager), bet.outcome) for bet in bets],
+                         [(bet.type, bet.location, bet.wager, type(bet.wager), bet.outcome) for bet in expected])
+
+    def test_neighbors_templates_match_bets(self):
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            table = Table(wheel=wheel)
+            track = wheel.get_track()
+            for count in range(1, 10):
+                for index, number in enumerate(track[count:len(track) - count], count):
+                    wager = 2 * count + 1
+                    expected = [Bet(table=table, type='straightUp', location=[track[i]], wager=wager / wager)
+                                for i in range(index - count, index + count + 1)]
+                    bets = Bet.from_neighbors(table=table, type=f"neighbors{count}", location=[number], wager=wager)
+                    self.assertSameBets(bets, expected)
+
+    def test_sector_templates_match_bets(self):
+        table = Table(wheel=Wheel.EUROPEAN)
+        for name, (units, bets) in SECTORS.items():
+            wager = 3 * units
+            expected = [Bet(table=table, type=type, wager=share * wager / units,
+                            location=list(location) if isinstance(location, tuple) else location)
+                        for type, location, share in bets]
+            self.assertSameBets(Bet.from_sector_bets(table, name, wager), expected)
+
+    def test_template_limits(self):
+        with self.assertRaises(BetTooLargeException):
+            Table(wheel=Wheel.EUROPEAN, limits={'straightUp': {'max': 2}},
+                  bets=[{'type': 'neighbors1', 'wager': 9, 'location': [0]}])
+        with self.assertRaises(BetTooLargeException):
+            Table(wheel=Wheel.EUROPEAN, limits={'corner': {'max': 1}},
+                  bets=[{'type': 'sector', 'wager': 9, 'location': 'voisins'}])
+
+    def test_netting(self):
+        bets = TestBetBook().random_bets(random.Random(11), 40)
+        plain = Table(wheel=Wheel.EUROPEAN, bets=[dict(bet) for bet in bets])
+        netted = Table(wheel=Wheel.EUROPEAN, bets=[dict(bet) for bet in bets], netting=True)
+        for number in (0, 11, 26):
+            self.assertEqual(plain.book.settle(number), netted.book.settle(number))
+            self.assertEqual([(bet.type, bet.wager) for bet in netted.bets],
+                             [(bet['type'], bet['wager']) for bet in bets])
+            self.assertEqual([bet.location for bet in netted.bets if bet.type != 'straightUp'],
+                             [bet['location'] for bet in bets if bet['type'] != 'straightUp'])
+            self.assertEqual(sum(bet.payout for bet in netted.bets), sum(bet.payout for bet in plain.bets))
+            positions = netted.book.get_positions()
+            self.assertEqual(len(positions), len({bet.outcome for bet in plain.bets}))
+            self.assertAlmostEqual(sum(stake for _, stake, _, _ in positions), sum(bet['wager'] for bet in bets))
+            self.assertAlmostEqual(sum(payout for _, _, _, payout in positions), sum(bet.payout for bet in plain.bets))
+            plain.book._bets = netted.book._bets = None
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import random
+import subprocess
+import sys
+import unittest
+import jsonschema
+from validation import FastRequestCheck, RequestValidator, resolve_refs
+
+with open('RouletteRequestSchema.json') as f:
+    schema = json.load(f)
+
+TYPES = ['straightUp', 'split', 'split3', 'street', 'corner', 'first4', 'first5', 'line', 'column', 'dozen',
+         'outside', 'neighbors1', 'neighbors9', 'sector', 'bogus', 3, None]
+LOCATIONS = [0, 5, 36, 37, -1, '0', '00', '01', '36', '37', 'red', 'blue', 'tiers', 'jeu zero', None, True, 1.0, '']
+
+
+def random_location(rng):
+    if rng.random() < 0.5:
+        return rng.choice(LOCATIONS)
+    return [rng.choice(LOCATIONS) for _ in range(rng.randint(0, 3))]
+
+
+def random_request(rng):
+    request = {}
+    if rng.random() < 0.5:
+        request['wheel'] = rng.choice(['American', 'European', 'Martian', 1])
+    if rng.random() < 0.5:
+        request['hash'] = rng.choice(['a' * 64, 'A' * 64, 'g' * 64, 'a' * 63, 'a' * 64 + '\n', 5])
+    if rng.random() < 0.5:
+        request['table'] = {rng.choice(['split', 'line', 'totalInside', 'unknown']): {
+            rng.choice(['min', 'max']): rng.choice([0, 1, 10, None, True, 'x', 2.0])} for _ in range(2)}
+    if rng.random() < 0.9:
+        request['bets'] = []
+        for _ in range(rng.randint(0, 3)):
+            bet = {'type': rng.choice(TYPES), 'wager': rng.choice([1, 5, 0, -1, True, 1.0, '1']),
+                   'location': random_location(rng)}
+            if rng.random() < 0.1:
+                del bet[rng.choice(list(bet))]
+            request['bets'].append(bet)
+    if rng.random() < 0.2:
+        request['packed'] = rng.choice([{'outcomes': 'AAABAA==', 'wagers': 'AQAAAAEAAAA='}, {'outcomes': 'AAA='},
+                                        {'outcomes': 'AA A', 'wagers': ''}, {'outcomes': 1, 'wagers': ''}, []])
+    return request
+
+
+class TestRequestValidator(unittest.TestCase):
+
+    def test_resolve_refs(self):
+        resolved = resolve_refs(schema)
+        self.assertNotIn('$defs', resolved)
+        self.assertNotIn('$ref', json.dumps(resolved))
+        self.assertEqual(resolved['properties']['bets']['items'], resolve_refs(schema['$defs']['betObject'], schema))
+
+    def test_fast_check_is_sound(self):
+        rng = random.Random(1234)
+        check = FastRequestCheck(schema)
+        validator = jsonschema.validators.validator_for(schema)(schema)
+        accepted = 0
+        for _ in range(2000):
+            request = random_request(rng)
+            if check(request):
+                accepted += 1
+                self.assertTrue(validator.is_valid(request), request)
+        self.assertGreater(accepted, 50)
+
+    def test_modes_agree(self):
+        rng = random.Random(4321)
+        validators = [RequestValidator(schema, mode=mode) for mode in RequestValidator.modes]
+        for _ in range(300):
+            request = random_request(rng)
+            outcomes = []
+            for validator in validators:
+                try:
+                    validator.validate(request)
+                    outcomes.append(None)
+                except jsonschema.exceptions.ValidationError as e:
+                    outcomes.append(str(e))
+            try:
+                jsonschema.validate(instance=request, schema=schema)
+                expected = None
+            except jsonschema.exceptions.ValidationError as e:
+                expected = str(e)
+            self.assertEqual(outcomes, [expected] * len(validators), request)
+
+    def test_test_request_takes_fast_path(self):
+        with open('testRequest.json') as f:
+            self.assertTrue(FastRequestCheck(schema)(json.load(f)))
+
+    def test_jsonschema_loaded_lazily(self):
+        probe = ("import json, sys, roulette\n"
+                 "request = json.load(open('testRequest.json'))\n"
+                 "assert json.loads(roulette.process_request(request))['success']\n"
+                 "assert 'jsonschema' not in sys.modules\n"
+                 "assert not json.loads(roulette.process_request({'hash': 'x'}))['success']\n"
+                 "assert 'jsonschema' in sys.modules\n")
+        subprocess.run([sys.executable, '-c', probe], check=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
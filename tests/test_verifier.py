@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+from wheel import Wheel
+from table import Table
+import verifier
+from verifier import generate_chain, replay, verify_chain, write_chain
+
+
+class TestVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_matches_table_choose(self):
+        digests = list(generate_chain('seed', 500))
+        with open(self.path('chain.bin'), 'wb') as f:
+            f.write(b''.join(digests))
+        for wheel in [Wheel.AMERICAN, Wheel.EUROPEAN]:
+            table = Table(wheel=wheel)
+            expected = [0] * len(table.pockets)
+            for digest in digests:
+                table.choose(digest.hex())
+                expected[table.winning_number] += 1
+            backends = [None] + ([verifier.numpy] if verifier.numpy is not None else [])
+            for backend in backends:
+                with mock.patch('verifier.numpy', backend):
+                    report = replay(self.path('chain.bin'), wheel, binary=True, chunk_size=64)
+                self.assertEqual(report.counts, expected)
+            self.assertEqual(replay(self.path('chain.bin'), wheel, binary=True).total, 500)
+
+    def test_recorded_winners(self):
+        table = Table(wheel=Wheel.AMERICAN)
+        lines = []
+        for number, digest in enumerate(generate_chain(b'records', 50)):
+            table.choose(digest.hex())
+            location = table.winner['location']
+            if number == 7:
+                location = 36 if location != 36 else 35
+            lines.append(f"{digest.hex()},{location}\n" if number % 2 else f"{digest.hex()} {location}\n")
+        lines.insert(20, "not-a-hash\n")
+        # An Arabic-Indic digit, which int() would take as 3 were the line decoded as UTF-8
+        lines.insert(31, "\u0663" + "a" * 63 + " 3\n")
+        with open(self.path('hashes.txt'), 'wb') as f:
+            f.write(''.join(lines).encode())
+        result = replay(self.path('hashes.txt'), Wheel.AMERICAN, chunk_size=16).get_json_dict()
+        self.assertEqual(result['total'], 50)
+        self.assertEqual(result['checked'], 50)
+        self.assertEqual(result['mismatchCount'], 3)
+        offsets = [mismatch['offset'] for mismatch in result['mismatches']]
+        self.assertEqual(offsets, [len(''.join(lines[:n]).encode()) for n in (7, 20, 31)])
+        self.assertEqual([mismatch['expected'] for mismatch in result['mismatches'][1:]], [None, None])
+        self.assertFalse(verify_chain(self.path('hashes.txt'))['valid'])
+
+    def test_modulo_bias(self):
+        bias = verifier.modulo_bias(37)
+        self.assertEqual(len(bias['favoured']), 16 ** 13 % 37)
+        self.assertGreater(bias['favouredOdds'], bias['otherOdds'])
+
+    def test_chain(self):
+        for binary in [True, False]:
+            path = self.path('chain.bin' if binary else 'chain.txt')
+            write_chain('server seed', 300, path, binary=binary)
+            result = verify_chain(path, binary=binary)
+            self.assertTrue(result['valid'])
+            self.assertEqual(result['length'], 300)
+            terminal = result['terminal']
+            self.assertTrue(verify_chain(path, binary=binary, terminal=terminal)['valid'])
+            self.assertFalse(verify_chain(path, binary=binary, terminal='00' * 32)['valid'])
+
+        path = self.path('chain.bin')
+        with open(path, 'r+b') as f:
+            f.seek(100 * 32)
+            f.write(b'\xff')
+        for workers in [1, 2]:
+            result = verify_chain(path, binary=True, workers=workers, chunk_size=32)
+            self.assertFalse(result['valid'])
+            # Both the altered hash and the one after it no longer follow from their predecessor
+            self.assertEqual([link['index'] for link in result['broken']], [100, 101])
+            self.assertEqual(result['broken'][0]['offset'], 3200)
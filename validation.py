@@ -0,0 +1,191 @@
+import re
+
+
+def resolve_refs(schema, root=None):
+    """Return a copy of the schema with every local "#/..." $ref replaced by the schema it points to."""
+    root = schema if root is None else root
+    if isinstance(schema, dict):
+        if '$ref' in schema and schema['$ref'].startswith('#/'):
+            target = root
+            for part in schema['$ref'][2:].split('/'):
+                target = target[part]
+            return resolve_refs(target, root)
+        return {k: resolve_refs(v, root) for k, v in schema.items() if not (schema is root and k == '$defs')}
+    if isinstance(schema, list):
+        return [resolve_refs(v, root) for v in schema]
+    return schema
+
+
+def is_integer(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_scalar(value):
+    return value is None or isinstance(value, str) or is_integer(value)
+
+
+class FastRequestCheck(object):
+    """Plain Python check of the common request shapes, generated from the request schema.
+
+    It only ever answers True for requests the schema accepts; anything it does not recognise
+    answers False so the caller can fall back to full jsonschema validation.
+    """
+
+    def __init__(self, schema):
+        properties = schema['properties']
+        definitions = schema['$defs']
+        bet = definitions['betObject']
+        pockets = definitions['validPockets']['oneOf']
+        limit = definitions['tableLimitType']['properties']
+        rules = {}
+        patterns = []
+        for rule in bet['allOf']:
+            condition = rule['if']['properties']['type'] if 'properties' in rule['if'] else None
+            location = rule['then']['properties']['location']
+            if condition and 'const' in condition:
+                rules[condition['const']] = location
+            elif condition:
+                rules[condition['pattern']] = location
+                patterns.append(condition['pattern'])
+        first, single = patterns
+
+        self.wheels = frozenset(properties['wheel']['enum'])
+        self.hash = re.compile(properties['hash']['pattern'])
+        self.flags = tuple(name for name, value in properties.items() if value.get('type') == 'boolean')
+        self.limits = frozenset(properties['table']['properties'])
+        self.limit_min = limit['min']['minimum']
+        self.limit_max = limit['max']['oneOf'][0]['minimum']
+        self.types = frozenset(bet['properties']['type']['enum'])
+        self.required = tuple(bet['required'])
+        self.wager_min = bet['properties']['wager']['minimum']
+        self.pocket_min = pockets[0]['minimum']
+        self.pocket_max = pockets[0]['maximum']
+        self.pocket = re.compile(pockets[1]['pattern'])
+        self.outside = frozenset(rules['outside']['enum'])
+        self.sector = frozenset(rules['sector']['enum'])
+        self.first = re.compile(first)
+        self.first_locations = frozenset((type(v), v) for v in rules[first]['oneOf'][2]['items']['enum'])
+        self.single = re.compile(single)
+        self.packed = tuple(properties['packed']['required'])
+        self.packed_column = re.compile(definitions['packedColumn']['pattern'])
+
+    def __call__(self, request):
+        if not isinstance(request, dict):
+            return False
+        if 'wheel' in request and not (isinstance(request['wheel'], str) and request['wheel'] in self.wheels):
+            return False
+        if 'hash' in request and not (isinstance(request['hash'], str) and self.hash.search(request['hash'])):
+            return False
+        for flag in self.flags:
+            if flag in request and not isinstance(request[flag], bool):
+                return False
+        if 'table' in request and not self.check_table(request['table']):
+            return False
+        if 'bets' in request:
+            bets = request['bets']
+            if not isinstance(bets, list):
+                return False
+            for bet in bets:
+                if not self.check_bet(bet):
+                    return False
+        if 'packed' in request and not self.check_packed(request['packed']):
+            return False
+        return True
+
+    def check_packed(self, packed):
+        if not isinstance(packed, dict):
+            return False
+        for name in self.packed:
+            if not (name in packed and isinstance(packed[name], str) and self.packed_column.search(packed[name])):
+                return False
+        return True
+
+    def check_table(self, table):
+        if not isinstance(table, dict):
+            return False
+        for name, limit in table.items():
+            if name not in self.limits:
+                continue
+            if not isinstance(limit, dict):
+                return False
+            if 'min' in limit and not (is_integer(limit['min']) and limit['min'] >= self.limit_min):
+                return False
+            if 'max' in limit and not (limit['max'] is None or
+                                       (is_integer(limit['max']) and limit['max'] >= self.limit_max)):
+                return False
+        return True
+
+    def check_pocket(self, location):
+        if is_integer(location):
+            return self.pocket_min <= location <= self.pocket_max
+        return isinstance(location, str) and bool(self.pocket.search(location))
+
+    def check_bet(self, bet):
+        if not isinstance(bet, dict):
+            return False
+        for key in self.required:
+            if key not in bet:
+                return False
+        bet_type, wager, location = bet['type'], bet['wager'], bet['location']
+        if not (isinstance(bet_type, str) and bet_type in self.types):
+            return False
+        if not (is_integer(wager) and wager >= self.wager_min):
+            return False
+        if bet_type == 'outside':
+            return isinstance(location, str) and location in self.outside
+        if bet_type == 'sector':
+            return isinstance(location, str) and location in self.sector
+        if self.first.search(bet_type):
+            if isinstance(location, list):
+                return all(is_scalar(v) and (type(v), v) in self.first_locations for v in location)
+            return location is None or (is_scalar(location) and (type(location), location) in self.first_locations)
+        if self.single.search(bet_type):
+            if isinstance(location, list):
+                return len(location) == 1 and self.check_pocket(location[0])
+            return self.check_pocket(location)
+        return isinstance(location, list) and len(location) >= 1 and all(self.check_pocket(v) for v in location)
+
+
+class RequestValidator(object):
+    """Validate requests against the schema, building everything it needs once.
+
+    mode "fast" tries the FastRequestCheck first, "compiled" goes straight to a validator for the
+    schema with its refs resolved, and "full" validates against the original schema as
+    jsonschema.validate does. Whatever the mode, an invalid request gets the error
+    jsonschema.validate would have raised. jsonschema itself is only imported the first time
+    a request needs it.
+    """
+    modes = ('fast', 'compiled', 'full')
+
+    def __init__(self, schema, mode='fast'):
+        if mode not in self.modes:
+            raise ValueError(f"Unknown validation mode: {mode}")
+        self.mode = mode
+        self.schema = schema
+        self.fast = FastRequestCheck(schema)
+        self.validator = None
+        self.compiled = None
+
+    def load(self):
+        if self.validator is None:
+            import jsonschema
+            cls = jsonschema.validators.validator_for(self.schema)
+            cls.check_schema(self.schema)
+            self.compiled = cls(resolve_refs(self.schema))
+            self.validator = cls(self.schema)
+        return self.validator
+
+    def first_error(self, request):
+        """Return the ValidationError for an invalid request, or None if it is valid."""
+        if self.mode == 'fast' and self.fast(request):
+            return None
+        validator = self.load()
+        if self.mode != 'full' and self.compiled.is_valid(request):
+            return None
+        from jsonschema.exceptions import best_match
+        return best_match(validator.iter_errors(request))
+
+    def validate(self, request):
+        error = self.first_error(request)
+        if error is not None:
+            raise error
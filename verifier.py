@@ -0,0 +1,315 @@
+"""Replay of provably-fair hashes, and SHA-256 hash chains to draw them from.
+
+A round's winner is int(hash[0:13], 16) % pocket_count, exactly as Table.choose derives it. Hashes
+are streamed from a file either as text, one hex hash per line optionally followed by the winner
+that was recorded for it ("<hash> <location>" or "<hash>,<location>"), or as a binary file of raw
+32-byte SHA-256 digests, which is memory-mapped and decoded in chunks (with NumPy when installed).
+Only binary input is decoded in arrays; text lines are parsed one at a time, and a line that is
+not a hex hash, including one that is not ASCII, is reported as a mismatch at its byte offset.
+
+A hash chain starts from a server seed: the first hash is SHA-256 of the seed, and every next
+hash is SHA-256 of the previous digest. Chains are stored in that order and played from the end,
+so the last hash is the one published up front, and each hash revealed later proves the one
+after it.
+
+    python -m verifier winners hashes.txt --wheel American
+    python -m verifier chain generate SEED 10000000 chain.bin --binary
+    python -m verifier chain verify chain.bin --binary --terminal <hex>
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from exposure import pocket_location
+from wheel import Wheel
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+DIGEST_SIZE = hashlib.sha256().digest_size
+CHUNK_SIZE = 1 << 16
+MAX_MISMATCHES = 100
+
+
+def pocket_count(wheel):
+    return len(Wheel(wheel).get_track())
+
+
+def winning_number(hash, pockets):
+    """The winning pocket number for a hex hash, as Table.choose derives it."""
+    return int(hash[0:13], 16) % pockets
+
+
+def modulo_bias(pockets):
+    """The exact chance of every pocket given 13 hex digits of hash taken modulo the pocket count."""
+    space = 16 ** 13
+    base, favoured = divmod(space, pockets)
+    return {
+        'favoured':     [pocket_location(number) for number in range(favoured)],
+        'favouredOdds': (base + 1) / space,
+        'otherOdds':    base / space,
+        'relativeBias': 1 / base,
+        'space':        space,
+    }
+
+
+def digest_numbers(buffer, pockets):
+    """Winning pocket numbers of consecutive raw digests in a bytes-like buffer."""
+    count = len(buffer) // DIGEST_SIZE
+    if numpy is not None:
+        prefixes = numpy.frombuffer(buffer, dtype=numpy.uint8, count=count * DIGEST_SIZE) \
+            .reshape(count, DIGEST_SIZE)[:, :7].astype(numpy.uint64)
+        values = numpy.zeros(count, dtype=numpy.uint64)
+        for column in range(7):
+            values = (values << numpy.uint64(8)) | prefixes[:, column]
+        return ((values >> numpy.uint64(4)) % numpy.uint64(pockets)).tolist()
+    view = memoryview(buffer)
+    return [(int.from_bytes(view[start:start + 7], 'big') >> 4) % pockets
+            for start in range(0, count * DIGEST_SIZE, DIGEST_SIZE)]
+
+
+def read_binary(path, chunk_size=CHUNK_SIZE):
+    """(offset, buffer of whole digests) over a memory-mapped file of raw digests."""
+    size = os.path.getsize(path)
+    if size % DIGEST_SIZE:
+        raise ValueError(f"{path} is not a whole number of {DIGEST_SIZE} byte digests")
+    if not size:
+        return
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        step = chunk_size * DIGEST_SIZE
+        for offset in range(0, size, step):
+            yield offset, mapped[offset:offset + step]
+
+
+def read_text(path):
+    """(byte offset, hash, recorded location or None) for every non-empty line of a text file."""
+    offset = 0
+    with open(path, 'rb') as f:
+        for line in f:
+            # Bytes that are not ASCII become U+FFFD, which no hash or location parses as
+            fields = line.decode('ascii', errors='replace').replace(',', ' ').split()
+            if fields:
+                yield offset, fields[0], fields[1] if len(fields) > 1 else None
+            offset += len(line)
+
+
+def parse_location(location):
+    return 37 if location == '00' else int(location)
+
+
+class WinnerReport(object):
+    """Running counts of replayed winners, and the recorded winners that do not match."""
+
+    def __init__(self, wheel, max_mismatches=MAX_MISMATCHES):
+        self.wheel = Wheel(wheel)
+        self.pockets = pocket_count(self.wheel)
+        self.counts = [0] * self.pockets
+        self.total = 0
+        self.checked = 0
+        self.mismatch_count = 0
+        self.mismatches = []
+        self.max_mismatches = max_mismatches
+
+    def mismatch(self, offset, hash, recorded, expected):
+        self.mismatch_count += 1
+        if len(self.mismatches) < self.max_mismatches:
+            self.mismatches.append({'expected': expected, 'hash': hash, 'offset': offset, 'recorded': recorded})
+
+    def add_numbers(self, numbers):
+        for number in numbers:
+            self.counts[number] += 1
+        self.total += len(numbers)
+
+    def add_text(self, records):
+        """Replay (offset, hash, recorded) records; a recorded location of None is only counted."""
+        numbers = []
+        for offset, hash, recorded in records:
+            try:
+                number = winning_number(hash, self.pockets)
+            except ValueError:
+                self.mismatch(offset, hash, recorded, None)
+                continue
+            numbers.append(number)
+            if recorded is not None:
+                self.checked += 1
+                try:
+                    matches = parse_location(recorded) == number
+                except ValueError:
+                    matches = False
+                if not matches:
+                    self.mismatch(offset, hash, recorded, pocket_location(number))
+        self.add_numbers(numbers)
+
+    def get_json_dict(self):
+        expected = self.total / self.pockets
+        return {
+            'checked':       self.checked,
+            'chiSquare':     sum((count - expected) ** 2 / expected for count in self.counts) if self.total else 0.0,
+            'counts':        {str(pocket_location(number)): count for number, count in enumerate(self.counts)},
+            'mismatchCount': self.mismatch_count,
+            'mismatches':    self.mismatches,
+            'moduloBias':    modulo_bias(self.pockets),
+            'total':         self.total,
+            'wheel':         self.wheel.value,
+        }
+
+
+def replay(path, wheel=Wheel.EUROPEAN, binary=False, chunk_size=CHUNK_SIZE, max_mismatches=MAX_MISMATCHES):
+    """Recompute the winner of every hash in a file, checking any winners recorded with them."""
+    report = WinnerReport(wheel, max_mismatches)
+    if binary:
+        for _, buffer in read_binary(path, chunk_size):
+            report.add_numbers(digest_numbers(buffer, report.pockets))
+        return report
+    chunk = []
+    for record in read_text(path):
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            report.add_text(chunk)
+            chunk = []
+    report.add_text(chunk)
+    return report
+
+
+def generate_chain(seed, length):
+    """The raw digests of a hash chain, in the order they are generated (and the reverse of play)."""
+    digest = seed.encode() if isinstance(seed, str) else bytes(seed)
+    sha256 = hashlib.sha256
+    for _ in range(length):
+        digest = sha256(digest).digest()
+        yield digest
+
+
+def write_chain(seed, length, path, binary=False):
+    with open(path, 'wb') as f:
+        if binary:
+            for digest in generate_chain(seed, length):
+                f.write(digest)
+        else:
+            for digest in generate_chain(seed, length):
+                f.write(digest.hex().encode() + b'\n')
+    return path
+
+
+def check_links(previous, buffer, offset):
+    """Offsets of the digests in buffer that are not SHA-256 of the digest before them."""
+    sha256 = hashlib.sha256
+    broken = []
+    for start in range(0, len(buffer), DIGEST_SIZE):
+        digest = buffer[start:start + DIGEST_SIZE]
+        if previous is not None and sha256(previous).digest() != digest:
+            broken.append(offset + start)
+        previous = digest
+    return broken
+
+
+def _check_binary_chunk(args):
+    path, start, stop = args
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        previous = mapped[start - DIGEST_SIZE:start] if start else None
+        return check_links(previous, mapped[start:stop], start)
+
+
+def verify_chain(path, binary=False, terminal=None, workers=1, chunk_size=CHUNK_SIZE,
+                 max_mismatches=MAX_MISMATCHES):
+    """Check every link of a stored hash chain, and that it ends in the published terminal hash.
+
+    Broken links are reported by the offset of the hash that does not follow from the one before
+    it: the byte offset in the file, and its index in the chain.
+    """
+    broken = []
+    links = 0
+    last = None
+    if binary:
+        size = os.path.getsize(path)
+        if size % DIGEST_SIZE:
+            raise ValueError(f"{path} is not a whole number of {DIGEST_SIZE} byte digests")
+        step = chunk_size * DIGEST_SIZE
+        chunks = [(path, start, min(start + step, size)) for start in range(0, size, step)]
+        if workers == 1 or len(chunks) <= 1:
+            results = map(_check_binary_chunk, chunks)
+        else:
+            executor = ProcessPoolExecutor(max_workers=workers)
+            results = executor.map(_check_binary_chunk, chunks)
+        try:
+            for result in results:
+                broken.extend({'index': offset // DIGEST_SIZE, 'offset': offset} for offset in result)
+        finally:
+            if workers != 1 and len(chunks) > 1:
+                executor.shutdown()
+        links = size // DIGEST_SIZE
+        if links:
+            with open(path, 'rb') as f:
+                f.seek(size - DIGEST_SIZE)
+                last = f.read(DIGEST_SIZE)
+    else:
+        previous = None
+        sha256 = hashlib.sha256
+        for offset, hash, _ in read_text(path):
+            try:
+                digest = bytes.fromhex(hash)
+            except ValueError:
+                digest = None
+            if digest is None or (previous is not None and sha256(previous).digest() != digest):
+                broken.append({'index': links, 'offset': offset})
+            previous = last = digest
+            links += 1
+    result = {
+        'brokenCount': len(broken),
+        'broken':      broken[:max_mismatches],
+        'length':      links,
+        'terminal':    last.hex() if last is not None else None,
+        'valid':       not broken,
+    }
+    if terminal is not None:
+        result['terminalMatches'] = last is not None and last.hex() == terminal.lower()
+        result['valid'] = result['valid'] and result['terminalMatches']
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay provably-fair hashes and hash chains.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    winners = commands.add_parser('winners', help="recompute winners from hashes and check recorded ones")
+    winners.add_argument('path')
+    winners.add_argument('--wheel', choices=[wheel.value for wheel in Wheel], default=Wheel.EUROPEAN.value)
+    winners.add_argument('--binary', action='store_true', help="the file holds raw 32 byte digests")
+    winners.add_argument('--max-mismatches', type=int, default=MAX_MISMATCHES)
+
+    chain = commands.add_parser('chain', help="generate or verify SHA-256 hash chains")
+    actions = chain.add_subparsers(dest='action', required=True)
+    generate = actions.add_parser('generate')
+    generate.add_argument('seed')
+    generate.add_argument('length', type=int)
+    generate.add_argument('path')
+    generate.add_argument('--binary', action='store_true')
+    verify = actions.add_parser('verify')
+    verify.add_argument('path')
+    verify.add_argument('--binary', action='store_true')
+    verify.add_argument('--terminal', help="the published last hash of the chain")
+    verify.add_argument('--workers', type=int, default=1)
+    verify.add_argument('--max-mismatches', type=int, default=MAX_MISMATCHES)
+
+    args = parser.parse_args(argv)
+    if args.command == 'winners':
+        result = replay(args.path, Wheel(args.wheel), binary=args.binary,
+                        max_mismatches=args.max_mismatches).get_json_dict()
+    elif args.action == 'generate':
+        write_chain(args.seed, args.length, args.path, binary=args.binary)
+        result = verify_chain(args.path, binary=args.binary)
+    else:
+        result = verify_chain(args.path, binary=args.binary, terminal=args.terminal, workers=args.workers,
+                              max_mismatches=args.max_mismatches)
+    json.dump(result, sys.stdout, indent=4)
+    print()
+    return 0 if result.get('valid', not result.get('mismatchCount')) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())